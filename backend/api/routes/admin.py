@@ -1,11 +1,18 @@
-from fastapi import APIRouter, Depends
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
 from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.status import HTTP_204_NO_CONTENT, HTTP_400_BAD_REQUEST, HTTP_404_NOT_FOUND
 
-from api.dependencies import get_current_user
+from api.dependencies import get_current_user, get_current_admin
+from core.profiling import profiling
 from db.database import get_db
+from schema.admin import ProfilingRequest
 
 
 from api.services.files import file_service
+from api.services.usage import usage_service
 
 router = APIRouter()
 
@@ -30,3 +37,58 @@ async def list_all_files(
         file_type=file_type,
         extension=current_admin.get("role", "user") == "admin"
     )
+
+
+@router.post("/profiling")
+async def start_profiling(
+    request: ProfilingRequest,
+    current_admin: dict = Depends(get_current_admin)
+):
+    if not request.header and not request.requests:
+        raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail="Set requests or header")
+    return profiling.arm(request.requests, request.header, request.duration)
+
+
+@router.delete("/profiling", status_code=HTTP_204_NO_CONTENT)
+async def stop_profiling(current_admin: dict = Depends(get_current_admin)):
+    profiling.disarm()
+
+
+@router.get("/profiling")
+async def get_profiling(current_admin: dict = Depends(get_current_admin)):
+    return {**profiling.status(), "profiles": await asyncio.to_thread(profiling.list_profiles)}
+
+
+@router.get("/profiling/{profile_id}")
+async def download_profile(profile_id: str, current_admin: dict = Depends(get_current_admin)):
+    path = profiling.profile_path(profile_id)
+    if not path:
+        raise HTTPException(status_code=HTTP_404_NOT_FOUND, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=path.name)
+
+
+@router.get("/stats/users")
+async def usage_per_user(
+    db: AsyncSession = Depends(get_db),
+    current_admin: dict = Depends(get_current_admin),
+    skip: int = 0,
+    limit: int = 50
+):
+    return await usage_service.per_user(db, skip, limit)
+
+
+@router.get("/stats/types")
+async def usage_per_type(
+    db: AsyncSession = Depends(get_db),
+    current_admin: dict = Depends(get_current_admin)
+):
+    return await usage_service.per_type(db)
+
+
+@router.get("/stats/growth")
+async def usage_growth(
+    db: AsyncSession = Depends(get_db),
+    current_admin: dict = Depends(get_current_admin),
+    days: int = 30
+):
+    return await usage_service.growth(db, days)
@@ -1,10 +1,12 @@
 from typing import List
-from fastapi import APIRouter, Depends, UploadFile
+from fastapi import APIRouter, Depends, Header, Query, Request, UploadFile
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from api.services.files import file_service
+from api.services.upload_sessions import upload_session_service
 from api.dependencies import get_current_user
 from db.database import get_db
+from schema.files import DirectUploadRequest, DirectUploadComplete, ArchiveRequest, UploadSessionRequest
 from starlette.status import HTTP_204_NO_CONTENT, HTTP_201_CREATED
 
 router = APIRouter(tags=["files"])
@@ -17,18 +19,40 @@ async def list_files(
     skip: int = 0,
     limit: int = 50,
     search: str = None,
-    file_type: str = None
+    file_type: str = None,
+    where: List[str] = Query(None),
+    if_none_match: str = Header(None)
 ):
+    if not search and not where:
+        return await file_service.list_files_conditional(
+            db=db,
+            current_user=current_user,
+            skip=skip,
+            limit=limit,
+            file_type=file_type,
+            if_none_match=if_none_match
+        )
     return await file_service.list_files(
         db=db,
         current_user=current_user,
         skip=skip,
         limit=limit,
         search=search,
-        file_type=file_type
+        file_type=file_type,
+        where=where
     )
 
 
+@router.get("/suggest")
+async def suggest_files(
+    prefix: str,
+    limit: int = 10,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    return await file_service.suggest_files(db, current_user, prefix, limit)
+
+
 @router.post("/upload", status_code=HTTP_201_CREATED)
 async def upload_files(
     files: List[UploadFile],
@@ -38,6 +62,99 @@ async def upload_files(
     return await file_service.upload_files(files, db, current_user)
 
 
+@router.post("/direct-uploads", status_code=HTTP_201_CREATED)
+async def create_direct_upload(
+    request: DirectUploadRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    return await file_service.create_direct_upload(
+        request.filename,
+        request.content_type,
+        request.size,
+        current_user
+    )
+
+
+@router.post("/direct-uploads/complete", status_code=HTTP_201_CREATED)
+async def complete_direct_upload(
+    request: DirectUploadComplete,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    return await file_service.complete_direct_upload(request.upload_token, db, current_user)
+
+
+@router.post("/upload-sessions", status_code=HTTP_201_CREATED)
+async def create_upload_session(
+    request: UploadSessionRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    return await upload_session_service.create_session(
+        request.filename,
+        request.content_type,
+        request.size,
+        db,
+        current_user
+    )
+
+
+@router.get("/upload-sessions/{session_id}")
+async def get_upload_session(
+    session_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    return await upload_session_service.get_session(session_id, db, current_user)
+
+
+@router.put("/upload-sessions/{session_id}")
+async def upload_chunk(
+    session_id: str,
+    offset: int,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    return await upload_session_service.write_chunk(session_id, offset, request.stream(), db, current_user)
+
+
+@router.post("/upload-sessions/{session_id}/complete", status_code=HTTP_201_CREATED)
+async def complete_upload_session(
+    session_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    return await upload_session_service.complete_session(session_id, db, current_user)
+
+
+@router.delete("/upload-sessions/{session_id}", status_code=HTTP_204_NO_CONTENT)
+async def abort_upload_session(
+    session_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    await upload_session_service.abort_session(session_id, db, current_user)
+
+
+@router.post("/archive")
+async def download_archive(
+    request: ArchiveRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    return await file_service.download_archive(request.file_ids, db, current_user)
+
+
+@router.get("/{file_id}/download-url")
+async def get_download_url(
+    file_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    return await file_service.create_download_url(file_id, db, current_user)
+
+
 @router.get("/{file_id}/download")
 async def download_file(
     file_id: str,
@@ -0,0 +1,23 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse
+from starlette.status import HTTP_201_CREATED, HTTP_404_NOT_FOUND
+
+from api.services.files import file_service
+
+# Data plane for the local storage backend: requests are authorized by the URL signature only.
+router = APIRouter(tags=["transfers"])
+
+
+@router.put("/{path:path}", status_code=HTTP_201_CREATED)
+async def put_object(path: str, request: Request, expires: int, signature: str):
+    file_path = file_service.verify_transfer("PUT", path, expires, signature)
+    size = await file_service.write_transfer(file_path, request.stream())
+    return {"size": size}
+
+
+@router.get("/{path:path}")
+async def get_object(path: str, expires: int, signature: str, filename: str = ""):
+    file_path = file_service.verify_transfer("GET", path, expires, signature, filename)
+    if not file_path.is_file():
+        raise HTTPException(status_code=HTTP_404_NOT_FOUND, detail="File not found")
+    return FileResponse(file_path, filename=filename or None)
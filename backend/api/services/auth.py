@@ -2,8 +2,6 @@ from urllib.parse import urlencode
 import jwt
 import httpx
 from datetime import datetime, timedelta
-from google.oauth2 import id_token
-from google.auth.transport import requests
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
@@ -60,6 +58,9 @@ class AuthService:
 
     @classmethod
     def _decode_google_token(cls, g_token: str) -> dict:
+        from google.oauth2 import id_token
+        from google.auth.transport import requests
+
         payload = id_token.verify_oauth2_token(
             g_token,
             requests.Request(),
@@ -0,0 +1,121 @@
+import codecs
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+from core.settings import settings
+
+MAX_EXTRACTED_CHARS = 10000
+TEXT_CHUNK_SIZE = 16 * 1024
+WHITESPACE = re.compile(r"\s+")
+
+# file extension -> (extractor, expensive). Extractors are generators yielding text in document order,
+# so extraction stops as soon as the character budget is reached. Expensive ones run in a thread and are cached.
+EXTRACTORS = {}
+
+
+def extractor(*extensions: str, expensive: bool = False):
+    def register(func):
+        for extension in extensions:
+            EXTRACTORS[extension] = (func, expensive)
+        return func
+    return register
+
+
+@extractor(".pdf", expensive=True)
+def extract_pdf(content: bytes):
+    import PyPDF2
+    reader = PyPDF2.PdfReader(BytesIO(content))
+    for page in reader.pages:
+        yield page.extract_text() or ""
+
+
+@extractor(".txt")
+def extract_plain_text(content: bytes):
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    for start in range(0, len(content), TEXT_CHUNK_SIZE):
+        yield decoder.decode(content[start:start + TEXT_CHUNK_SIZE])
+    yield decoder.decode(b"", final=True)
+
+
+@extractor(".json")
+def extract_json(content: bytes):
+    """Indexed as text, not parsed, so files that are not valid JSON are still searchable. Collapsing indentation
+    keeps pretty-printed files from spending the budget on whitespace."""
+    # A whitespace run may span two chunks: it still becomes a single space
+    after_space = False
+    for chunk in extract_plain_text(content):
+        collapsed = WHITESPACE.sub(" ", chunk)
+        if after_space and collapsed.startswith(" "):
+            collapsed = collapsed[1:]
+        if collapsed:
+            after_space = collapsed.endswith(" ")
+            yield collapsed
+
+
+class ExtractionCache:
+    """LRU of extracted text keyed by content hash, bounded by total characters, shared by the worker's threads"""
+
+    def __init__(self, max_chars: int):
+        self.max_chars = max_chars
+        self.chars = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            text = self._entries.get(key)
+            if text is not None:
+                self._entries.move_to_end(key)
+            return text
+
+    def put(self, key, text: str) -> None:
+        if len(text) > self.max_chars:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            self.chars += len(text) - len(previous or "")
+            self._entries[key] = text
+            while self.chars > self.max_chars:
+                _, evicted = self._entries.popitem(last=False)
+                self.chars -= len(evicted)
+
+
+extraction_cache = ExtractionCache(settings.EXTRACTION_CACHE_MAX_CHARS)
+
+
+def is_expensive(file_ext: str) -> bool:
+    return EXTRACTORS.get(file_ext, (None, False))[1]
+
+
+def extract_text(
+        content: bytes,
+        file_ext: str,
+        budget: int = MAX_EXTRACTED_CHARS,
+        cache: ExtractionCache = extraction_cache
+) -> str:
+    """First `budget` characters of the document's text; "" for types without an extractor"""
+    if file_ext not in EXTRACTORS:
+        return ""
+    func, expensive = EXTRACTORS[file_ext]
+
+    key = None
+    if expensive and cache is not None:
+        key = (hashlib.sha256(content).hexdigest(), file_ext, budget)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    parts, length = [], 0
+    for part in func(content):
+        parts.append(part)
+        length += len(part)
+        if length >= budget:
+            break
+    text = "".join(parts)[:budget]
+
+    if key:
+        cache.put(key, text)
+    return text
@@ -0,0 +1,106 @@
+import json
+import math
+import re
+from typing import List, NamedTuple
+
+from fastapi import HTTPException
+from starlette import status
+
+MAX_FIELDS = 1000  # key path/value pairs indexed per file, bounds index and mapping growth
+MAX_FIELD_VALUE_CHARS = 256
+FIELDS_MAX_BYTES = 10 * 1024 * 1024  # larger JSON files are only indexed as text
+MAX_FILTERS = 10
+RANGE_OPERATORS = {">": "gt", ">=": "gte", "<": "lt", "<=": "lte"}
+
+FILTER = re.compile(r"^([\w.\-]+)\s*(>=|<=|=|>|<)\s*(.*)$")
+
+
+class Field(NamedTuple):
+    key: str  # dotted path, array positions left out: {"a": [{"b": 1}]} -> "a.b"
+    value: str  # the JSON scalar as text: "failed", "3", "true", "null"
+    number: float = None  # numeric values, for range filters
+
+
+class FieldFilter(NamedTuple):
+    key: str
+    op: str  # one of = > >= < <=
+    value: str
+    number: float = None
+
+
+def _as_number(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def _leaves(value, path: str):
+    if isinstance(value, dict):
+        for key, child in value.items():
+            yield from _leaves(child, f"{path}.{key}" if path else str(key))
+    elif isinstance(value, list):
+        for child in value:
+            yield from _leaves(child, path)
+    elif path:
+        yield path, value
+
+
+def load_json(content: bytes):
+    """The parsed document, or None for invalid JSON and files over FIELDS_MAX_BYTES"""
+    if len(content) > FIELDS_MAX_BYTES:
+        return None
+    try:
+        return json.loads(content)
+    except ValueError:
+        return None
+
+
+def flatten_document(document) -> List[Field]:
+    """Key path/value pairs of a parsed JSON document, at most MAX_FIELDS of them in document order"""
+    fields, seen = [], set()
+    for key, value in _leaves(document, ""):
+        text = json.dumps(value) if not isinstance(value, str) else value
+        number = _as_number(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+        field = Field(key, text[:MAX_FIELD_VALUE_CHARS], number)
+        if (field.key, field.value) not in seen:
+            seen.add((field.key, field.value))
+            fields.append(field)
+            if len(fields) >= MAX_FIELDS:
+                break
+    return fields
+
+
+def flatten_json(content: bytes) -> List[Field]:
+    return flatten_document(load_json(content))
+
+
+def extract_fields(content: bytes, file_ext: str) -> List[Field]:
+    return flatten_json(content) if file_ext == ".json" else []
+
+
+def parse_filters(expressions: List[str]) -> List[FieldFilter]:
+    """Parse `key=value` and `key>=number` style query parameters"""
+    if len(expressions) > MAX_FILTERS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_FILTERS} field filters are allowed"
+        )
+    filters = []
+    for expression in expressions:
+        match = FILTER.match(expression)
+        if not match:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid field filter {expression}, expected key=value or key>=number"
+            )
+        key, op, value = match.groups()
+        number = _as_number(value)
+        if op != "=" and number is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Range filter on {key} needs a number"
+            )
+        filters.append(FieldFilter(key, op, value[:MAX_FIELD_VALUE_CHARS], number))
+    return filters
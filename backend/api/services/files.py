@@ -1,20 +1,40 @@
+import asyncio
+import os
 import uuid
 import urllib.parse
+import zipfile
 import re
-from io import BytesIO
+import hmac
+import hashlib
+import shutil
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from typing import List
 
+import jwt
 from fastapi import HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from google.cloud import storage
-from elasticsearch import AsyncElasticsearch
+from sqlalchemy.orm import selectinload
 from starlette import status
-from models.file import File
+from models.file import File, FilePreview, name_prefix_key
+from api.services.usage import usage_service
+from api.services.listing_cache import listing_cache
+from api.services.extractors import extract_text, is_expensive
+from api.services.fields import parse_filters
+from api.services.previews import build_preview_and_fields
+from api.services.search import create_search_backend
 from core.settings import settings
-from core.metrics import files_uploaded, upload_size_bytes, files_downloaded, download_size_bytes, files_deleted
+from core.admission import AdmissionRejected, admission
+from core.metrics import (
+    files_uploaded, upload_size_bytes, files_downloaded, download_size_bytes, files_deleted, upload_failures,
+    bytes_in_flight, track_stage
+)
 from starlette.status import HTTP_401_UNAUTHORIZED
 
 ALLOWED_MIME_TYPES = {
@@ -26,6 +46,34 @@ ALLOWED_MIME_TYPES = {
 MAX_FILE_SIZE = 100 * 1024 * 1024
 MAX_FILES_PER_UPLOAD = 10
 
+MAX_SUGGESTIONS = 20
+
+MAX_FILES_PER_ARCHIVE = 200
+ARCHIVE_CHUNK_SIZE = 256 * 1024
+ARCHIVE_PREFETCH_FILES = 4  # blobs fetched ahead of the one being written
+GCS_COMPOSE_MAX_SOURCES = 32
+UPLOAD_TOKEN_AUDIENCE = "direct_upload"  # upload tokens are no session tokens, even where a key is shared
+ARCHIVE_PREFETCH_CHUNKS = 8  # chunks buffered per prefetched blob
+
+
+class _ArchiveSink:
+    """Write-only sink for zipfile, drained after every write so the archive is never held in memory"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
 
 class FileService:
 
@@ -33,99 +81,25 @@ class FileService:
         self.use_gcs = settings.USE_GCS == "true"
         if not self.use_gcs:
             self.local_dir = Path("uploads")
-            self.local_dir.mkdir(exist_ok=True)
 
-        self.es = AsyncElasticsearch(["http://elasticsearch:9200"])
-        self.index_name = "files"
+        self.search = create_search_backend(settings.SEARCH_BACKEND)
 
     async def init(self):
-        await self._create_search_index()
-
-    async def close(self):
-        await self.es.close()
-
-    async def _create_search_index(self):
-        index_exists = await self.es.indices.exists(index=self.index_name)
-        if not index_exists:
-            await self.es.indices.create(
-                index=self.index_name,
-                body={
-                    "settings": {
-                        "number_of_shards": 1,
-                        "number_of_replicas": 0,
-                        "index.max_ngram_diff": 20,
-                        "analysis": {
-                            "analyzer": {
-                                "ngram_analyzer": {
-                                    "type": "custom",
-                                    "tokenizer": "ngram_tokenizer",
-                                    "filter": ["lowercase"]
-                                }
-                            },
-                            "tokenizer": {
-                                "ngram_tokenizer": {
-                                    "type": "ngram",
-                                    "min_gram": 2,
-                                    "max_gram": 20
-                                }
-                            }
-                        }
-                    },
-                    "mappings": {
-                        "properties": {
-                            "file_id": {"type": "keyword"},
-                            "content": {
-                                "type": "text",
-                                "analyzer": "ngram_analyzer",
-                                "search_analyzer": "standard"
-                            }
-                        }
-                    }
-                }
-            )
-
-    async def _index_file_content(self, file_id: str, content: str) -> None:
-        try:
-            await self.es.index(
-                index=self.index_name,
-                id=file_id,
-                body={"content": content}
-            )
-        except Exception as e:
-            raise Exception(f"Failed to index file {file_id}: {str(e)}")
+        await self.search.init()
 
-    async def _search_file_content(
-            self,
-            query: str,
-            limit: int = 50
-    ) -> list:
+    async def ping(self, timeout: float = 2) -> bool:
         try:
-            es_query = {
-                "query": {
-                    "match": {
-                        "content": {
-                            "query": query,
-                            "fuzziness": "AUTO"
-                        }
-                    }
-                },
-                "size": limit
-            }
-
-            results = await self.es.search(index=self.index_name, body=es_query)
-            return [hit["_id"] for hit in results["hits"]["hits"]]
-
-        except Exception as e:
-            raise Exception(f"Search failed: {str(e)}")
+            return await asyncio.wait_for(self.search.ping(), timeout)
+        except Exception:
+            return False
 
-    async def _delete_from_search_index(self, file_id: str) -> None:
-        try:
-            await self.es.delete(index=self.index_name, id=file_id, ignore=[404])
-        except Exception as e:
-            raise Exception(f"Failed to delete from index: {str(e)}")
+    async def close(self):
+        await self.search.close()
 
     @staticmethod
     def _get_gcs_bucket():
+        from google.cloud import storage
+
         gcs_client = storage.Client(project=settings.GCP_PROJECT_ID)
         return gcs_client.bucket(settings.GCS_BUCKET_NAME)
 
@@ -133,35 +107,203 @@ class FileService:
         if self.use_gcs:
             bucket = self._get_gcs_bucket()
             blob = bucket.blob(path)
-            blob.upload_from_string(content)
+            await asyncio.to_thread(blob.upload_from_string, content)
         else:
             file_path = self.local_dir / path if isinstance(path, str) else path
             file_path.parent.mkdir(parents=True, exist_ok=True)
-            file_path.write_bytes(content)
+            await asyncio.to_thread(file_path.write_bytes, content)
 
     async def _download_from_storage(self, path: str) -> bytes:
         if self.use_gcs:
             bucket = self._get_gcs_bucket()
             blob = bucket.blob(path)
-            return blob.download_as_bytes()
+            return await asyncio.to_thread(blob.download_as_bytes)
         else:
             file_path = self.local_dir / path if isinstance(path, str) else path
             return file_path.read_bytes()
 
+    async def _stream_from_storage(self, path: str, chunk_size: int = ARCHIVE_CHUNK_SIZE):
+        if self.use_gcs:
+            bucket = self._get_gcs_bucket()
+            reader = bucket.blob(path).open("rb", chunk_size=chunk_size)
+        else:
+            file_path = self.local_dir / path if isinstance(path, str) else path
+            reader = file_path.open("rb")
+        try:
+            while chunk := await asyncio.to_thread(reader.read, chunk_size):
+                yield chunk
+        finally:
+            reader.close()
+
+    async def _compose_in_storage(self, sources: list, path: str) -> None:
+        """Concatenate stored objects into `path` without holding them in memory"""
+        if self.use_gcs:
+            bucket = self._get_gcs_bucket()
+            destination = bucket.blob(path)
+            # A compose request takes at most 32 sources, the rest are appended to the destination in turn
+            first = sources[:GCS_COMPOSE_MAX_SOURCES]
+            await asyncio.to_thread(destination.compose, [bucket.blob(source) for source in first])
+            for start in range(len(first), len(sources), GCS_COMPOSE_MAX_SOURCES - 1):
+                batch = sources[start:start + GCS_COMPOSE_MAX_SOURCES - 1]
+                await asyncio.to_thread(destination.compose, [destination, *(bucket.blob(b) for b in batch)])
+        else:
+            file_path = self.local_dir / path if isinstance(path, str) else path
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            await asyncio.to_thread(self._concatenate_files, [self.local_dir / source for source in sources], file_path)
+
+    @staticmethod
+    def _concatenate_files(sources: list, destination: Path) -> None:
+        with destination.open("wb") as out:
+            for source in sources:
+                with source.open("rb") as f:
+                    shutil.copyfileobj(f, out, ARCHIVE_CHUNK_SIZE)
+
+    async def _move_in_storage(self, source: str, path: str) -> None:
+        if self.use_gcs:
+            bucket = self._get_gcs_bucket()
+            blob = bucket.blob(source)
+            await asyncio.to_thread(bucket.copy_blob, blob, bucket, path)
+            await asyncio.to_thread(blob.delete)
+        else:
+            file_path = self.local_dir / path if isinstance(path, str) else path
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(self.local_dir / source, file_path)
+
     async def _delete_from_storage(self, path: str) -> None:
         if self.use_gcs:
             bucket = self._get_gcs_bucket()
             blob = bucket.blob(path)
-            blob.delete()
+            await asyncio.to_thread(blob.delete)
         else:
             file_path = self.local_dir / path if isinstance(path, str) else path
             if file_path.exists():
                 file_path.unlink()
 
+    def _list_storage(self, exclude: str = None):
+        """Every stored object as (path, size, updated) in path order, like a GCS listing, except under `exclude`"""
+        if self.use_gcs:
+            for blob in self._get_gcs_bucket().list_blobs():
+                if not (exclude and blob.name.startswith(exclude + "/")):
+                    yield blob.name, blob.size, blob.updated
+        elif self.local_dir.is_dir():
+            # Paths are what local_dir / path resolves to the object with, as stored on files rows
+            root = "" if self.local_dir.is_absolute() else str(self.local_dir) + os.sep
+            skip = str(self.local_dir / exclude) if exclude else None
+            for path, size, updated in self._walk_sorted(str(self.local_dir), skip):
+                yield path.removeprefix(root), size, updated
+
+    @classmethod
+    def _walk_sorted(cls, directory: str, skip: str = None):
+        # A directory sorts as "name/", so the walk yields whole paths in plain string order
+        entries = sorted(os.scandir(directory), key=lambda entry: entry.name + "/" if entry.is_dir() else entry.name)
+        for entry in entries:
+            if entry.is_dir():
+                if entry.path != skip:
+                    yield from cls._walk_sorted(entry.path, skip)
+            else:
+                stat = entry.stat()
+                yield entry.path, stat.st_size, datetime.fromtimestamp(stat.st_mtime, timezone.utc)
+
+    async def _storage_size(self, path: str) -> int:
+        """Size of a stored object from its metadata, without reading it"""
+        if self.use_gcs:
+            blob = await asyncio.to_thread(self._get_gcs_bucket().get_blob, path)
+            if blob is None:
+                raise FileNotFoundError(path)
+            return blob.size
+        return (self.local_dir / path if isinstance(path, str) else path).stat().st_size
+
+    async def _storage_exists(self, path: str) -> bool:
+        if self.use_gcs:
+            return await asyncio.to_thread(self._get_gcs_bucket().blob(path).exists)
+        return (self.local_dir / path if isinstance(path, str) else path).exists()
+
     def _generate_path(self, file_id: str, file_ext: str, user: dict) -> str:
         output = f"{user['user_id']}/{file_id}{file_ext}"  # Use user_id instead of email
         return output if self.use_gcs else str(self.local_dir / output)
 
+    @staticmethod
+    def _content_disposition(filename: str) -> str:
+        quoted = urllib.parse.quote(filename)
+        ascii_name = re.sub(r"[^\x00-\x7F]+", "_", filename)
+        return f'attachment; filename="{ascii_name}"; filename*=UTF-8\'\'{quoted}'
+
+    @staticmethod
+    def _transfer_key() -> str:
+        # With an empty key anyone could sign transfer URLs and upload tokens
+        if not settings.TRANSFER_SECRET:
+            raise RuntimeError("TRANSFER_SECRET is not set")
+        return settings.TRANSFER_SECRET
+
+    @classmethod
+    def _sign_transfer(cls, method: str, path: str, expires: int, filename: str = "") -> str:
+        message = f"{method}\n{path}\n{expires}\n{filename}".encode()
+        return hmac.new(cls._transfer_key().encode(), message, hashlib.sha256).hexdigest()
+
+    def _generate_signed_url(
+            self,
+            path: str,
+            method: str,
+            content_type: str = None,
+            filename: str = None
+    ) -> str:
+        """V4 signed URL on GCS, HMAC-signed URL served by the transfers router otherwise"""
+        if self.use_gcs:
+            blob = self._get_gcs_bucket().blob(path)
+            options = {}
+            if method == "PUT":
+                options["content_type"] = content_type
+                options["headers"] = {"x-goog-content-length-range": f"0,{MAX_FILE_SIZE}"}
+            elif filename:
+                options["response_disposition"] = self._content_disposition(filename)
+            return blob.generate_signed_url(
+                version="v4",
+                expiration=timedelta(seconds=settings.SIGNED_URL_EXPIRATION),
+                method=method,
+                **options
+            )
+
+        expires = int(time.time()) + settings.SIGNED_URL_EXPIRATION
+        params = {"expires": expires, "signature": self._sign_transfer(method, path, expires, filename or "")}
+        if filename:
+            params["filename"] = filename
+        return f"{settings.BASE_URL}/api/transfers/{urllib.parse.quote(path)}?{urllib.parse.urlencode(params)}"
+
+    def verify_transfer(self, method: str, path: str, expires: int, signature: str, filename: str = "") -> Path:
+        """Check a local signed URL and return the file it grants access to"""
+        if self.use_gcs:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+        if expires < time.time():
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Signed URL expired")
+        if not hmac.compare_digest(self._sign_transfer(method, path, expires, filename), signature):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid signature")
+        # The router decodes %2F, so a path could climb out of the storage directory
+        root = self.local_dir.resolve()
+        file_path = (self.local_dir / path).resolve()
+        if file_path == root or not file_path.is_relative_to(root):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid path")
+        return file_path
+
+    @staticmethod
+    async def write_transfer(file_path: Path, chunks) -> int:
+        """Stream a signed PUT body to disk without buffering it"""
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        size = 0
+        try:
+            with file_path.open("wb") as out:
+                async for chunk in chunks:
+                    size += len(chunk)
+                    if size > MAX_FILE_SIZE:
+                        raise HTTPException(
+                            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f"File exceeds {MAX_FILE_SIZE / (1024 * 1024):.0f}MB"
+                        )
+                    out.write(chunk)
+        except Exception:
+            file_path.unlink(missing_ok=True)
+            raise
+        return size
+
     @staticmethod
     async def _validate_files(files: list) -> None:
         if not files:
@@ -206,21 +348,60 @@ class FileService:
     @staticmethod
     async def _extract_text(content: bytes, file_ext: str) -> str:
         try:
-            if file_ext == ".pdf":
-                import PyPDF2
-                pdf_reader = PyPDF2.PdfReader(BytesIO(content))
-                text = "".join(page.extract_text() for page in pdf_reader.pages)
-                return text[:10000]
-            elif file_ext == ".txt":
-                return content.decode('utf-8')[:10000]
-            elif file_ext == ".json":
-                import json
-                return json.dumps(json.loads(content))[:10000]
-
+            if is_expensive(file_ext):
+                # Parsing is CPU heavy, keep the event loop free while it runs
+                return await asyncio.to_thread(extract_text, content, file_ext, settings.INDEX_MAX_CHARS)
+            return extract_text(content, file_ext, settings.INDEX_MAX_CHARS)
         except Exception as e:
             print(f"Text extraction failed: {e}")
             return ""
 
+    async def _register_file(
+            self,
+            db: AsyncSession,
+            file_id: str,
+            name: str,
+            file_ext: str,
+            content: bytes,
+            path: str,
+            current_user: dict,
+            operation: str = "upload"
+    ) -> dict:
+        """Extract and index an already stored object and add its File row (commit is left to the caller)"""
+        async with admission.extraction_slot():
+            with track_stage(operation, "extract", file_ext):
+                extracted_text = await self._extract_text(content, file_ext)
+                # Page count, JSON keys and fields come from one more parse of the document, off the event loop
+                preview, fields = await asyncio.to_thread(build_preview_and_fields, content, file_ext, extracted_text)
+
+        # Set here rather than by the column default so that the search document carries the same timestamp
+        created_at = datetime.utcnow()
+        db_file = File(
+            id=file_id,
+            name=name,
+            type=file_ext,
+            size=len(content),
+            owner_id=current_user["user_id"],
+            file_path=path,
+            created_at=created_at,
+            preview=FilePreview(file_id=file_id, **preview)
+        )
+        db.add(db_file)
+        with track_stage(operation, "index", file_ext):
+            await self.search.index(
+                db, file_id, extracted_text, owner_id=current_user["user_id"], fields=fields, file_type=file_ext,
+                created_at=created_at
+            )
+        await usage_service.record(db, current_user["user_id"], file_ext, len(content), 1)
+        await listing_cache.bump(db, current_user["user_id"])
+
+        return {
+            "id": file_id,
+            "name": name,
+            "type": file_ext,
+            "size": len(content)
+        }
+
     async def upload_files(
             self,
             files: List,
@@ -232,44 +413,194 @@ class FileService:
         uploaded = []
         async with db.begin():
             for file in files:
+                size = 0
                 try:
-                    file_id, mime_type, file_ext, content, size = await self._validate_and_extract_file(file)
+                    with track_stage("upload", "validate") as labels:
+                        file_id, mime_type, file_ext, content, size = await self._validate_and_extract_file(file)
+                        labels["file_type"] = file_ext
+                    bytes_in_flight.labels("upload").inc(size)
+
                     path = self._generate_path(file_id, file_ext, current_user)
-                    await self._upload_to_storage(file_id, content, path)
-
-                    extracted_text = await self._extract_text(content, file_ext)
-                    await self._index_file_content(file_id, extracted_text)
-
-                    db_file = File(
-                        id=file_id,
-                        name=file.filename,
-                        type=file_ext,
-                        size=size,
-                        owner_id=current_user["user_id"],
-                        file_path=path
-                    )
-                    db.add(db_file)
-                    await db.commit()
+                    with track_stage("upload", "storage", file_ext):
+                        await self._upload_to_storage(content, path)
 
-                    uploaded.append({
-                        "id": file_id,
-                        "name": file.filename,
-                        "type": file_ext,
-                        "size": size
-                    })
+                    uploaded.append(
+                        await self._register_file(db, file_id, file.filename, file_ext, content, path, current_user)
+                    )
+                    with track_stage("upload", "db_commit", file_ext):
+                        await db.commit()
 
                     files_uploaded.inc()
                     upload_size_bytes.observe(size)
 
+                except AdmissionRejected:
+                    upload_failures.inc()
+                    await db.rollback()
+                    raise
                 except Exception as e:
+                    upload_failures.inc()
                     await db.rollback()
                     raise HTTPException(
                         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                         detail=f"Failed to upload {file.filename}: {str(e)}"
                     )
+                finally:
+                    bytes_in_flight.labels("upload").dec(size)
 
         return {"uploaded": uploaded, "count": len(uploaded)}
 
+    @staticmethod
+    def _validate_declared_file(filename: str, content_type: str, size: int) -> str:
+        """Validate what a client announces before sending the bytes; returns the file extension"""
+        if not filename:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="File has no name"
+            )
+        file_ext = ALLOWED_MIME_TYPES.get(content_type)
+        if not file_ext:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"File type {content_type} not allowed. Only .json, .txt, .pdf are accepted."
+            )
+        if size <= 0:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="File size must be positive"
+            )
+        if size > MAX_FILE_SIZE:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"File exceeds {MAX_FILE_SIZE / (1024 * 1024):.0f}MB"
+            )
+        return file_ext
+
+    async def _complete_stored_upload(
+            self,
+            db: AsyncSession,
+            file_id: str,
+            name: str,
+            file_ext: str,
+            content: bytes,
+            path: str,
+            current_user: dict,
+            operation: str
+    ) -> dict:
+        """Register an object that is already in storage and commit, counting the upload either way"""
+        try:
+            uploaded = await self._register_file(
+                db, file_id, name, file_ext, content, path, current_user, operation=operation
+            )
+            with track_stage(operation, "db_commit", file_ext):
+                await db.commit()
+        except IntegrityError:
+            # A concurrent completion of the same upload committed the row first
+            upload_failures.inc()
+            await db.rollback()
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Upload already completed")
+        except AdmissionRejected:
+            upload_failures.inc()
+            await db.rollback()
+            raise
+        except Exception as e:
+            upload_failures.inc()
+            await db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to register {name}: {str(e)}"
+            )
+
+        files_uploaded.inc()
+        upload_size_bytes.observe(len(content))
+
+        return uploaded
+
+    async def create_direct_upload(
+            self,
+            filename: str,
+            content_type: str,
+            size: int,
+            current_user: dict
+    ) -> dict:
+        """Reserve a file id and return a short-lived signed URL the client uploads the bytes to"""
+        file_ext = self._validate_declared_file(filename, content_type, size)
+
+        file_id = str(uuid.uuid4())
+        path = self._generate_path(file_id, file_ext, current_user)
+        upload_token = jwt.encode(
+            {
+                "purpose": "direct_upload",
+                "file_id": file_id,
+                "name": filename,
+                "type": file_ext,
+                "path": path,
+                "owner_id": current_user["user_id"],
+                "aud": UPLOAD_TOKEN_AUDIENCE,
+                "exp": datetime.utcnow() + timedelta(seconds=2 * settings.SIGNED_URL_EXPIRATION)
+            },
+            self._transfer_key(),
+            algorithm=settings.JWT_ALGORITHM
+        )
+
+        headers = {"Content-Type": content_type}
+        if self.use_gcs:
+            headers["x-goog-content-length-range"] = f"0,{MAX_FILE_SIZE}"
+
+        return {
+            "file_id": file_id,
+            "upload_url": self._generate_signed_url(path, "PUT", content_type=content_type),
+            "method": "PUT",
+            "headers": headers,
+            "upload_token": upload_token,
+            "expires_in": settings.SIGNED_URL_EXPIRATION
+        }
+
+    async def complete_direct_upload(
+            self,
+            upload_token: str,
+            db: AsyncSession,
+            current_user: dict
+    ) -> dict:
+        """Completion callback: register the directly uploaded object, extract and index it"""
+        try:
+            ticket = jwt.decode(
+                upload_token, self._transfer_key(), algorithms=[settings.JWT_ALGORITHM], audience=UPLOAD_TOKEN_AUDIENCE
+            )
+        except jwt.InvalidTokenError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid upload token")
+
+        if ticket.get("purpose") != "direct_upload":
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid upload token")
+        if ticket["owner_id"] != current_user["user_id"]:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+
+        result = await db.execute(select(File.id).where(File.id == ticket["file_id"]))
+        if result.scalar_one_or_none():
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Upload already completed")
+
+        try:
+            size = await self._storage_size(ticket["path"])
+        except Exception:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Uploaded file not found")
+
+        if size > MAX_FILE_SIZE:
+            await self._delete_from_storage(ticket["path"])
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"File exceeds {MAX_FILE_SIZE / (1024 * 1024):.0f}MB"
+            )
+
+        # The request body is tiny, the object is read into this process: admit it by its stored size
+        admission.admit_upload(size)
+        try:
+            content = await self._download_from_storage(ticket["path"])
+            return await self._complete_stored_upload(
+                db, ticket["file_id"], ticket["name"], ticket["type"], content, ticket["path"], current_user,
+                operation="direct_upload"
+            )
+        finally:
+            admission.release_upload(size)
+
     async def list_files(
             self,
             db: AsyncSession,
@@ -278,25 +609,86 @@ class FileService:
             limit: int = 50,
             search: str = None,
             file_type: str = None,
-            extension: bool = False
+            extension: bool = False,
+            where: List[str] = None
     ) -> List[File]:
-        if search:
-            file_ids = await self._search_file_content(search, limit)
-            if not file_ids:
-                return []
-            stmt = select(File).where(File.id.in_(file_ids))
+        """`where` holds JSON field filters such as status=failed or retries>=3, answered by the search backend"""
+        filters = parse_filters(where) if where else None
+        if search or filters:
+            with track_stage("list", "search", file_type or ""):
+                return await self.search.search(
+                    db,
+                    search,
+                    owner_id=None if extension else current_user["user_id"],
+                    file_type=file_type,
+                    skip=skip,
+                    limit=limit,
+                    filters=filters
+                )
+
+        if not extension:
+            stmt = select(File).where(File.owner_id == current_user["user_id"])  # Use user_id
         else:
-            if not extension:
-                stmt = select(File).where(File.owner_id == current_user["user_id"])  # Use user_id
-            else:
-                stmt = select(File)
+            stmt = select(File)
 
         if file_type:
             stmt = stmt.where(File.type == file_type)
 
-        stmt = stmt.order_by(File.created_at.desc()).offset(skip).limit(limit)
-        result = await db.execute(stmt)
-        return result.scalars().all()
+        stmt = stmt.options(selectinload(File.preview)).order_by(File.created_at.desc()).offset(skip).limit(limit)
+        with track_stage("list", "db_query", file_type or ""):
+            result = await db.execute(stmt)
+            db_files = result.scalars().all()
+        return db_files
+
+    async def list_files_conditional(
+            self,
+            db: AsyncSession,
+            current_user: dict,
+            skip: int = 0,
+            limit: int = 50,
+            file_type: str = None,
+            if_none_match: str = None
+    ) -> Response:
+        """The owner's listing tagged with their listing version: 304 without a query when the client is current"""
+        owner_id = current_user["user_id"]
+        version = await listing_cache.version(db, owner_id)
+        headers = {
+            "ETag": listing_cache.etag(owner_id, version),
+            "Cache-Control": "private, no-cache",
+            "Vary": "Authorization"
+        }
+        if listing_cache.matches(if_none_match, headers["ETag"]):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        # Only first pages are kept, that is what the frontend asks for on every navigation
+        body = listing_cache.page(owner_id, version, limit, file_type) if skip == 0 else None
+        if body is None:
+            db_files = await self.list_files(db, current_user, skip=skip, limit=limit, file_type=file_type)
+            body = JSONResponse(jsonable_encoder(db_files)).body
+            if skip == 0:
+                listing_cache.store_page(owner_id, version, limit, file_type, body)
+        return Response(body, media_type="application/json", headers=headers)
+
+    async def suggest_files(
+            self,
+            db: AsyncSession,
+            current_user: dict,
+            prefix: str,
+            limit: int = 10
+    ) -> list:
+        """Filename search-as-you-type, answered by the (owner_id, lower(name)) index"""
+        if not prefix:
+            return []
+        pattern = re.sub(r"([\\%_])", r"\\\1", prefix.lower()) + "%"
+        stmt = (
+            select(File.id, File.name, File.type)
+            .where(File.owner_id == current_user["user_id"], name_prefix_key.like(pattern, escape="\\"))
+            .order_by(name_prefix_key)
+            .limit(min(limit, MAX_SUGGESTIONS))
+        )
+        with track_stage("suggest", "db_query"):
+            result = await db.execute(stmt)
+        return [{"id": row.id, "name": row.name, "type": row.type} for row in result]
 
     async def download_file(
             self,
@@ -305,8 +697,9 @@ class FileService:
             current_user: dict
     ) -> StreamingResponse:
 
-        result = await db.execute(select(File).where(File.id == file_id))
-        db_file = result.scalar_one_or_none()
+        with track_stage("download", "db_lookup"):
+            result = await db.execute(select(File).where(File.id == file_id))
+            db_file = result.scalar_one_or_none()
 
         if not db_file:
             raise HTTPException(
@@ -320,25 +713,158 @@ class FileService:
             )
 
         try:
-            content = await self._download_from_storage(db_file.file_path)
+            with track_stage("download", "storage", db_file.type):
+                content = await self._download_from_storage(db_file.file_path)
         except Exception:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to read file"
             )
 
-        filename = db_file.name
-        quoted = urllib.parse.quote(filename)
-        ascii_name = re.sub(r"[^\x00-\x7F]+", "_", filename)
-
         headers = {
-            "Content-Disposition": f'attachment; filename="{ascii_name}"; filename*=UTF-8\'\'{quoted}'
+            "Content-Disposition": self._content_disposition(db_file.name)
         }
 
         files_downloaded.inc()
         download_size_bytes.observe(len(content))
 
-        return StreamingResponse(BytesIO(content), media_type=db_file.type, headers=headers)
+        return StreamingResponse(self._track_download(content), media_type=db_file.type, headers=headers)
+
+    @staticmethod
+    async def _track_download(content: bytes):
+        bytes_in_flight.labels("download").inc(len(content))
+        try:
+            yield content
+        finally:
+            bytes_in_flight.labels("download").dec(len(content))
+
+    @staticmethod
+    def _archive_name(name: str, used: set) -> str:
+        name = re.sub(r"[/\\]", "_", name or "file")
+        stem, suffix = os.path.splitext(name)
+        candidate, n = name, 1
+        while candidate in used:
+            candidate = f"{stem} ({n}){suffix}"
+            n += 1
+        used.add(candidate)
+        return candidate
+
+    async def _prefetch_blob(self, db_file: File, queue: asyncio.Queue) -> None:
+        try:
+            async for chunk in self._stream_from_storage(db_file.file_path):
+                await queue.put(chunk)
+            await queue.put(None)
+        except Exception as e:
+            await queue.put(e)
+
+    async def _stream_archive(self, db_files: List[File]):
+        """Yield a ZIP archive of db_files while at most ARCHIVE_PREFETCH_FILES blobs are being fetched"""
+        remaining = iter(db_files)
+        pending = deque()
+
+        def prefetch_next():
+            db_file = next(remaining, None)
+            if db_file is not None:
+                queue = asyncio.Queue(maxsize=ARCHIVE_PREFETCH_CHUNKS)
+                pending.append((db_file, queue, asyncio.create_task(self._prefetch_blob(db_file, queue))))
+
+        for _ in range(ARCHIVE_PREFETCH_FILES):
+            prefetch_next()
+
+        sink = _ArchiveSink()
+        used_names = set()
+        try:
+            with zipfile.ZipFile(sink, "w") as archive:
+                while pending:
+                    db_file, queue, _ = pending.popleft()
+                    prefetch_next()
+
+                    info = zipfile.ZipInfo(
+                        self._archive_name(db_file.name, used_names),
+                        date_time=(db_file.created_at or datetime.utcnow()).timetuple()[:6]
+                    )
+                    # PDFs are already compressed, deflating them again only costs CPU
+                    info.compress_type = zipfile.ZIP_STORED if db_file.type == ".pdf" else zipfile.ZIP_DEFLATED
+                    info.file_size = db_file.size or 0
+
+                    with archive.open(info, "w") as entry:
+                        while (chunk := await queue.get()) is not None:
+                            if isinstance(chunk, Exception):
+                                raise chunk
+                            entry.write(chunk)
+                            if data := sink.drain():
+                                yield data
+            yield sink.drain()
+        finally:
+            for _, _, task in pending:
+                task.cancel()
+
+    async def download_archive(
+            self,
+            file_ids: List[str],
+            db: AsyncSession,
+            current_user: dict
+    ) -> StreamingResponse:
+        file_ids = list(dict.fromkeys(file_ids))
+        if not file_ids:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="No files requested"
+            )
+        if len(file_ids) > MAX_FILES_PER_ARCHIVE:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Maximum {MAX_FILES_PER_ARCHIVE} files per archive"
+            )
+
+        result = await db.execute(
+            select(File).where(File.id.in_(file_ids), File.owner_id == current_user["user_id"])
+        )
+        owned = {db_file.id: db_file for db_file in result.scalars().all()}
+        if len(owned) != len(file_ids):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="File not found"
+            )
+
+        db_files = [owned[file_id] for file_id in file_ids]
+        for db_file in db_files:
+            files_downloaded.inc()
+            download_size_bytes.observe(db_file.size or 0)
+
+        headers = {
+            "Content-Disposition": self._content_disposition("files.zip")
+        }
+        return StreamingResponse(self._stream_archive(db_files), media_type="application/zip", headers=headers)
+
+    async def create_download_url(
+            self,
+            file_id: str,
+            db: AsyncSession,
+            current_user: dict
+    ) -> dict:
+        result = await db.execute(select(File).where(File.id == file_id))
+        db_file = result.scalar_one_or_none()
+
+        if not db_file:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="File not found"
+            )
+        if str(db_file.owner_id) != current_user["user_id"]:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not authorized"
+            )
+
+        files_downloaded.inc()
+        download_size_bytes.observe(db_file.size or 0)
+
+        return {
+            "file_id": file_id,
+            "download_url": self._generate_signed_url(db_file.file_path, "GET", filename=db_file.name),
+            "expires_in": settings.SIGNED_URL_EXPIRATION
+        }
 
     async def delete_file(
             self,
@@ -347,8 +873,9 @@ class FileService:
             current_user: dict
     ) -> None:
         """Delete file from storage, database, and search index"""
-        result = await db.execute(select(File).where(File.id == file_id))
-        db_file = result.scalar_one_or_none()
+        with track_stage("delete", "db_lookup"):
+            result = await db.execute(select(File).where(File.id == file_id))
+            db_file = result.scalar_one_or_none()
 
         if not db_file:
             raise HTTPException(
@@ -362,11 +889,17 @@ class FileService:
             )
 
         try:
-            backup = await self._download_from_storage(db_file.file_path)
-            await self._delete_from_storage(db_file.file_path)
-            await self._delete_from_search_index(db_file.id)
-            await db.delete(db_file)
-            await db.commit()
+            with track_stage("delete", "storage_backup", db_file.type):
+                backup = await self._download_from_storage(db_file.file_path)
+            with track_stage("delete", "storage", db_file.type):
+                await self._delete_from_storage(db_file.file_path)
+            with track_stage("delete", "index", db_file.type):
+                await self.search.delete(db, db_file.id, owner_id=db_file.owner_id)
+            with track_stage("delete", "db_commit", db_file.type):
+                await db.delete(db_file)
+                await usage_service.record(db, db_file.owner_id, db_file.type, db_file.size, -1)
+                await listing_cache.bump(db, db_file.owner_id)
+                await db.commit()
 
             files_deleted.inc()
 
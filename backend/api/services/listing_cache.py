@@ -0,0 +1,132 @@
+import asyncio
+import hashlib
+from collections import OrderedDict
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.settings import settings
+from models.listing_version import ListingVersion
+
+CHANNEL = "listing_versions"
+LISTENER_CHECK_INTERVAL = 5  # seconds between checks that the listening connection is still open
+LISTENER_RETRY_DELAY = 5
+
+
+class ListingCache:
+    """Per-owner listing versions, and the serialized first page of each owner's listing.
+
+    A version is a counter in listing_versions, bumped in the transaction of every change to an owner's files and
+    announced with NOTIFY, which Postgres delivers on commit. Every process keeps the versions it has seen and applies
+    the notifications, so a conditional listing request is answered from memory across gunicorn workers. While the
+    listener is not connected, versions are read from the database on every request instead.
+    """
+
+    def __init__(
+            self,
+            max_owners: int = settings.LISTING_CACHE_OWNERS,
+            max_bytes: int = settings.LISTING_CACHE_MAX_BYTES
+    ):
+        self.max_owners = max_owners
+        self.max_bytes = max_bytes
+        self.listening = False
+        self._versions = OrderedDict()
+        self._pages = OrderedDict()  # (owner, version, limit, file_type) -> response body
+        self._page_bytes = 0
+
+    async def bump(self, db: AsyncSession, owner_id) -> None:
+        """Count a change to the owner's files inside the caller's transaction"""
+        stmt = pg_insert(ListingVersion).values(owner_id=owner_id, version=1)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ListingVersion.owner_id],
+            set_={"version": ListingVersion.version + 1}
+        ).returning(ListingVersion.version)
+        version = (await db.execute(stmt)).scalar_one()
+        await db.execute(select(func.pg_notify(CHANNEL, f"{owner_id}:{version}")))
+        # The owner may list again before the notification reaches this process
+        self._versions.pop(str(owner_id), None)
+
+    def _remember(self, owner: str, version: int) -> None:
+        # A notification may have delivered a newer version while the database read was in flight
+        self._versions[owner] = max(version, self._versions.get(owner, 0))
+        self._versions.move_to_end(owner)
+        while len(self._versions) > self.max_owners:
+            self._versions.popitem(last=False)
+
+    async def version(self, db: AsyncSession, owner_id) -> int:
+        owner = str(owner_id)
+        if self.listening and owner in self._versions:
+            self._versions.move_to_end(owner)
+            return self._versions[owner]
+        result = await db.execute(select(ListingVersion.version).where(ListingVersion.owner_id == owner_id))
+        version = result.scalar_one_or_none() or 0
+        if self.listening:
+            self._remember(owner, version)
+        return version
+
+    @staticmethod
+    def etag(owner_id, version: int) -> str:
+        # Versions are per owner, so the tag names the owner too: a shared cache or another account on the same
+        # browser never revalidates one user's listing with another's tag
+        owner = hashlib.sha1(str(owner_id).encode()).hexdigest()[:12]
+        return f'W/"{owner}-{version}"'
+
+    @staticmethod
+    def matches(if_none_match: str, etag: str) -> bool:
+        """Weak comparison of an If-None-Match header against the current ETag"""
+        if not if_none_match:
+            return False
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag.removeprefix("W/") in tags
+
+    def page(self, owner_id, version: int, limit: int, file_type: str):
+        key = (str(owner_id), version, limit, file_type)
+        body = self._pages.get(key)
+        if body is not None:
+            self._pages.move_to_end(key)
+        return body
+
+    def store_page(self, owner_id, version: int, limit: int, file_type: str, body: bytes) -> None:
+        if len(body) > self.max_bytes:
+            return
+        key = (str(owner_id), version, limit, file_type)
+        if key in self._pages:
+            self._page_bytes -= len(self._pages.pop(key))
+        self._pages[key] = body
+        self._page_bytes += len(body)
+        # Pages of older versions are never asked for again and age out first
+        while self._page_bytes > self.max_bytes:
+            _, evicted = self._pages.popitem(last=False)
+            self._page_bytes -= len(evicted)
+
+    def _notified(self, connection, pid, channel, payload: str) -> None:
+        owner, _, version = payload.rpartition(":")
+        self._remember(owner, int(version))
+
+    async def run_listener(self, engine) -> None:
+        while True:
+            try:
+                async with engine.connect() as conn:
+                    driver = (await conn.get_raw_connection()).driver_connection
+                    await driver.add_listener(CHANNEL, self._notified)
+                    try:
+                        self.listening = True
+                        while not driver.is_closed():
+                            await asyncio.sleep(LISTENER_CHECK_INTERVAL)
+                    finally:
+                        self.listening = False
+                        if not driver.is_closed():
+                            await driver.remove_listener(CHANNEL, self._notified)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠ Warning: Listing version listener failed: {e}")
+            finally:
+                # Notifications may have been missed while disconnected
+                self.listening = False
+                self._versions.clear()
+            await asyncio.sleep(LISTENER_RETRY_DELAY)
+
+
+listing_cache = ListingCache()
@@ -0,0 +1,117 @@
+import asyncio
+from io import BytesIO
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from api.services.extractors import extract_text
+from api.services.fields import flatten_document, load_json
+from api.services.listing_cache import listing_cache
+from models.file import File, FilePreview
+
+PREVIEW_CHARS = 500
+PREVIEW_MAX_KEYS = 50
+
+
+def _pdf_page_count(content: bytes) -> int:
+    import PyPDF2
+    return len(PyPDF2.PdfReader(BytesIO(content)).pages)
+
+
+def _json_keys(document):
+    return list(document)[:PREVIEW_MAX_KEYS] if isinstance(document, dict) else None
+
+
+def build_preview(content: bytes, file_ext: str, text: str, document=None) -> dict:
+    """Column values of a file's FilePreview; text is its extracted text, of which only the start is kept.
+
+    `document` is the parsed JSON of a .json file when the caller has it already.
+    """
+    preview = {
+        "snippet": " ".join(text[:2 * PREVIEW_CHARS].split())[:PREVIEW_CHARS],
+        "page_count": None,
+        "json_keys": None
+    }
+    try:
+        if file_ext == ".pdf":
+            preview["page_count"] = _pdf_page_count(content)
+        elif file_ext == ".json":
+            preview["json_keys"] = _json_keys(load_json(content) if document is None else document)
+    except Exception as e:
+        print(f"Preview failed: {e}")
+    return preview
+
+
+def build_preview_and_fields(content: bytes, file_ext: str, text: str) -> tuple:
+    """The FilePreview values and the indexed fields of an upload, parsing a JSON document once for both"""
+    if file_ext != ".json":
+        return build_preview(content, file_ext, text), []
+    document = load_json(content)
+    return build_preview(content, file_ext, text, document), flatten_document(document)
+
+
+class PreviewBackfill:
+    """Computes the previews of files registered before previews existed.
+
+    Files without a preview are read in id order, `batch_size` at a time, with up to `concurrency` downloads and
+    extractions in flight; each batch is inserted with one statement and committed, so an interrupted run resumes
+    where it stopped. Only PREVIEW_CHARS of text are extracted per file.
+    """
+
+    def __init__(self, files, session_factory, concurrency: int = 8, batch_size: int = 100):
+        self.files = files
+        self.session_factory = session_factory
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.stats = dict.fromkeys(("previewed", "failed"), 0)
+
+    async def _missing(self, after: str) -> list:
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(File.id, File.type, File.file_path, File.owner_id)
+                .outerjoin(FilePreview, FilePreview.file_id == File.id)
+                .where(FilePreview.file_id.is_(None), File.id > after)
+                .order_by(File.id)
+                .limit(self.batch_size)
+            )
+            return result.all()
+
+    async def _preview(self, file_id: str, file_ext: str, path: str, slots: asyncio.Semaphore):
+        async with slots:
+            try:
+                content = await self.files._download_from_storage(path)
+                text = await asyncio.to_thread(extract_text, content, file_ext, PREVIEW_CHARS, None)
+                return {"file_id": file_id, **await asyncio.to_thread(build_preview, content, file_ext, text)}
+            except Exception as e:
+                self.stats["failed"] += 1
+                print(f"⚠ Warning: Failed to preview {file_id}: {e}")
+                return None
+
+    async def run(self) -> dict:
+        slots = asyncio.Semaphore(self.concurrency)
+        after = ""
+        while rows := await self._missing(after):
+            after = rows[-1].id
+            owners = {row.id: row.owner_id for row in rows}
+            previews = await asyncio.gather(*[self._preview(row.id, row.type, row.file_path, slots) for row in rows])
+            previews = [preview for preview in previews if preview]
+            if previews:
+                async with self.session_factory() as db:
+                    # A file deleted meanwhile fails the foreign key, so insert only those still present
+                    existing = select(File.id).where(File.id.in_([preview["file_id"] for preview in previews]))
+                    present = set((await db.execute(existing)).scalars().all())
+                    rows_to_insert = [preview for preview in previews if preview["file_id"] in present]
+                    inserted = []
+                    if rows_to_insert:
+                        result = await db.execute(
+                            pg_insert(FilePreview).values(rows_to_insert).on_conflict_do_nothing()
+                            .returning(FilePreview.file_id)
+                        )
+                        inserted = result.scalars().all()
+                    # Cached listings embed previews, so their owners' listings change with this commit
+                    for owner_id in sorted({str(owners[file_id]) for file_id in inserted}):
+                        await listing_cache.bump(db, owner_id)
+                    await db.commit()
+                self.stats["previewed"] += len(inserted)
+            print(f"previewed {self.stats['previewed']} files, {self.stats['failed']} failed", flush=True)
+        return self.stats
@@ -0,0 +1,277 @@
+import asyncio
+import itertools
+import json
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, select
+
+from api.services.extractors import extract_text
+from api.services.fields import extract_fields
+from api.services.listing_cache import listing_cache
+from api.services.search import ElasticsearchSearch, SearchDocument
+from api.services.upload_sessions import CHUNK_PREFIX
+from api.services.usage import usage_service
+from core.settings import settings
+from models.file import File, id_key, path_key
+
+RECONCILE_BATCH_SIZE = 1000
+MAX_SAMPLES = 20
+MAX_MISSING_OBJECTS = 1000  # more rows without their object than this abort a repair
+MAX_MISSING_RATIO = 0.05  # as does this share of the rows
+DISCREPANCIES = (
+    "orphan_objects", "missing_objects", "orphan_documents", "missing_documents", "legacy_documents", "stale_documents"
+)
+
+
+async def _pull(iterator, batch_size: int):
+    """Items of a blocking iterator (a storage listing), fetched in a thread one batch at a time"""
+    while batch := await asyncio.to_thread(list, itertools.islice(iterator, batch_size)):
+        for item in batch:
+            yield item
+
+
+async def _ordered(items, key, name: str):
+    # A merge join over an unsorted input reports every row after the first inversion, so refuse to go on
+    previous = None
+    async for item in items:
+        if previous is not None and key(item) <= previous:
+            raise RuntimeError(f"{name} is not in ascending order at {key(item)!r}")
+        previous = key(item)
+        yield item
+
+
+async def merge_join(left, right, left_key, right_key):
+    """Full outer join of two async iterables sorted on unique keys, as (left item or None, right item or None)"""
+    left, right = aiter(left), aiter(right)
+    a, b = await anext(left, None), await anext(right, None)
+    while a is not None or b is not None:
+        if b is None or (a is not None and left_key(a) < right_key(b)):
+            yield a, None
+            a = await anext(left, None)
+        elif a is None or right_key(b) < left_key(a):
+            yield None, b
+            b = await anext(right, None)
+        else:
+            yield a, b
+            a, b = await anext(left, None), await anext(right, None)
+
+
+class Reconciler:
+    """Finds what crashed uploads and deletes left behind in storage, the files table and the search index.
+
+    Each pair of inventories is streamed in the same order and merge-joined, so memory stays bounded by the batch
+    size whatever the number of files: the storage listing against a keyset scan of files by path, and an
+    Elasticsearch point-in-time scan against a keyset scan by id. The Postgres search backend writes in the files
+    transaction and cascades on delete, so it has nothing to reconcile.
+
+    Objects and index documents younger than `grace` are left alone, since uploads store the object and index the
+    document before the row is committed. Documents indexed before file_id was stored are reported by _id as legacy,
+    and their rows as missing from the index. Documents without the owner or type of their row are stale, since
+    every search filters on both, and so are those without created_at, which field filter listings sort on. With
+    `repair`, each discrepancy is checked again right before it is fixed: orphan objects, orphan and legacy index
+    documents are deleted, rows missing from the index are re-indexed, and stale documents are deleted and indexed
+    again. Rows whose object is gone are only deleted, with their usage, with
+    `delete_missing_rows`, once the whole listing was compared; more than `max_missing` of them, or more than
+    `max_missing_ratio` of the rows, abort the repair instead, since they point at the wrong bucket or directory
+    rather than at lost objects.
+    """
+
+    def __init__(
+            self,
+            files,
+            session_factory,
+            repair: bool = False,
+            grace: timedelta = timedelta(hours=24),
+            batch_size: int = RECONCILE_BATCH_SIZE,
+            output=None,
+            delete_missing_rows: bool = False,
+            max_missing: int = MAX_MISSING_OBJECTS,
+            max_missing_ratio: float = MAX_MISSING_RATIO
+    ):
+        self.files = files
+        self.session_factory = session_factory
+        self.repair = repair
+        self.grace = grace
+        self.batch_size = batch_size
+        self.output = output  # file receiving every discrepancy as a JSON line
+        self.delete_missing_rows = delete_missing_rows
+        self.max_missing = max_missing
+        self.max_missing_ratio = max_missing_ratio
+        self.aborted = None  # why the repair stopped, if it did
+        self.counts = dict.fromkeys(
+            ("objects", "rows", "documents", "recent_objects", "recent_documents", "repaired", *DISCREPANCIES), 0
+        )
+        self.samples = {kind: [] for kind in DISCREPANCIES}
+        self._pending = {kind: [] for kind in DISCREPANCIES}
+
+    async def _rows(self, key, column: str):
+        """Every files row in `key` order, one keyset page at a time"""
+        after = None
+        while True:
+            async with self.session_factory() as db:
+                stmt = select(File.id, File.file_path, File.owner_id, File.type, File.size, File.created_at)
+                stmt = stmt.where(key.isnot(None))
+                if after is not None:
+                    stmt = stmt.where(key > after)
+                rows = (await db.execute(stmt.order_by(key).limit(self.batch_size))).all()
+            if not rows:
+                return
+            after = getattr(rows[-1], column)
+            for row in rows:
+                yield row
+
+    async def _report(self, kind: str, key: str, item) -> None:
+        self.counts[kind] += 1
+        if len(self.samples[kind]) < MAX_SAMPLES:
+            self.samples[kind].append(key)
+        if self.output:
+            self.output.write(json.dumps({"kind": kind, "key": key}) + "\n")
+        if not self.repair or self.aborted:
+            return
+        if kind == "missing_objects":
+            # Held until the storage listing is compared in full, so the abort thresholds see every one of them
+            if self.counts[kind] > self.max_missing:
+                self._abort(f"more than {self.max_missing} rows have no stored object")
+            elif self.delete_missing_rows:
+                self._pending[kind].append(item)
+            return
+        self._pending[kind].append(item)
+        if len(self._pending[kind]) >= self.batch_size:
+            await self._repair(kind)
+
+    def _abort(self, reason: str) -> None:
+        self.aborted = reason
+        self._pending = {kind: [] for kind in DISCREPANCIES}
+
+    async def check_storage(self) -> None:
+        listing = _pull(self.files._list_storage(exclude=CHUNK_PREFIX), self.batch_size)
+        objects = _ordered(listing, lambda item: item[0], "storage listing")
+        rows = _ordered(self._rows(path_key, "file_path"), lambda row: row.file_path, "files by path")
+        cutoff = datetime.now(timezone.utc) - self.grace
+        async for stored, row in merge_join(objects, rows, lambda item: item[0], lambda row: row.file_path):
+            if stored:
+                self.counts["objects"] += 1
+            if row:
+                self.counts["rows"] += 1
+            if stored and not row:
+                if stored[2] and stored[2] > cutoff:
+                    self.counts["recent_objects"] += 1
+                else:
+                    await self._report("orphan_objects", stored[0], stored[0])
+            elif row and not stored:
+                await self._report("missing_objects", row.file_path, row)
+
+        missing, rows = self.counts["missing_objects"], self.counts["rows"]
+        if self.repair and not self.aborted and rows and missing / rows > self.max_missing_ratio:
+            self._abort(f"{missing} of {rows} rows have no stored object")
+
+    async def _with_file_ids(self, documents):
+        # Documents without a file_id sort first and cannot take part in the merge join; their rows are reported as
+        # missing documents. They are deleted before any of those rows is re-indexed under the same _id.
+        legacy = True
+        async for document in documents:
+            self.counts["documents"] += 1
+            if document.file_id is None:
+                await self._report("legacy_documents", document.doc_id, document.doc_id)
+                continue
+            if legacy:
+                legacy = False
+                await self._repair("legacy_documents")
+            yield document
+        await self._repair("legacy_documents")
+
+    async def check_index(self) -> None:
+        scan = self._with_file_ids(self.files.search.scan_documents(self.batch_size))
+        documents = _ordered(scan, lambda document: document.file_id, "search index")
+        rows = _ordered(self._rows(id_key, "id"), lambda row: row.id, "files by id")
+        cutoff = datetime.now(timezone.utc) - self.grace
+        async for document, row in merge_join(documents, rows, lambda document: document.file_id, lambda row: row.id):
+            if document and not row:
+                if document.created_at and document.created_at > cutoff:
+                    self.counts["recent_documents"] += 1
+                else:
+                    await self._report("orphan_documents", document.file_id, document.file_id)
+            elif row and not document:
+                await self._report("missing_documents", row.id, row)
+            elif row and (
+                    document.owner_id != str(row.owner_id) or document.file_type != row.type or not document.created_at
+            ):
+                await self._report("stale_documents", row.id, row)
+
+    async def _existing_ids(self, ids: list) -> set:
+        async with self.session_factory() as db:
+            return set((await db.execute(select(File.id).where(File.id.in_(ids)))).scalars().all())
+
+    async def _reindex(self, rows: list) -> None:
+        documents = []
+        for row in rows:
+            try:
+                content = await self.files._download_from_storage(row.file_path)
+            except Exception:
+                continue  # also missing from storage, reported there
+            text = await asyncio.to_thread(extract_text, content, row.type, settings.INDEX_MAX_CHARS, None)
+            fields = await asyncio.to_thread(extract_fields, content, row.type)
+            documents.append(SearchDocument(row.id, text, row.owner_id, fields, row.type, row.created_at))
+        await self.files.search.index_many(None, documents)
+        self.counts["repaired"] += len(documents)
+
+    async def _repair(self, kind: str) -> None:
+        items, self._pending[kind] = self._pending[kind], []
+        if not items or self.aborted:
+            return
+        if kind == "orphan_objects":
+            async with self.session_factory() as db:
+                result = await db.execute(select(File.file_path).where(File.file_path.in_(items)))
+                registered = set(result.scalars().all())
+            for path in items:
+                if path not in registered:
+                    await self.files._delete_from_storage(path)
+                    self.counts["repaired"] += 1
+        elif kind == "orphan_documents":
+            registered = await self._existing_ids(items)
+            for file_id in items:
+                if file_id not in registered:
+                    await self.files.search.delete(None, file_id)
+                    self.counts["repaired"] += 1
+        elif kind == "missing_objects":
+            gone = [row for row in items if not await self.files._storage_exists(row.file_path)]
+            await self._delete_rows(gone)
+        elif kind == "legacy_documents":
+            # By _id on every shard: with routing, a row's new document may live on another shard than its legacy one
+            await self.files.search.delete_documents(items)
+            self.counts["repaired"] += len(items)
+        elif kind == "stale_documents":
+            for row in items:
+                # Without the owner, the delete reaches the unrouted document and its passages on any shard
+                await self.files.search.delete(None, row.id)
+            await self._reindex(items)
+        else:
+            await self._reindex(items)
+
+    async def _delete_rows(self, rows: list) -> None:
+        if not rows:
+            return
+        async with self.session_factory() as db:
+            stmt = delete(File).where(File.id.in_([row.id for row in rows]))
+            result = await db.execute(stmt.returning(File.id, File.owner_id, File.type, File.size))
+            deleted = result.all()
+            for _, owner_id, file_type, size in deleted:
+                await usage_service.record(db, owner_id, file_type, size, -1)
+            for owner_id in {owner_id for _, owner_id, _, _ in deleted}:
+                await listing_cache.bump(db, owner_id)
+            await db.commit()
+        for file_id, owner_id, _, _ in deleted:
+            await self.files.search.delete(None, file_id, owner_id=owner_id)
+        self.counts["repaired"] += len(deleted)
+
+    async def run(self) -> dict:
+        await self.check_storage()
+        await self._repair("missing_objects")
+        if isinstance(self.files.search, ElasticsearchSearch):
+            await self.check_index()
+        for kind in DISCREPANCIES:
+            await self._repair(kind)
+        report = {**self.counts, "samples": self.samples}
+        if self.aborted:
+            report["repair_aborted"] = self.aborted
+        return report
@@ -0,0 +1,644 @@
+import asyncio
+import operator
+from datetime import datetime, timezone
+from typing import List, NamedTuple
+
+from sqlalchemy import desc, func, literal, or_, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from api.services.fields import RANGE_OPERATORS
+from core.settings import settings
+from db import ping as ping_database
+from db.database import engine
+from models.file import File
+from models.file_content import FileContent, FileField
+
+FILE_DOC_CHARS = 10000  # text stored on the file's own search document
+PASSAGE_SIZE = 2000
+PASSAGE_BULK_SIZE = 200
+SNIPPET_SIZE = 150
+SCAN_KEEP_ALIVE = "5m"
+FILTER_SCAN_SIZE = 1000  # hits per request while a field-filter-only listing skips to a deep page
+# Field-filter-only listings are ordered like the files listing; file_id makes the order total for search_after
+FILTER_SORT = [{"created_at": {"order": "desc", "missing": "_last"}}, {"file_id": "asc"}]
+FIELD_INSERT_ROWS = 5000  # file_fields rows per INSERT, under the 32767 bind parameter limit
+RANGE_COMPARISONS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le}
+
+# Keywords every file and passage document carries; searches filter on them
+DOCUMENT_PROPERTIES = {
+    "file_id": {"type": "keyword"},
+    "owner_id": {"type": "keyword"},
+    "type": {"type": "keyword"},
+    "created_at": {"type": "date"}
+}
+
+# Nested key/value pairs: the mapping stays the same whatever keys the JSON files use
+FIELDS_MAPPING = {
+    "fields": {
+        "type": "nested",
+        "properties": {
+            "key": {"type": "keyword"},
+            "value": {"type": "keyword"},
+            "number": {"type": "double"}
+        }
+    }
+}
+
+
+class SearchDocument(NamedTuple):
+    """What index_many indexes for one file"""
+    file_id: str
+    content: str
+    owner_id: object = None
+    fields: list = None  # JSON key path/value pairs, see api/services/fields.py
+    file_type: str = None
+    created_at: datetime = None  # the files row's, naive UTC
+
+
+class ScannedDocument(NamedTuple):
+    """A file document as scan_documents sees it"""
+    doc_id: str
+    file_id: str  # None on documents indexed before file_id was stored
+    created_at: datetime = None
+    owner_id: str = None
+    file_type: str = None
+
+
+class ElasticsearchSearch:
+    """Content search in Elasticsearch: a document per file plus passage documents for long texts.
+
+    Owner and type filters are part of every query, so a page is the top matches of the caller's own files.
+    """
+
+    def __init__(self):
+        self._es = None
+        self.index_name = f"{settings.ELASTICSEARCH_INDEX_PREFIX}files"
+        self.passage_index_name = f"{settings.ELASTICSEARCH_INDEX_PREFIX}file_passages"
+        self.shards = settings.ELASTICSEARCH_SHARDS
+        self.replicas = settings.ELASTICSEARCH_REPLICAS
+        # All documents of an owner on one shard: an owner's search is sent to that shard only
+        self.routing = settings.ELASTICSEARCH_ROUTING
+
+    @property
+    def es(self):
+        # Created on first use: the client import and construction stay off the cold start path
+        if self._es is None:
+            from elasticsearch import AsyncElasticsearch
+            self._es = AsyncElasticsearch(
+                [host.strip() for host in settings.ELASTICSEARCH_URL.split(",")],
+                connections_per_node=settings.ELASTICSEARCH_CONNECTIONS,
+                request_timeout=settings.ELASTICSEARCH_TIMEOUT,
+                max_retries=settings.ELASTICSEARCH_MAX_RETRIES,
+                retry_on_timeout=True,
+                http_compress=settings.ELASTICSEARCH_HTTP_COMPRESS
+            )
+        return self._es
+
+    @es.setter
+    def es(self, client) -> None:
+        self._es = client
+
+    async def ping(self) -> bool:
+        return bool(await self.es.ping())
+
+    async def close(self):
+        if self._es is not None:
+            await self._es.close()
+
+    def _search_index_body(self, properties: dict) -> dict:
+        return {
+            "settings": {
+                "number_of_shards": self.shards,
+                "number_of_replicas": self.replicas,
+                "index.max_ngram_diff": 20,
+                "analysis": {
+                    "analyzer": {
+                        "ngram_analyzer": {
+                            "type": "custom",
+                            "tokenizer": "ngram_tokenizer",
+                            "filter": ["lowercase"]
+                        }
+                    },
+                    "tokenizer": {
+                        "ngram_tokenizer": {
+                            "type": "ngram",
+                            "min_gram": 2,
+                            "max_gram": 20
+                        }
+                    }
+                }
+            },
+            "mappings": {
+                "properties": {
+                    **DOCUMENT_PROPERTIES,
+                    "content": {
+                        "type": "text",
+                        "analyzer": "ngram_analyzer",
+                        "search_analyzer": "standard"
+                    },
+                    **properties
+                }
+            }
+        }
+
+    async def init(self):
+        for index, properties in (
+                (self.index_name, FIELDS_MAPPING),
+                (self.passage_index_name, {"passage": {"type": "integer"}})
+        ):
+            if not await self.es.indices.exists(index=index):
+                await self.es.indices.create(index=index, body=self._search_index_body(properties))
+                continue
+            try:
+                # Indices created by earlier versions lack some of the fields
+                await self.es.indices.put_mapping(index=index, properties={**DOCUMENT_PROPERTIES, **properties})
+            except Exception as e:
+                print(f"⚠ Warning: Cannot update the mapping of {index}, index into a new "
+                      f"ELASTICSEARCH_INDEX_PREFIX with `python -m jobs.reconcile --repair`: {e}")
+
+    @staticmethod
+    def _split_passages(text: str, size: int = PASSAGE_SIZE) -> List[str]:
+        """Cut text into passages of at most `size` characters, preferring whitespace boundaries"""
+        passages = []
+        while text:
+            cut = len(text) if len(text) <= size else (text.rfind(" ", size // 2, size) + 1 or size)
+            passages.append(text[:cut])
+            text = text[cut:]
+        return passages
+
+    def _route(self, owner_id) -> dict:
+        return {"routing": str(owner_id)} if self.routing and owner_id else {}
+
+    @staticmethod
+    def _document(document: SearchDocument, content: str, **extra) -> dict:
+        source = {"file_id": document.file_id, **extra, "content": content}
+        if document.owner_id:
+            source["owner_id"] = str(document.owner_id)
+        if document.file_type:
+            source["type"] = document.file_type
+        if document.created_at:
+            source["created_at"] = document.created_at.isoformat()
+        return source
+
+    def _file_document(self, document: SearchDocument) -> dict:
+        source = self._document(document, document.content[:FILE_DOC_CHARS])
+        if document.fields:
+            source["fields"] = [field._asdict() for field in document.fields]
+        return source
+
+    async def index(
+            self,
+            db: AsyncSession,
+            file_id: str,
+            content: str,
+            owner_id=None,
+            fields: list = None,
+            file_type: str = None,
+            created_at: datetime = None
+    ) -> None:
+        """The first FILE_DOC_CHARS go to the file document, the rest is indexed as bounded passages"""
+        document = SearchDocument(file_id, content, owner_id, fields, file_type, created_at)
+        try:
+            await self.es.index(
+                index=self.index_name,
+                id=file_id,
+                body=self._file_document(document),
+                **self._route(owner_id)
+            )
+
+            await self._bulk_index(self._passage_operations(document))
+        except Exception as e:
+            raise Exception(f"Failed to index file {file_id}: {str(e)}")
+
+    def _passage_operations(self, document: SearchDocument) -> list:
+        operations = []
+        for n, passage in enumerate(self._split_passages(document.content[FILE_DOC_CHARS:])):
+            operations.append({
+                "index": {
+                    "_index": self.passage_index_name,
+                    "_id": f"{document.file_id}:{n}",
+                    **self._route(document.owner_id)
+                }
+            })
+            operations.append(self._document(document, passage, passage=n))
+        return operations
+
+    def _index_operations(self, document: SearchDocument) -> list:
+        """_bulk operations indexing the file document and its passages, for callers indexing many files at once"""
+        return [
+            {"index": {"_index": self.index_name, "_id": document.file_id, **self._route(document.owner_id)}},
+            self._file_document(document),
+            *self._passage_operations(document)
+        ]
+
+    async def _bulk_index(self, operations: list) -> None:
+        """Send (action, document) pairs in requests of at most PASSAGE_BULK_SIZE documents"""
+        for start in range(0, len(operations), 2 * PASSAGE_BULK_SIZE):
+            result = await self.es.bulk(operations=operations[start:start + 2 * PASSAGE_BULK_SIZE])
+            if result["errors"]:
+                raise Exception("bulk indexing failed")
+
+    @staticmethod
+    def _field_query(field_filter) -> dict:
+        if field_filter.op == "=":
+            condition = {"term": {"fields.value": field_filter.value}}
+            if field_filter.number is not None:
+                condition = {
+                    "bool": {
+                        "should": [condition, {"term": {"fields.number": field_filter.number}}],
+                        "minimum_should_match": 1
+                    }
+                }
+        else:
+            condition = {"range": {"fields.number": {RANGE_OPERATORS[field_filter.op]: field_filter.number}}}
+        return {
+            "nested": {
+                "path": "fields",
+                "query": {"bool": {"filter": [{"term": {"fields.key": field_filter.key}}, condition]}}
+            }
+        }
+
+    @staticmethod
+    def _scope(owner_id, file_type: str) -> list:
+        scope = []
+        if owner_id:
+            scope.append({"term": {"owner_id": str(owner_id)}})
+        if file_type:
+            scope.append({"term": {"type": file_type}})
+        return scope
+
+    async def find(
+            self,
+            query: str,
+            limit: int = 50,
+            owner_id=None,
+            filters: list = None,
+            file_type: str = None
+    ) -> dict:
+        """Matching file ids of the owner (all owners if None), best first, mapped to a snippet of their best
+        matching passage.
+
+        Field filters apply to the file document; without a query they alone select the files, newest first.
+        """
+        if not query:
+            return dict.fromkeys(await self.find_filtered(owner_id, filters, file_type, 0, limit), "")
+
+        owner = self._scope(owner_id, file_type)
+        conditions = [self._field_query(field_filter) for field_filter in filters or []]
+        route = self._route(owner_id)
+
+        match = {
+            "match": {
+                "content": {
+                    "query": query,
+                    "fuzziness": "AUTO"
+                }
+            }
+        }
+        highlight = {
+            "fields": {"content": {"fragment_size": SNIPPET_SIZE, "number_of_fragments": 1}}
+        }
+        try:
+            files, passages = await asyncio.gather(
+                self.es.search(
+                    index=self.index_name,
+                    body={
+                        "query": {"bool": {"must": match, "filter": owner + conditions}},
+                        "size": limit,
+                        "highlight": highlight,
+                        "_source": False
+                    },
+                    **route
+                ),
+                self.es.search(
+                    index=self.passage_index_name,
+                    body={
+                        "query": {"bool": {"must": match, "filter": owner}},
+                        "size": limit,
+                        "collapse": {"field": "file_id"},
+                        "highlight": highlight,
+                        "_source": ["file_id"]
+                    },
+                    **route
+                )
+            )
+        except Exception as e:
+            raise Exception(f"Search failed: {str(e)}")
+
+        best = {}
+        for hit in files["hits"]["hits"]:
+            best[hit["_id"]] = hit
+        matched_files = set(best)
+        for hit in passages["hits"]["hits"]:
+            file_id = hit["_source"]["file_id"]
+            if file_id not in best or hit["_score"] > best[file_id]["_score"]:
+                best[file_id] = hit
+
+        unfiltered = [file_id for file_id in best if file_id not in matched_files]
+        if conditions and unfiltered:
+            # Passages carry no fields: keep the files whose own document passes the filters
+            try:
+                checked = await self.es.search(
+                    index=self.index_name,
+                    body={
+                        "query": {"bool": {"filter": [{"ids": {"values": unfiltered}}, *conditions]}},
+                        "size": len(unfiltered),
+                        "_source": False
+                    },
+                    **route
+                )
+            except Exception as e:
+                raise Exception(f"Search failed: {str(e)}")
+            allowed = {hit["_id"] for hit in checked["hits"]["hits"]}
+            best = {file_id: hit for file_id, hit in best.items() if file_id in matched_files or file_id in allowed}
+
+        ranked = sorted(best.items(), key=lambda item: -item[1]["_score"])[:limit]
+        return {
+            file_id: " ".join(hit.get("highlight", {}).get("content", []))
+            for file_id, hit in ranked
+        }
+
+    async def delete(self, db: AsyncSession, file_id: str, owner_id=None) -> None:
+        by_file = {"query": {"term": {"file_id": file_id}}}
+        try:
+            if self.routing and not owner_id:
+                # Without the owner the document's shard is unknown, so every shard is asked
+                await self.es.delete_by_query(index=self.index_name, body=by_file)
+            else:
+                await self.es.delete(index=self.index_name, id=file_id, ignore=[404], **self._route(owner_id))
+            await self.es.delete_by_query(index=self.passage_index_name, body=by_file, **self._route(owner_id))
+        except Exception as e:
+            raise Exception(f"Failed to delete from index: {str(e)}")
+
+    async def index_many(self, db: AsyncSession, documents: List[SearchDocument]) -> None:
+        """Index many files with as few _bulk requests as possible"""
+        operations = []
+        for document in documents:
+            operations.extend(self._index_operations(document))
+        await self._bulk_index(operations)
+
+    async def delete_documents(self, doc_ids: list) -> None:
+        """Delete file documents by _id on every shard, for documents without a file_id to match on"""
+        await self.es.delete_by_query(index=self.index_name, body={"query": {"ids": {"values": doc_ids}}})
+
+    @staticmethod
+    def _timestamp(value: str):
+        if not value:
+            return None
+        timestamp = datetime.fromisoformat(value)
+        return timestamp if timestamp.tzinfo else timestamp.replace(tzinfo=timezone.utc)
+
+    async def scan_documents(self, batch_size: int = 1000):
+        """Every file document in file_id order, paged with search_after over a point in time.
+
+        Documents without a file_id come first; the point in time's implicit tiebreaker pages through them.
+        """
+        pit_id = (await self.es.open_point_in_time(index=self.index_name, keep_alive=SCAN_KEEP_ALIVE))["id"]
+        search_after = None
+        try:
+            while True:
+                body = {
+                    "size": batch_size,
+                    "sort": [{"file_id": {"order": "asc", "missing": "_first"}}],
+                    "pit": {"id": pit_id, "keep_alive": SCAN_KEEP_ALIVE},
+                    "_source": ["created_at", "owner_id", "type"]
+                }
+                if search_after:
+                    body["search_after"] = search_after
+                result = await self.es.search(body=body)
+                hits = result["hits"]["hits"]
+                if not hits:
+                    return
+                pit_id = result.get("pit_id", pit_id)
+                search_after = hits[-1]["sort"]
+                for hit in hits:
+                    source = hit.get("_source") or {}
+                    yield ScannedDocument(
+                        hit["_id"], hit["sort"][0], self._timestamp(source.get("created_at")), source.get("owner_id"),
+                        source.get("type")
+                    )
+        finally:
+            await self.es.close_point_in_time(id=pit_id)
+
+    async def search(
+            self,
+            db: AsyncSession,
+            query: str,
+            owner_id=None,
+            file_type: str = None,
+            skip: int = 0,
+            limit: int = 50,
+            filters: list = None
+    ) -> List[File]:
+        """Files matching the query and field filters, each with the snippet of its best passage; owner_id None
+        searches all files"""
+        if not query:
+            return await self._filtered(db, owner_id, file_type, skip, limit, filters)
+
+        # Pages are cut from the ranking, so every match up to the requested page is needed
+        snippets = await self.find(query, skip + limit, owner_id, filters, file_type)
+        page = list(snippets)[skip:skip + limit]
+        if not page:
+            return []
+
+        # Only hydrates the rows of the page; the owner check also drops documents of deleted files
+        stmt = select(File).options(selectinload(File.preview)).where(File.id.in_(page))
+        if owner_id:
+            stmt = stmt.where(File.owner_id == owner_id)
+        result = await db.execute(stmt)
+        position = {file_id: n for n, file_id in enumerate(page)}
+        db_files = sorted(result.scalars().all(), key=lambda db_file: position[db_file.id])
+
+        # Serialized with the row: best matching passage of each hit
+        for db_file in db_files:
+            db_file.snippet = snippets[db_file.id]
+        return db_files
+
+    async def find_filtered(self, owner_id, filters: list, file_type: str = None, skip: int = 0, limit: int = 50):
+        """Ids of a page of the files selected by field filters alone, newest first.
+
+        The page is sorted and cut in Elasticsearch. Deeper pages are reached with search_after, FILTER_SCAN_SIZE sort
+        values at a time, so no request asks for more than that many hits however deep the page.
+        """
+        conditions = [self._field_query(field_filter) for field_filter in filters or []]
+        body = {
+            "query": {"bool": {"filter": self._scope(owner_id, file_type) + conditions}},
+            "sort": FILTER_SORT,
+            "_source": False
+        }
+        try:
+            while skip:
+                size = min(skip, FILTER_SCAN_SIZE)
+                hits = (await self.es.search(
+                    index=self.index_name, body={**body, "size": size}, **self._route(owner_id)
+                ))["hits"]["hits"]
+                if len(hits) < size:
+                    return []
+                skip -= size
+                body["search_after"] = hits[-1]["sort"]
+            files = await self.es.search(index=self.index_name, body={**body, "size": limit}, **self._route(owner_id))
+        except Exception as e:
+            raise Exception(f"Search failed: {str(e)}")
+        return [hit["_id"] for hit in files["hits"]["hits"]]
+
+    async def _filtered(self, db: AsyncSession, owner_id, file_type: str, skip: int, limit: int, filters: list):
+        page = await self.find_filtered(owner_id, filters, file_type, skip, limit)
+        if not page:
+            return []
+
+        # As for text queries, SQL only hydrates the page, in the order Elasticsearch sorted it
+        stmt = select(File).options(selectinload(File.preview)).where(File.id.in_(page))
+        if owner_id:
+            stmt = stmt.where(File.owner_id == owner_id)
+        result = await db.execute(stmt)
+        position = {file_id: n for n, file_id in enumerate(page)}
+        db_files = sorted(result.scalars().all(), key=lambda db_file: position[db_file.id])
+        for db_file in db_files:
+            db_file.snippet = ""
+        return db_files
+
+
+class PostgresSearch:
+    """Content search in the application database.
+
+    The extracted text lives in file_contents next to a generated tsvector. Word queries use the tsvector GIN
+    index and are ranked with ts_rank; substring queries, which the Elasticsearch ngram analyzer also matches,
+    use the pg_trgm GIN index. Owner and type filters are part of the same query as the files lookup, and so are
+    field filters, as EXISTS lookups on the (key, value) and (key, number) indexes of file_fields.
+    """
+
+    async def init(self):
+        async with engine.begin() as conn:
+            await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            await conn.run_sync(FileContent.__table__.create, checkfirst=True)
+            await conn.run_sync(FileField.__table__.create, checkfirst=True)
+
+    async def ping(self) -> bool:
+        return await ping_database()
+
+    async def close(self):
+        pass
+
+    @staticmethod
+    def _rows(documents: List[SearchDocument]) -> list:
+        # tsvector values are limited to 1MB, so only a prefix of very long texts is searchable
+        return [
+            {
+                "file_id": document.file_id,
+                "content": document.content[:settings.PG_SEARCH_MAX_CHARS].replace("\x00", "")
+            }
+            for document in documents
+        ]
+
+    async def index_many(self, db: AsyncSession, documents: List[SearchDocument]) -> None:
+        """Upsert the text of files added to the caller's transaction (commit is left to the caller); owner and type
+        are read from the files rows"""
+        if not documents:
+            return
+        # The files rows must be inserted first for the foreign key
+        await db.flush()
+        stmt = pg_insert(FileContent).values(self._rows(documents))
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[FileContent.file_id],
+            set_={"content": stmt.excluded.content}
+        ))
+
+        file_ids = [document.file_id for document in documents]
+        await db.execute(FileField.__table__.delete().where(FileField.file_id.in_(file_ids)))
+        fields = [
+            {"file_id": document.file_id, **field._asdict()}
+            for document in documents
+            for field in document.fields or []
+        ]
+        for start in range(0, len(fields), FIELD_INSERT_ROWS):
+            await db.execute(FileField.__table__.insert(), fields[start:start + FIELD_INSERT_ROWS])
+
+    async def index(
+            self,
+            db: AsyncSession,
+            file_id: str,
+            content: str,
+            owner_id=None,
+            fields: list = None,
+            file_type: str = None,
+            created_at: datetime = None
+    ) -> None:
+        await self.index_many(db, [SearchDocument(file_id, content, owner_id, fields, file_type, created_at)])
+
+    @staticmethod
+    def _field_condition(field_filter):
+        if field_filter.op == "=":
+            condition = FileField.value == field_filter.value
+            if field_filter.number is not None:
+                condition = or_(condition, FileField.number == field_filter.number)
+        else:
+            condition = RANGE_COMPARISONS[field_filter.op](FileField.number, field_filter.number)
+        return (
+            select(FileField.file_id)
+            .where(FileField.file_id == File.id, FileField.key == field_filter.key, condition)
+            .exists()
+        )
+
+    async def search(
+            self,
+            db: AsyncSession,
+            query: str,
+            owner_id=None,
+            file_type: str = None,
+            skip: int = 0,
+            limit: int = 50,
+            filters: list = None
+    ) -> List[File]:
+        if query:
+            tsquery = func.websearch_to_tsquery("simple", query)
+            pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            rank = func.ts_rank(FileContent.search_vector, tsquery)
+            snippet = func.ts_headline(
+                "simple",
+                FileContent.content,
+                tsquery,
+                literal("MaxFragments=1, MaxWords=25, MinWords=10, FragmentDelimiter=' '")
+            )
+            stmt = (
+                select(File, snippet.label("snippet"))
+                .join(FileContent, FileContent.file_id == File.id)
+                .where(or_(FileContent.search_vector.op("@@")(tsquery), FileContent.content.ilike(pattern)))
+                .order_by(desc(rank), File.created_at.desc())
+            )
+        else:
+            stmt = select(File, literal("").label("snippet")).order_by(File.created_at.desc())
+
+        stmt = stmt.options(selectinload(File.preview))
+        for field_filter in filters or []:
+            stmt = stmt.where(self._field_condition(field_filter))
+        if owner_id:
+            stmt = stmt.where(File.owner_id == owner_id)
+        if file_type:
+            stmt = stmt.where(File.type == file_type)
+        stmt = stmt.offset(skip).limit(limit)
+
+        result = await db.execute(stmt)
+        db_files = []
+        for db_file, file_snippet in result:
+            db_file.snippet = file_snippet
+            db_files.append(db_file)
+        return db_files
+
+    async def delete(self, db: AsyncSession, file_id: str, owner_id=None) -> None:
+        # Also removed by ON DELETE CASCADE; explicit so the row goes in the caller's transaction either way
+        await db.execute(FileContent.__table__.delete().where(FileContent.file_id == file_id))
+        await db.execute(FileField.__table__.delete().where(FileField.file_id == file_id))
+
+
+SEARCH_BACKENDS = {
+    "elasticsearch": ElasticsearchSearch,
+    "postgres": PostgresSearch,
+}
+
+
+def create_search_backend(name: str):
+    if name not in SEARCH_BACKENDS:
+        raise ValueError(f"Unknown search backend {name}, expected one of {', '.join(SEARCH_BACKENDS)}")
+    return SEARCH_BACKENDS[name]()
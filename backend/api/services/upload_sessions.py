@@ -0,0 +1,302 @@
+import asyncio
+import uuid
+from contextlib import suppress
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette import status
+
+from api.services.files import FileService, file_service
+from core.admission import admission
+from core.metrics import track_stage
+from core.settings import settings
+from models.upload_session import UploadSession
+
+CHUNK_PREFIX = "upload-sessions"
+CLEANUP_BATCH_SIZE = 500
+CHUNK_DELETE_CONCURRENCY = 16
+
+
+class UploadSessionService:
+    """Resumable uploads: create a session, PUT chunks at the current offset, then complete it.
+
+    Every chunk is stored as its own object as soon as it arrives, so a dropped connection only loses the chunk
+    in flight; the client asks for the session's offset and continues from there.
+    """
+
+    def __init__(self, files: FileService):
+        self.files = files
+
+    @staticmethod
+    def _chunk_path(session_id: str, index: int) -> str:
+        return f"{CHUNK_PREFIX}/{session_id}/{index:06d}"
+
+    @staticmethod
+    def _expiry() -> datetime:
+        return datetime.utcnow() + timedelta(seconds=settings.UPLOAD_SESSION_TTL)
+
+    @staticmethod
+    def _describe(session: UploadSession) -> dict:
+        return {
+            "session_id": session.id,
+            "name": session.name,
+            "size": session.size,
+            "offset": session.offset,
+            "chunk_min_size": settings.UPLOAD_CHUNK_MIN_SIZE,
+            "chunk_max_size": settings.UPLOAD_CHUNK_MAX_SIZE,
+            "expires_at": session.expires_at
+        }
+
+    @staticmethod
+    async def _get_session(
+            session_id: str,
+            db: AsyncSession,
+            current_user: dict,
+            for_update: bool = False
+    ) -> UploadSession:
+        stmt = select(UploadSession).where(UploadSession.id == session_id)
+        if for_update:
+            stmt = stmt.with_for_update()
+        result = await db.execute(stmt)
+        session = result.scalar_one_or_none()
+
+        if not session or session.expires_at < datetime.utcnow():
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Upload session not found"
+            )
+        if str(session.owner_id) != current_user["user_id"]:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not authorized"
+            )
+        return session
+
+    @staticmethod
+    async def _read_chunk(chunks, limit: int) -> bytes:
+        parts, size = [], 0
+        async for part in chunks:
+            size += len(part)
+            if size > limit:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"Chunk exceeds {limit} bytes"
+                )
+            parts.append(part)
+        return b"".join(parts)
+
+    async def _delete_chunks(self, session_id: str, chunk_count: int) -> None:
+        semaphore = asyncio.Semaphore(CHUNK_DELETE_CONCURRENCY)
+
+        async def delete(index: int) -> None:
+            async with semaphore:
+                try:
+                    await self.files._delete_from_storage(self._chunk_path(session_id, index))
+                except Exception as e:
+                    print(f"⚠ Warning: Failed to delete chunk {index} of upload session {session_id}: {e}")
+
+        await asyncio.gather(*(delete(index) for index in range(chunk_count)))
+        if not self.files.use_gcs:
+            with suppress(OSError):
+                (self.files.local_dir / CHUNK_PREFIX / session_id).rmdir()
+
+    async def create_session(
+            self,
+            filename: str,
+            content_type: str,
+            size: int,
+            db: AsyncSession,
+            current_user: dict
+    ) -> dict:
+        file_ext = self.files._validate_declared_file(filename, content_type, size)
+
+        session = UploadSession(
+            id=str(uuid.uuid4()),
+            owner_id=current_user["user_id"],
+            name=filename,
+            type=file_ext,
+            size=size,
+            offset=0,
+            chunk_count=0,
+            expires_at=self._expiry()
+        )
+        db.add(session)
+        await db.commit()
+        return self._describe(session)
+
+    async def get_session(self, session_id: str, db: AsyncSession, current_user: dict) -> dict:
+        return self._describe(await self._get_session(session_id, db, current_user))
+
+    async def write_chunk(
+            self,
+            session_id: str,
+            offset: int,
+            chunks,
+            db: AsyncSession,
+            current_user: dict
+    ) -> dict:
+        """Append the request body at `offset`, which must be the session's current offset"""
+        # Read the body before locking the session row, so a slow client does not hold the lock
+        content = await self._read_chunk(chunks, settings.UPLOAD_CHUNK_MAX_SIZE)
+        if not content:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Empty chunk")
+
+        session = await self._get_session(session_id, db, current_user, for_update=True)
+        if offset != session.offset:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Expected offset {session.offset}",
+                headers={"Upload-Offset": str(session.offset)}
+            )
+        if session.offset + len(content) > session.size:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Chunk goes past the declared size of {session.size} bytes"
+            )
+        if session.offset + len(content) < session.size and len(content) < settings.UPLOAD_CHUNK_MIN_SIZE:
+            # Tiny chunks would leave a session with more chunk objects than compose and cleanup should handle
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Only the last chunk may be smaller than {settings.UPLOAD_CHUNK_MIN_SIZE} bytes"
+            )
+
+        # Chunk objects are named by index: a retried chunk overwrites the one whose commit did not happen
+        with track_stage("resumable_upload", "storage", session.type):
+            await self.files._upload_to_storage(content, self._chunk_path(session.id, session.chunk_count))
+
+        session.chunk_count += 1
+        session.offset += len(content)
+        session.expires_at = self._expiry()
+        await db.commit()
+        return self._describe(session)
+
+    async def complete_session(self, session_id: str, db: AsyncSession, current_user: dict) -> dict:
+        """Assemble the chunks into the file's object and register it like any other upload
+
+        The session is claimed in a commit of its own before anything is composed, so a concurrent completion gets
+        409 instead of composing the same chunks. The chunks are composed into a key of this attempt's own, which
+        only moves to the file's path once its size matches the declared one and the claim still holds. A claim
+        older than UPLOAD_COMPLETE_TIMEOUT is taken to belong to a completion that died.
+        """
+        session = await self._get_session(session_id, db, current_user, for_update=True)
+        if session.offset != session.size:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Upload incomplete: {session.offset} of {session.size} bytes received",
+                headers={"Upload-Offset": str(session.offset)}
+            )
+        if self._is_completing(session):
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Upload is already being completed")
+        name, file_ext, size, chunk_count = session.name, session.type, session.size, session.chunk_count
+        # The claim is committed, so no lock or snapshot is held while the chunks are composed
+        claimed_at = session.completing_at = datetime.utcnow()
+        session.expires_at = self._expiry()
+        await db.commit()
+
+        path = self.files._generate_path(session_id, file_ext, current_user)
+        assembled = f"{CHUNK_PREFIX}/{session_id}/assembled-{uuid.uuid4().hex}"
+        # The request body is empty, the assembled object is read into this process: admit it by its declared size
+        admission.admit_upload(size)
+        try:
+            try:
+                with track_stage("resumable_upload", "assemble", file_ext):
+                    await self.files._compose_in_storage(
+                        [self._chunk_path(session_id, index) for index in range(chunk_count)], assembled
+                    )
+                    content = await self.files._download_from_storage(assembled)
+                if len(content) != size:
+                    raise HTTPException(
+                        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                        detail=f"Assembled upload has {len(content)} bytes, expected {size}"
+                    )
+
+                result = await db.execute(
+                    select(UploadSession).where(UploadSession.id == session_id).with_for_update()
+                )
+                session = result.scalar_one_or_none()
+                if session is None or session.completing_at != claimed_at:
+                    # A completion that took over an expired claim registered the file or is still at it
+                    raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Upload already completed")
+                await self.files._move_in_storage(assembled, path)
+            except Exception:
+                await self._release_claim(db, session_id, claimed_at, assembled)
+                raise
+
+            # The session row goes away in the same commit that adds the File row
+            await db.delete(session)
+            try:
+                uploaded = await self.files._complete_stored_upload(
+                    db, session_id, name, file_ext, content, path, current_user, operation="resumable_upload"
+                )
+            except HTTPException as e:
+                if e.status_code != status.HTTP_409_CONFLICT:
+                    await self.files._delete_from_storage(path)
+                await self._release_claim(db, session_id, claimed_at)
+                raise
+        finally:
+            admission.release_upload(size)
+
+        await self._delete_chunks(session_id, chunk_count)
+        return uploaded
+
+    @staticmethod
+    def _is_completing(session: UploadSession) -> bool:
+        timeout = timedelta(seconds=settings.UPLOAD_COMPLETE_TIMEOUT)
+        return session.completing_at is not None and session.completing_at > datetime.utcnow() - timeout
+
+    async def _release_claim(self, db: AsyncSession, session_id: str, claimed_at: datetime, assembled: str = None):
+        """Let the session be completed again after a failed attempt, unless another completion took it over"""
+        await db.rollback()
+        try:
+            if assembled:
+                await self.files._delete_from_storage(assembled)
+            await db.execute(
+                update(UploadSession)
+                .where(UploadSession.id == session_id, UploadSession.completing_at == claimed_at)
+                .values(completing_at=None)
+            )
+            await db.commit()
+        except Exception as e:
+            print(f"⚠ Warning: Failed to release the completion of upload session {session_id}: {e}")
+
+    async def abort_session(self, session_id: str, db: AsyncSession, current_user: dict) -> None:
+        session = await self._get_session(session_id, db, current_user, for_update=True)
+        if self._is_completing(session):
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Upload is being completed")
+        chunk_count = session.chunk_count
+        await db.delete(session)
+        await db.commit()
+        await self._delete_chunks(session_id, chunk_count)
+
+    async def cleanup_expired(self, db: AsyncSession) -> int:
+        """Drop sessions that received no chunk for UPLOAD_SESSION_TTL, and their stored chunks"""
+        result = await db.execute(
+            select(UploadSession)
+            .where(UploadSession.expires_at < datetime.utcnow())
+            .limit(CLEANUP_BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+        )
+        sessions = result.scalars().all()
+        expired = [(session.id, session.chunk_count) for session in sessions]
+        for session in sessions:
+            await db.delete(session)
+        await db.commit()
+
+        for session_id, chunk_count in expired:
+            await self._delete_chunks(session_id, chunk_count)
+        return len(expired)
+
+    async def run_cleanup(self, session_factory, interval: int) -> None:
+        while True:
+            try:
+                async with session_factory() as db:
+                    while await self.cleanup_expired(db) == CLEANUP_BATCH_SIZE:
+                        pass
+            except Exception as e:
+                print(f"⚠ Warning: Upload session cleanup failed: {e}")
+            await asyncio.sleep(interval)
+
+
+upload_session_service = UploadSessionService(file_service)
@@ -0,0 +1,162 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, insert, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.file import File
+from models.usage import DailyUsage, UserUsage
+from models.user import User
+
+RECONCILE_LOCK = 0x75736167  # advisory lock key: one process rebuilds user_usage at a time
+
+
+class UsageService:
+
+    async def record(self, db: AsyncSession, owner_id, file_type: str, size: int, delta: int) -> None:
+        """Apply an upload (delta=1) or delete (delta=-1) inside the caller's transaction.
+
+        Run it right before the commit: the upserts lock the counter rows until then.
+        """
+        await self.record_many(db, owner_id, file_type, delta, delta * (size or 0))
+
+    async def record_many(self, db: AsyncSession, owner_id, file_type: str, files: int, total_bytes: int) -> None:
+        """Same as record for several files of one type: files/total_bytes are negative for deletes"""
+        usage = pg_insert(UserUsage).values(
+            owner_id=owner_id,
+            type=file_type,
+            file_count=files,
+            total_bytes=total_bytes,
+            updated_at=datetime.utcnow()
+        )
+        await db.execute(usage.on_conflict_do_update(
+            index_elements=[UserUsage.owner_id, UserUsage.type],
+            set_={
+                "file_count": UserUsage.file_count + files,
+                "total_bytes": UserUsage.total_bytes + total_bytes,
+                "updated_at": usage.excluded.updated_at
+            }
+        ))
+
+        added, added_bytes = (files, total_bytes) if files > 0 else (0, 0)
+        removed, removed_bytes = (-files, -total_bytes) if files < 0 else (0, 0)
+        daily = pg_insert(DailyUsage).values(
+            day=datetime.utcnow().date(),
+            type=file_type,
+            files_added=added,
+            bytes_added=added_bytes,
+            files_deleted=removed,
+            bytes_deleted=removed_bytes
+        )
+        await db.execute(daily.on_conflict_do_update(
+            index_elements=[DailyUsage.day, DailyUsage.type],
+            set_={
+                "files_added": DailyUsage.files_added + added,
+                "bytes_added": DailyUsage.bytes_added + added_bytes,
+                "files_deleted": DailyUsage.files_deleted + removed,
+                "bytes_deleted": DailyUsage.bytes_deleted + removed_bytes
+            }
+        ))
+
+    @staticmethod
+    def _totals(owners: list = None, *extra):
+        stmt = select(File.owner_id, File.type, func.count(), func.coalesce(func.sum(File.size), 0), *extra)
+        if owners is not None:
+            stmt = stmt.where(File.owner_id.in_(owners))
+        return stmt.group_by(File.owner_id, File.type)
+
+    async def reconcile(self, db: AsyncSession) -> int:
+        """Correct user_usage rows that drifted from the files table; returns the number of owners fixed.
+
+        The full scan runs without locking user_usage and only finds the owners whose counters differ. Those may
+        also differ because of uploads committed during the scan, so their totals are counted again under a lock
+        that holds off concurrent upserts, which touches only their files.
+        """
+        async with db.begin():
+            if not (await db.execute(select(func.pg_try_advisory_xact_lock(RECONCILE_LOCK)))).scalar():
+                return 0  # another process is reconciling
+
+            result = await db.execute(self._totals())
+            expected = {(owner, file_type): (count, size) for owner, file_type, count, size in result}
+            result = await db.execute(
+                select(UserUsage.owner_id, UserUsage.type, UserUsage.file_count, UserUsage.total_bytes)
+            )
+            stored = {(owner, file_type): (count, size) for owner, file_type, count, size in result}
+            drifted = sorted({
+                owner for owner, file_type in expected.keys() | stored.keys()
+                if expected.get((owner, file_type), (0, 0)) != stored.get((owner, file_type), (0, 0))
+            }, key=str)
+            if not drifted:
+                return 0
+
+            await db.execute(text("LOCK TABLE user_usage IN SHARE ROW EXCLUSIVE MODE"))
+            await db.execute(delete(UserUsage).where(UserUsage.owner_id.in_(drifted)))
+            await db.execute(insert(UserUsage).from_select(
+                ["owner_id", "type", "file_count", "total_bytes", "updated_at"],
+                self._totals(drifted, func.now())
+            ))
+        return len(drifted)
+
+    async def run_reconciliation(self, session_factory, interval: int, delay: float = 0) -> None:
+        await asyncio.sleep(delay)
+        while True:
+            try:
+                async with session_factory() as db:
+                    await self.reconcile(db)
+            except Exception as e:
+                print(f"⚠ Warning: Usage reconciliation failed: {e}")
+            await asyncio.sleep(interval)
+
+    async def per_user(self, db: AsyncSession, skip: int = 0, limit: int = 50) -> list:
+        total_bytes = func.sum(UserUsage.total_bytes)
+        stmt = (
+            select(
+                UserUsage.owner_id,
+                User.email,
+                func.sum(UserUsage.file_count).label("file_count"),
+                total_bytes.label("total_bytes")
+            )
+            .join(User, User.id == UserUsage.owner_id)
+            .group_by(UserUsage.owner_id, User.email)
+            .order_by(total_bytes.desc())
+            .offset(skip)
+            .limit(limit)
+        )
+        result = await db.execute(stmt)
+        return [
+            {"owner_id": str(row.owner_id), "email": row.email, "file_count": row.file_count,
+             "total_bytes": row.total_bytes}
+            for row in result
+        ]
+
+    async def per_type(self, db: AsyncSession) -> list:
+        stmt = select(
+            UserUsage.type,
+            func.sum(UserUsage.file_count).label("file_count"),
+            func.sum(UserUsage.total_bytes).label("total_bytes")
+        ).group_by(UserUsage.type)
+        result = await db.execute(stmt)
+        return [{"type": row.type, "file_count": row.file_count, "total_bytes": row.total_bytes} for row in result]
+
+    async def growth(self, db: AsyncSession, days: int = 30) -> list:
+        stmt = (
+            select(DailyUsage)
+            .where(DailyUsage.day > datetime.utcnow().date() - timedelta(days=days))
+            .order_by(DailyUsage.day, DailyUsage.type)
+        )
+        result = await db.execute(stmt)
+        return [
+            {
+                "day": row.day.isoformat(),
+                "type": row.type,
+                "files_added": row.files_added,
+                "bytes_added": row.bytes_added,
+                "files_deleted": row.files_deleted,
+                "bytes_deleted": row.bytes_deleted
+            }
+            for row in result.scalars().all()
+        ]
+
+
+usage_service = UsageService()
@@ -0,0 +1,39 @@
+"""Run the offline benchmark suite.
+
+    python -m benchmarks --output results.json
+    python -m benchmarks --baseline results.json --max-regression 0.25
+"""
+import argparse
+import sys
+
+from benchmarks import bench_files  # noqa: F401  (registers benchmarks)
+from benchmarks.harness import compare, dump, load, run
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="FileService micro-benchmarks")
+    parser.add_argument("patterns", nargs="*", help="glob patterns selecting benchmarks by name")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument(
+        "--max-regression", type=float, default=0.25, help="allowed slowdown of the median (0.25 = 25%%)"
+    )
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--min-round-time", type=float, default=0.05, help="seconds")
+    args = parser.parse_args()
+
+    results = run(args.patterns, args.rounds, args.min_round_time)
+    if args.output:
+        dump(results, args.output)
+
+    if args.baseline:
+        regressions = compare(results, load(args.baseline), args.max_regression)
+        for name, before, after, ratio in regressions:
+            print(f"REGRESSION {name}: {before * 1e6:.1f} us -> {after * 1e6:.1f} us ({ratio:.2f}x)")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""Owner-scoped search latency against shard count, with and without routing by owner.
+
+    docker compose up -d elasticsearch
+    python -m benchmarks.bench_es_routing --shards 1,4,8 --owners 200 --docs 20000 --output routing.json
+
+Every layout gets its own throwaway bench_routing_* indices on the cluster (a single local node is enough to
+compare shard fan-out), is filled with the same corpus spread over `owners` owners, and answers the same
+owner-scoped queries the way list_files asks them. The shards each search was sent to are read from the
+response, so the report shows the fan-out next to the latency.
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+
+from api.services.search import ElasticsearchSearch, SearchDocument
+from benchmarks.corpora import WORDS, make_words
+
+
+def corpus(docs: int, owners: int, size: int) -> list:
+    return [
+        SearchDocument(f"doc-{n}", make_words(size // 6, seed=n)[:size], f"owner-{n % owners}")
+        for n in range(docs)
+    ]
+
+
+async def bench_layout(args, documents: list, shards: int, routing: bool) -> dict:
+    from elasticsearch import AsyncElasticsearch
+
+    backend = ElasticsearchSearch()
+    backend.es = AsyncElasticsearch([args.es_url], request_timeout=60)
+    backend.index_name = f"bench_routing_{shards}_{int(routing)}_files"
+    backend.passage_index_name = f"bench_routing_{shards}_{int(routing)}_passages"
+    backend.shards = shards
+    backend.routing = routing
+    try:
+        for index in (backend.index_name, backend.passage_index_name):
+            await backend.es.indices.delete(index=index, ignore_unavailable=True)
+        await backend.init()
+
+        start = time.perf_counter()
+        for offset in range(0, len(documents), args.batch_size):
+            await backend.index_many(None, documents[offset:offset + args.batch_size])
+        await backend.es.indices.refresh(index=f"{backend.index_name},{backend.passage_index_name}")
+        indexing = time.perf_counter() - start
+
+        rng = random.Random(0)
+        latencies, fan_out = [], []
+        for _ in range(args.queries):
+            query, owner = rng.choice(WORDS), f"owner-{rng.randrange(args.owners)}"
+            start = time.perf_counter()
+            await backend.find(query, limit=50, owner_id=owner)
+            latencies.append(time.perf_counter() - start)
+
+            body = {"query": {"match": {"content": query}}, "size": 0}
+            result = await backend.es.search(index=backend.index_name, body=body, **backend._route(owner))
+            fan_out.append(result["_shards"]["total"])
+
+        quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+        return {
+            "shards": shards,
+            "routing": routing,
+            "docs_per_s": len(documents) / indexing,
+            "query_p50_ms": quantiles[49] * 1e3,
+            "query_p95_ms": quantiles[94] * 1e3,
+            "shards_per_query": statistics.mean(fan_out),
+        }
+    finally:
+        for index in (backend.index_name, backend.passage_index_name):
+            await backend.es.indices.delete(index=index, ignore_unavailable=True)
+        await backend.close()
+
+
+async def run(args) -> list:
+    documents = corpus(args.docs, args.owners, args.doc_chars)
+    results = []
+    for shards in args.shards:
+        for routing in (False, True):
+            results.append(await bench_layout(args, documents, shards, routing))
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Elasticsearch shard count and owner routing benchmark")
+    parser.add_argument("--es-url", default="http://localhost:9200")
+    parser.add_argument("--shards", type=lambda v: [int(s) for s in v.split(",")], default=[1, 4, 8])
+    parser.add_argument("--owners", type=int, default=200)
+    parser.add_argument("--docs", type=int, default=20_000)
+    parser.add_argument("--doc-chars", type=int, default=2_000)
+    parser.add_argument("--batch-size", type=int, default=500, help="documents per index_many call")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    for r in results:
+        print(
+            f"{r['shards']:>3} shards  routing {'on ' if r['routing'] else 'off'}  {r['docs_per_s']:>8.0f} docs/s  "
+            f"p50 {r['query_p50_ms']:>7.2f} ms  p95 {r['query_p95_ms']:>7.2f} ms  "
+            f"{r['shards_per_query']:.1f} shards/query"
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""FileService hot paths, runnable without network access"""
+import tempfile
+import uuid
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+
+import jwt
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.dialects import postgresql
+from starlette.requests import Request
+
+from api.dependencies import get_current_user
+from api.services.extractors import ExtractionCache, extract_text
+from api.services.fields import extract_fields
+from api.services.files import FileService
+from benchmarks.corpora import make_json, make_pdf, make_txt
+from benchmarks.harness import benchmark
+from core.metrics import track_stage
+from core.settings import settings
+from models.file import File
+from models.user import User  # noqa: F401  (resolves File.owner)
+
+KB = 1024
+MB = 1024 * KB
+
+service = FileService()
+
+
+class FakeUploadFile:
+    def __init__(self, filename, content, content_type):
+        self.filename = filename
+        self.content = content
+        self.content_type = content_type
+
+    async def read(self):
+        return self.content
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self.rows
+
+
+class FakeSession:
+    """Compiles statements like the driver would, then returns canned rows"""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def execute(self, stmt):
+        str(stmt.compile(dialect=postgresql.dialect()))
+        return FakeResult(self.rows)
+
+
+@lru_cache
+def corpus(kind: str, size: int) -> bytes:
+    return {"pdf": make_pdf, "txt": make_txt, "json": make_json}[kind](size)
+
+
+@lru_cache
+def file_rows(count: int) -> list:
+    owner = uuid.uuid4()
+    return [
+        File(
+            id=str(uuid.uuid4()),
+            name=f"report-{i}.pdf",
+            type=".pdf",
+            size=i * KB,
+            owner_id=owner,
+            file_path=f"{owner}/{i}.pdf",
+            created_at=datetime(2024, 1, 1)
+        )
+        for i in range(count)
+    ]
+
+
+@lru_cache
+def storage_dir() -> Path:
+    return Path(tempfile.mkdtemp(prefix="bench-storage-"))
+
+
+for size in (KB, MB):
+    @benchmark(f"validate_and_extract_file[txt-{size // KB}KB]", size=size)
+    async def bench_validate(size):
+        await service._validate_and_extract_file(FakeUploadFile("a.txt", corpus("txt", size), "text/plain"))
+
+for pages in (1, 10, 100, 500):
+    @benchmark(f"extract_text[pdf-{pages}p]", pages=pages)
+    def bench_extract_pdf(pages):
+        extract_text(corpus("pdf", pages), ".pdf", cache=None)
+
+
+@benchmark("extract_text[pdf-500p-all-pages]")
+def bench_extract_pdf_all_pages():
+    extract_text(corpus("pdf", 500), ".pdf", budget=10 ** 9, cache=None)
+
+
+warm_cache = ExtractionCache(max_chars=10 ** 6)
+
+
+@benchmark("extract_text[pdf-500p-cached]")
+def bench_extract_pdf_cached():
+    extract_text(corpus("pdf", 500), ".pdf", cache=warm_cache)
+
+
+for size in (10 * KB, MB, 10 * MB):
+    @benchmark(f"extract_text[txt-{size // KB}KB]", size=size)
+    async def bench_extract_txt(size):
+        await service._extract_text(corpus("txt", size), ".txt")
+
+for size in (10 * KB, MB):
+    @benchmark(f"extract_text[json-{size // KB}KB]", size=size)
+    async def bench_extract_json(size):
+        await service._extract_text(corpus("json", size), ".json")
+
+for size in (10 * KB, MB, 8 * MB):
+    @benchmark(f"extract_fields[json-{size // KB}KB]", size=size)
+    def bench_extract_fields(size):
+        extract_fields(corpus("json", size), ".json")
+
+
+@benchmark("list_files[query+50rows]")
+async def bench_list_files():
+    await service.list_files(FakeSession(file_rows(50)), {"user_id": str(uuid.uuid4())}, file_type=".pdf")
+
+
+@benchmark("list_files[serialize-50rows]")
+def bench_serialize_files():
+    jsonable_encoder(file_rows(50))
+
+
+@lru_cache
+def bearer_header() -> tuple:
+    token = jwt.encode({"sub": "bench@example.com", "user_id": "u1", "role": "user"}, settings.JWT_SECRET)
+    return b"authorization", f"Bearer {token}".encode()
+
+
+@benchmark("get_current_user[decode]")
+async def bench_get_current_user():
+    await get_current_user(Request({"type": "http", "headers": [bearer_header()]}))
+
+
+@benchmark("local_storage_roundtrip[1MB]")
+async def bench_local_storage():
+    local = FileService.__new__(FileService)
+    local.use_gcs = False
+    local.local_dir = storage_dir()
+    path = "bench/roundtrip.bin"
+    await local._upload_to_storage(corpus("txt", MB), path)
+    await local._download_from_storage(path)
+    await local._delete_from_storage(path)
+
+
+@benchmark("track_stage[overhead]")
+def bench_track_stage():
+    with track_stage("bench", "noop"):
+        pass
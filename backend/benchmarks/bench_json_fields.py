@@ -0,0 +1,213 @@
+"""Indexing throughput and filter latency of JSON field filters against the number of fields per document.
+
+    python -m benchmarks.bench_json_fields --backend elasticsearch --backend postgres --output fields.json
+    python -m benchmarks.bench_json_fields --fake    # smoke run against the in-process stand-in, no database
+
+The stand-in matches filters by scanning every document, so --fake defaults to a corpus small enough to finish in
+seconds; its numbers only show that the code paths work.
+
+Every backend indexes the same generated JSON corpus, flattened by extract_fields as uploads are, and answers
+equality and range filters the way list_files asks them with `where` (owner-scoped, 50 results, files rows
+included). Documents of the largest layout have more key paths than MAX_FIELDS, so the report also shows what the
+bound costs. Backends are set up and removed as in bench_search.
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+import uuid
+
+from sqlalchemy import delete, func, select, text
+
+from api.services.fields import MAX_FIELDS, extract_fields, parse_filters
+from api.services.search import SearchDocument
+from benchmarks.bench_search import ElasticsearchRun, FakeRun, PostgresRun, create_files, remove_files
+from benchmarks.corpora import WORDS, make_words
+from db import init_models
+from db.database import async_session, engine
+from models.file import File
+from models.file_content import FileField
+
+STATUSES = ("ok", "failed", "retrying", "cancelled")
+DEFAULT_DOCS, DEFAULT_QUERIES = 2_000, 200
+FAKE_DOCS, FAKE_QUERIES = 20, 10
+
+
+def make_document(keys: int, seed: int) -> dict:
+    """A job record with `keys` metric paths besides the fields filtered on"""
+    rng = random.Random(seed)
+    return {
+        "status": STATUSES[seed % len(STATUSES)],
+        "job": {"retries": seed % 10, "owner": rng.choice(WORDS), "duration_ms": rng.uniform(0, 60_000)},
+        "metrics": {f"m{n}": rng.randrange(1000) for n in range(keys)},
+        "log": [{"level": rng.choice(("info", "warn", "error")), "message": make_words(6, seed=seed + n)}
+                for n in range(5)]
+    }
+
+
+def corpus(keys: int, docs: int) -> list:
+    documents = []
+    for n in range(docs):
+        content = json.dumps(make_document(keys, n)).encode()
+        documents.append((f"bench-fields-{keys}-{n}", content.decode(), extract_fields(content, ".json")))
+    return documents
+
+
+def filters(count: int) -> list:
+    rng = random.Random(0)
+    equality, ranges = [], []
+    for _ in range(count):
+        equality.append([f"status={rng.choice(STATUSES)}"])
+        ranges.append([f"job.retries>={rng.randrange(10)}", f"job.duration_ms<{rng.uniform(0, 60_000):.0f}"])
+    return [("equality", parse_filters(where)) for where in equality] + [
+        ("range", parse_filters(where)) for where in ranges
+    ]
+
+
+class FakeFieldsRun(FakeRun):
+
+    async def index(self, documents: list) -> None:
+        for file_id, content, fields in documents:
+            await self.backend.index(None, file_id, content, fields=fields)
+
+    async def query(self, field_filters: list) -> None:
+        await self.backend.find_filtered(None, field_filters, limit=50)
+
+
+class ElasticsearchFieldsRun(ElasticsearchRun):
+
+    async def index(self, documents: list) -> None:
+        await self.backend.index_many(None, [
+            SearchDocument(file_id, content, self.owner_id, fields) for file_id, content, fields in documents
+        ])
+        await self.backend.es.indices.refresh(index=self.indices)
+
+    async def query(self, field_filters: list) -> None:
+        async with async_session() as db:
+            await self.backend.search(db, None, owner_id=self.owner_id, limit=50, filters=field_filters)
+
+
+class PostgresFieldsRun(PostgresRun):
+
+    async def index(self, documents: list) -> None:
+        async with async_session() as db:
+            await self.backend.index_many(db, [
+                SearchDocument(file_id, content, self.owner_id, fields) for file_id, content, fields in documents
+            ])
+            await db.commit()
+        async with engine.begin() as conn:
+            await conn.execute(text("ANALYZE file_fields"))
+
+    async def query(self, field_filters: list) -> None:
+        async with async_session() as db:
+            await self.backend.search(db, None, owner_id=self.owner_id, limit=50, filters=field_filters)
+
+    async def resources(self) -> dict:
+        async with async_session() as db:
+            size = await db.scalar(select(func.pg_total_relation_size("file_fields")))
+        return {"index_bytes": size}
+
+    async def teardown(self) -> None:
+        async with engine.begin() as conn:
+            await conn.execute(delete(FileField).where(
+                FileField.file_id.in_(select(File.id).where(File.owner_id == self.owner_id))
+            ))
+        await super().teardown()
+
+
+def summarize(keys: int, documents: list, indexing: float, latencies: dict) -> dict:
+    result = {
+        "keys": keys,
+        "fields_per_doc": statistics.mean(len(fields) for _, _, fields in documents),
+        "truncated": keys > MAX_FIELDS,
+        "docs_per_s": len(documents) / indexing,
+    }
+    for kind, samples in latencies.items():
+        quantiles = statistics.quantiles(samples, n=100, method="inclusive")
+        result[f"{kind}_p50_ms"] = quantiles[49] * 1e3
+        result[f"{kind}_p95_ms"] = quantiles[94] * 1e3
+    return result
+
+
+async def bench_backend(runner, corpora: dict, query_count: int) -> list:
+    results = []
+    await runner.setup()
+    try:
+        for keys, documents in corpora.items():
+            start = time.perf_counter()
+            await runner.index(documents)
+            indexing = time.perf_counter() - start
+
+            latencies = {"equality": [], "range": []}
+            for kind, field_filters in filters(query_count):
+                start = time.perf_counter()
+                await runner.query(field_filters)
+                latencies[kind].append(time.perf_counter() - start)
+
+            results.append({**summarize(keys, documents, indexing, latencies), **await runner.resources()})
+    finally:
+        await runner.teardown()
+    return results
+
+
+async def run(args) -> dict:
+    corpora = {keys: corpus(keys, args.docs) for keys in args.keys}
+    if args.fake:
+        return {"fake-elasticsearch": await bench_backend(FakeFieldsRun(), corpora, args.queries)}
+
+    engine.echo = False
+    owner_id = uuid.uuid4()
+    await init_models()
+    await create_files(owner_id, [
+        (file_id, content) for documents in corpora.values() for file_id, content, _ in documents
+    ])
+    results = {}
+    try:
+        for backend in args.backend:
+            if backend == "elasticsearch":
+                runner = ElasticsearchFieldsRun(args.es_url, owner_id)
+            else:
+                runner = PostgresFieldsRun(owner_id)
+            results[backend] = await bench_backend(runner, corpora, args.queries)
+    finally:
+        await remove_files(owner_id)
+        await engine.dispose()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="JSON field indexing and filter benchmark")
+    parser.add_argument(
+        "--backend", action="append", choices=["elasticsearch", "postgres"], help="repeat to compare backends"
+    )
+    parser.add_argument("--es-url", default="http://localhost:9200")
+    parser.add_argument("--fake", action="store_true", help="use the in-process Elasticsearch stand-in only")
+    parser.add_argument("--keys", type=lambda v: [int(s) for s in v.split(",")], default=[10, 200, 5_000],
+                        help="metric keys per document")
+    parser.add_argument("--docs", type=int, help=f"per layout, {DEFAULT_DOCS} ({FAKE_DOCS} with --fake)")
+    parser.add_argument("--queries", type=int, help=f"of each kind, {DEFAULT_QUERIES} ({FAKE_QUERIES} with --fake)")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+    args.backend = args.backend or ["elasticsearch"]
+    args.docs = args.docs or (FAKE_DOCS if args.fake else DEFAULT_DOCS)
+    args.queries = args.queries or (FAKE_QUERIES if args.fake else DEFAULT_QUERIES)
+
+    results = asyncio.run(run(args))
+    for backend, rows in results.items():
+        for r in rows:
+            print(
+                f"{backend:<18} {r['keys']:>6} keys  {r['fields_per_doc']:>7.0f} fields/doc  "
+                f"{r['docs_per_s']:>8.1f} docs/s  "
+                f"equality p50 {r['equality_p50_ms']:>7.2f} ms p95 {r['equality_p95_ms']:>7.2f} ms  "
+                f"range p50 {r['range_p50_ms']:>7.2f} ms p95 {r['range_p95_ms']:>7.2f} ms  "
+                f"index {r.get('index_bytes', 0) / 1e6:>8.1f} MB"
+            )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""Indexing throughput, query latency and resource use of the search backends against document size.
+
+    python -m benchmarks.bench_search --backend elasticsearch --backend postgres --output search.json
+    python -m benchmarks.bench_search --fake    # smoke run against the in-process stand-in, no database
+
+Every backend indexes the same generated corpus through its own FileService-facing methods and answers the same
+queries the way list_files asks them (owner-scoped, 50 results, files rows included). Elasticsearch uses throwaway
+bench_* indices; Postgres rows belong to a throwaway bench user. Both are removed at the end.
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+import uuid
+
+from sqlalchemy import delete, func, select, text
+
+from api.services.search import ElasticsearchSearch, PostgresSearch
+from benchmarks.corpora import WORDS, make_words
+from db import init_models
+from db.database import async_session, engine
+from loadtest.fake_elasticsearch import FakeElasticsearch
+from models.file import File
+from models.file_content import FileContent
+from models.user import User
+
+
+def corpus(size: int, docs: int) -> list:
+    return [
+        (f"bench-{size}-{n}", make_words(size // 6, seed=size + n)[:size] + f" marker{n}")
+        for n in range(docs)
+    ]
+
+
+def queries(docs: int, count: int) -> list:
+    # Alternate between common words and terms that only occur at the end of one document
+    return [random.choice(WORDS) if q % 2 else f"marker{random.randrange(docs)}" for q in range(count)]
+
+
+def summarize(size: int, docs: int, indexing: float, latencies: list) -> dict:
+    quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "doc_chars": size,
+        "docs_per_s": docs / indexing,
+        "mb_per_s": docs * size / indexing / 1e6,
+        "query_p50_ms": quantiles[49] * 1e3,
+        "query_p95_ms": quantiles[94] * 1e3,
+    }
+
+
+class FakeRun:
+    """Elasticsearch stand-in without a database: measures the search backend's own query only"""
+
+    def __init__(self):
+        self.backend = ElasticsearchSearch()
+        self.backend.es = FakeElasticsearch()
+
+    async def setup(self) -> None:
+        await self.backend.init()
+
+    async def index(self, documents: list) -> None:
+        for file_id, content in documents:
+            await self.backend.index(None, file_id, content)
+
+    async def query(self, query: str) -> None:
+        await self.backend.find(query, limit=50)
+
+    async def resources(self) -> dict:
+        return {}
+
+    async def teardown(self) -> None:
+        pass
+
+
+class ElasticsearchRun:
+
+    def __init__(self, es_url: str, owner_id):
+        from elasticsearch import AsyncElasticsearch
+
+        self.owner_id = owner_id
+        self.backend = ElasticsearchSearch()
+        self.backend.es = AsyncElasticsearch([es_url])
+        self.backend.index_name = "bench_files"
+        self.backend.passage_index_name = "bench_file_passages"
+        self.indices = f"{self.backend.index_name},{self.backend.passage_index_name}"
+
+    async def setup(self) -> None:
+        await self.teardown_indices()
+        await self.backend.init()
+
+    async def index(self, documents: list) -> None:
+        for file_id, content in documents:
+            await self.backend.index(None, file_id, content, owner_id=self.owner_id, file_type=".txt")
+        await self.backend.es.indices.refresh(index=self.indices)
+
+    async def query(self, query: str) -> None:
+        async with async_session() as db:
+            await self.backend.search(db, query, owner_id=self.owner_id, limit=50)
+
+    async def resources(self) -> dict:
+        stats = await self.backend.es.indices.stats(index=self.indices, metric="store")
+        nodes = await self.backend.es.nodes.stats(metric="jvm")
+        return {
+            "index_bytes": stats["_all"]["total"]["store"]["size_in_bytes"],
+            "heap_used_bytes": sum(node["jvm"]["mem"]["heap_used_in_bytes"] for node in nodes["nodes"].values()),
+        }
+
+    async def teardown_indices(self) -> None:
+        for index in (self.backend.index_name, self.backend.passage_index_name):
+            await self.backend.es.indices.delete(index=index, ignore_unavailable=True)
+
+    async def teardown(self) -> None:
+        await self.teardown_indices()
+        await self.backend.close()
+
+
+class PostgresRun:
+
+    def __init__(self, owner_id):
+        self.owner_id = owner_id
+        self.backend = PostgresSearch()
+
+    async def setup(self) -> None:
+        await self.backend.init()
+
+    async def index(self, documents: list) -> None:
+        async with async_session() as db:
+            for file_id, content in documents:
+                await self.backend.index(db, file_id, content)
+                await db.commit()
+        async with engine.begin() as conn:
+            await conn.execute(text("ANALYZE file_contents"))
+
+    async def query(self, query: str) -> None:
+        async with async_session() as db:
+            await self.backend.search(db, query, owner_id=self.owner_id, limit=50)
+
+    async def resources(self) -> dict:
+        async with async_session() as db:
+            size = await db.scalar(select(func.pg_total_relation_size("file_contents")))
+        return {"index_bytes": size}
+
+    async def teardown(self) -> None:
+        async with engine.begin() as conn:
+            await conn.execute(delete(FileContent).where(
+                FileContent.file_id.in_(select(File.id).where(File.owner_id == self.owner_id))
+            ))
+
+
+async def create_files(owner_id, documents: list) -> None:
+    async with engine.begin() as conn:
+        await conn.execute(User.__table__.insert().values(
+            id=owner_id, email=f"bench-search-{owner_id}@example.com", name="bench", role="user"
+        ))
+        await conn.execute(File.__table__.insert(), [
+            {"id": file_id, "name": f"{file_id}.txt", "type": ".txt", "size": len(content), "owner_id": owner_id,
+             "file_path": f"{owner_id}/{file_id}.txt"}
+            for file_id, content in documents
+        ])
+
+
+async def remove_files(owner_id) -> None:
+    async with engine.begin() as conn:
+        await conn.execute(delete(File).where(File.owner_id == owner_id))
+        await conn.execute(delete(User).where(User.id == owner_id))
+
+
+async def bench_backend(runner, corpora: dict, query_count: int) -> list:
+    results = []
+    await runner.setup()
+    try:
+        for size, documents in corpora.items():
+            start = time.perf_counter()
+            await runner.index(documents)
+            indexing = time.perf_counter() - start
+
+            latencies = []
+            for query in queries(len(documents), query_count):
+                start = time.perf_counter()
+                await runner.query(query)
+                latencies.append(time.perf_counter() - start)
+
+            results.append({**summarize(size, len(documents), indexing, latencies), **await runner.resources()})
+    finally:
+        await runner.teardown()
+    return results
+
+
+async def run(args) -> dict:
+    corpora = {size: corpus(size, args.docs) for size in args.sizes}
+    if args.fake:
+        return {"fake-elasticsearch": await bench_backend(FakeRun(), corpora, args.queries)}
+
+    engine.echo = False
+    owner_id = uuid.uuid4()
+    await init_models()
+    await create_files(owner_id, [document for documents in corpora.values() for document in documents])
+    results = {}
+    try:
+        for backend in args.backend:
+            runner = ElasticsearchRun(args.es_url, owner_id) if backend == "elasticsearch" else PostgresRun(owner_id)
+            results[backend] = await bench_backend(runner, corpora, args.queries)
+    finally:
+        await remove_files(owner_id)
+        await engine.dispose()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Search indexing and query benchmark")
+    parser.add_argument(
+        "--backend", action="append", choices=["elasticsearch", "postgres"], help="repeat to compare backends"
+    )
+    parser.add_argument("--es-url", default="http://localhost:9200")
+    parser.add_argument("--fake", action="store_true", help="use the in-process Elasticsearch stand-in only")
+    parser.add_argument("--sizes", type=lambda v: [int(s) for s in v.split(",")], default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--docs", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+    args.backend = args.backend or ["elasticsearch"]
+
+    results = asyncio.run(run(args))
+    for backend, rows in results.items():
+        for r in rows:
+            print(
+                f"{backend:<18} {r['doc_chars']:>10} chars  {r['docs_per_s']:>8.1f} docs/s  "
+                f"{r['mb_per_s']:>7.2f} MB/s  p50 {r['query_p50_ms']:>7.2f} ms  p95 {r['query_p95_ms']:>7.2f} ms  "
+                f"index {r.get('index_bytes', 0) / 1e6:>8.1f} MB  heap {r.get('heap_used_bytes', 0) / 1e6:>8.1f} MB"
+            )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Cold start cost: import time of the app and time from process start to the first served request.
+
+    python -m benchmarks.bench_startup --runs 5 --output startup.json
+
+Each run is a fresh interpreter, with FAST_START off and on. Without reachable dependencies the normal start waits
+for the database and Elasticsearch checks to fail, which is what a cold instance sees while they are slow.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+IMPORT_SNIPPET = "import time; start = time.perf_counter(); import main; print(time.perf_counter() - start)"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def environment(fast_start: bool) -> dict:
+    return {
+        **os.environ,
+        "FAST_START": str(fast_start).lower(),
+        "PYTHONPATH": str(BACKEND_DIR),
+        "TRANSFER_SECRET": os.environ.get("TRANSFER_SECRET") or "bench-transfer-secret",
+    }
+
+
+def import_time(fast_start: bool) -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        cwd=BACKEND_DIR, env=environment(fast_start), capture_output=True, text=True, check=True
+    )
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def first_request_time(fast_start: bool, timeout: float) -> float:
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=environment(fast_start), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1):
+                    return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError(f"no response within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Startup time benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=120, help="seconds to wait for the first response")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    results = {}
+    for fast_start in (False, True):
+        imports = [import_time(fast_start) for _ in range(args.runs)]
+        first_requests = [first_request_time(fast_start, args.timeout) for _ in range(args.runs)]
+        mode = "fast_start" if fast_start else "default"
+        results[mode] = {
+            "import_s": statistics.median(imports),
+            "first_request_s": statistics.median(first_requests),
+        }
+        print(f"{mode:<12} import {results[mode]['import_s']:>7.3f} s  "
+              f"first request {results[mode]['first_request_s']:>7.3f} s")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Filename autocomplete latency at millions of files.
+
+    python -m benchmarks.bench_suggest --files 5000000 --users 1000 --output suggest.json
+
+Needs the Postgres configured in settings. Rows are COPYed in for throwaway bench users and removed afterwards
+(unless --keep); queries go through FileService.suggest_files, so the plan is the one the endpoint gets.
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime
+
+from sqlalchemy import delete, text
+
+from api.services.files import FileService
+from benchmarks.corpora import WORDS
+from db import init_models
+from db.database import async_session, engine
+from models.file import File
+from models.user import User
+
+EXTENSIONS = (".pdf", ".txt", ".json")
+COPY_BATCH = 100_000
+
+
+def file_name(rng: random.Random) -> str:
+    words = rng.sample(WORDS, rng.randint(1, 3))
+    return f"{'-'.join(words).title()}-{rng.randrange(10_000)}{rng.choice(EXTENSIONS)}"
+
+
+async def populate(owners: list, files: int, rng: random.Random) -> None:
+    async with engine.connect() as conn:
+        await conn.execute(User.__table__.insert(), [
+            {"id": owner, "email": f"bench-suggest-{owner}@example.com", "name": "bench", "role": "user"}
+            for owner in owners
+        ])
+        await conn.commit()
+
+        raw = (await conn.get_raw_connection()).driver_connection
+        now = datetime.utcnow()
+        for start in range(0, files, COPY_BATCH):
+            records = []
+            for _ in range(min(COPY_BATCH, files - start)):
+                file_id, owner, name = str(uuid.uuid4()), rng.choice(owners), file_name(rng)
+                records.append((file_id, name, name[name.rfind("."):], 1024, owner, f"{owner}/{file_id}", now))
+            await raw.copy_records_to_table(
+                "files",
+                records=records,
+                columns=["id", "name", "type", "size", "owner_id", "file_path", "created_at"]
+            )
+            print(f"\rinserted {start + len(records):>10}", end="", flush=True)
+        print()
+        await conn.execute(text("ANALYZE files"))
+        await conn.commit()
+
+
+async def measure(owners: list, queries: int, limit: int, rng: random.Random) -> dict:
+    service = FileService()
+    latencies = []
+    async with async_session() as db:
+        for _ in range(queries):
+            # What a user has typed after one to four keystrokes
+            prefix = rng.choice(WORDS)[:rng.randint(1, 4)]
+            user = {"user_id": rng.choice(owners)}
+            start = time.perf_counter()
+            await service.suggest_files(db, user, prefix, limit)
+            latencies.append(time.perf_counter() - start)
+
+    quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {"p50_ms": quantiles[49] * 1e3, "p95_ms": quantiles[94] * 1e3, "p99_ms": quantiles[98] * 1e3}
+
+
+async def cleanup(owners: list) -> None:
+    async with engine.begin() as conn:
+        await conn.execute(delete(File).where(File.owner_id.in_(owners)))
+        await conn.execute(delete(User).where(User.id.in_(owners)))
+
+
+async def run(args) -> dict:
+    rng = random.Random(args.seed)
+    owners = [uuid.UUID(int=rng.getrandbits(128)) for _ in range(args.users)]
+    engine.echo = False
+    await init_models()
+    try:
+        await populate(owners, args.files, rng)
+        result = await measure(owners, args.queries, args.limit, rng)
+    finally:
+        if not args.keep:
+            await cleanup(owners)
+        await engine.dispose()
+    return {"files": args.files, "users": args.users, **result}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Filename autocomplete benchmark")
+    parser.add_argument("--files", type=int, default=2_000_000)
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--queries", type=int, default=2_000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--target-ms", type=float, default=10.0, help="fail when p95 is above this")
+    parser.add_argument("--keep", action="store_true", help="leave the bench rows in place")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    print(f"p50 {result['p50_ms']:.2f} ms  p95 {result['p95_ms']:.2f} ms  p99 {result['p99_ms']:.2f} ms")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    if result["p95_ms"] > args.target_ms:
+        sys.exit(f"p95 above target of {args.target_ms} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Deterministic synthetic documents for offline benchmarks"""
+import json
+import random
+
+WORDS = (
+    "file storage bucket index search query upload download service cloud report invoice "
+    "contract budget forecast quarterly revenue customer account payment schedule policy"
+).split()
+
+
+def make_words(count: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+def make_txt(size: int) -> bytes:
+    text = make_words(size // 6 + 1)
+    return text.encode()[:size]
+
+
+def make_json(size: int) -> bytes:
+    records = []
+    total = 2
+    i = 0
+    while total < size:
+        record = {"id": i, "status": "failed" if i % 7 == 0 else "ok", "note": make_words(8, seed=i)}
+        total += len(json.dumps(record)) + 2
+        records.append(record)
+        i += 1
+    return json.dumps({"records": records}).encode()
+
+
+def make_pdf(pages: int, lines_per_page: int = 40) -> bytes:
+    """Minimal PDF with one Helvetica text stream per page, readable by PyPDF2"""
+    page_ids = [4 + 2 * i for i in range(pages)]
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        2: f"<< /Type /Pages /Kids [{' '.join(f'{p} 0 R' for p in page_ids)}] /Count {pages} >>".encode(),
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    }
+    for n, page_id in enumerate(page_ids):
+        lines = " ".join(f"({make_words(10, seed=n * lines_per_page + i)}) '" for i in range(lines_per_page))
+        stream = f"BT /F1 10 Tf 12 TL 50 770 Td {lines} ET".encode()
+        objects[page_id] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>"
+        ).encode()
+        objects[page_id + 1] = b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for obj_id in sorted(objects):
+        offsets[obj_id] = len(out)
+        out += b"%d 0 obj\n%s\nendobj\n" % (obj_id, objects[obj_id])
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for obj_id in sorted(objects):
+        out += b"%010d 00000 n \n" % offsets[obj_id]
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
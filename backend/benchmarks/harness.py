@@ -0,0 +1,104 @@
+import asyncio
+import fnmatch
+import inspect
+import json
+import platform
+import statistics
+import time
+from datetime import datetime, timezone
+
+BENCHMARKS = {}
+
+
+def benchmark(name: str, **params):
+    """Register a benchmark; params are passed to the function as keyword arguments"""
+    def register(func):
+        BENCHMARKS[name] = (func, params)
+        return func
+    return register
+
+
+async def _run_async(func, params: dict, number: int) -> float:
+    start = time.perf_counter()
+    for _ in range(number):
+        await func(**params)
+    return time.perf_counter() - start
+
+
+def _run_sync(func, params: dict, number: int) -> float:
+    start = time.perf_counter()
+    for _ in range(number):
+        func(**params)
+    return time.perf_counter() - start
+
+
+def measure(func, params: dict, rounds: int, min_round_time: float) -> dict:
+    """Calibrate iterations per round to min_round_time, then report per-call timings in seconds"""
+    if inspect.iscoroutinefunction(func):
+        loop = asyncio.new_event_loop()
+
+        def timer(number):
+            return loop.run_until_complete(_run_async(func, params, number))
+    else:
+        loop = None
+
+        def timer(number):
+            return _run_sync(func, params, number)
+
+    try:
+        number = 1
+        while (elapsed := timer(number)) < min_round_time and number < 1_000_000:
+            number *= 10 if elapsed < min_round_time / 10 else 2
+        samples = [timer(number) / number for _ in range(rounds)]
+    finally:
+        if loop:
+            loop.close()
+
+    return {
+        "median": statistics.median(samples),
+        "min": min(samples),
+        "mean": statistics.fmean(samples),
+        "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "rounds": rounds,
+        "number": number,
+    }
+
+
+def run(patterns=None, rounds: int = 7, min_round_time: float = 0.05) -> dict:
+    results = {}
+    for name, (func, params) in BENCHMARKS.items():
+        if patterns and not any(fnmatch.fnmatch(name, pattern) for pattern in patterns):
+            continue
+        results[name] = measure(func, params, rounds, min_round_time)
+        print(f"{name:<45} {results[name]['median'] * 1e6:>12.1f} us")
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+        },
+        "benchmarks": results,
+    }
+
+
+def compare(current: dict, baseline: dict, max_regression: float) -> list:
+    """Return (name, baseline median, current median, ratio) for every benchmark slower than allowed"""
+    regressions = []
+    for name, result in current["benchmarks"].items():
+        reference = baseline["benchmarks"].get(name)
+        if not reference:
+            continue
+        ratio = result["median"] / reference["median"]
+        if ratio > 1 + max_regression:
+            regressions.append((name, reference["median"], result["median"], ratio))
+    return regressions
+
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def dump(results: dict, path: str) -> None:
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
@@ -0,0 +1,77 @@
+"""Register every supported file of a directory tree or bucket prefix for one user.
+
+    python -m bulk_import ./team-share --user alice@example.com
+    python -m bulk_import gs://legacy-bucket/reports/ --user alice@example.com --concurrency 16
+
+Files keep their name; their bytes are copied into the configured storage, extracted, indexed and counted in the
+usage tables like regular uploads. Re-running the same import only registers what is missing.
+"""
+import argparse
+import asyncio
+import json
+import os
+
+from sqlalchemy import select
+
+from api.services.files import file_service
+from bulk_import.pipeline import BulkImporter
+from bulk_import.sources import open_source
+from core.settings import settings
+from db import init_models
+from db.database import async_session, engine
+from models.user import User
+
+
+async def find_user(email: str):
+    async with async_session() as db:
+        result = await db.execute(select(User.id).where(User.email == email))
+        user_id = result.scalar_one_or_none()
+    if user_id is None:
+        raise SystemExit(f"No user with email {email}; they must sign in once first")
+    return user_id
+
+
+async def run(args) -> dict:
+    engine.echo = False
+    try:
+        await init_models()
+        await file_service.init()
+        importer = BulkImporter(
+            file_service,
+            async_session,
+            await find_user(args.user),
+            concurrency=args.concurrency,
+            extract_workers=args.extract_workers,
+            batch_size=args.batch_size
+        )
+        return await importer.run(open_source(args.source, settings.GCP_PROJECT_ID or None))
+    finally:
+        await file_service.close()
+        await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bulk import files for a user")
+    parser.add_argument("source", help="local directory or gs://bucket/prefix")
+    parser.add_argument("--user", required=True, help="email of the owner")
+    parser.add_argument("--concurrency", type=int, default=8, help="files read, copied and extracted at once")
+    parser.add_argument(
+        "--extract-workers", type=int, default=os.cpu_count(), help="processes for PDF extraction (0: threads)"
+    )
+    parser.add_argument("--batch-size", type=int, default=200, help="files per INSERT and search index write")
+    parser.add_argument("--output", help="write the report as JSON to this path")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print(
+        f"imported {report['imported']} files ({report['bytes'] / 1e6:.1f} MB) in {report['seconds']:.1f} s: "
+        f"{report['files_per_s']:.1f} files/s, {report['bytes_per_s'] / 1e6:.2f} MB/s; "
+        f"{report['skipped']} already imported, {report['unsupported']} unsupported, {report['failed']} failed"
+    )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+import asyncio
+import itertools
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import PurePosixPath
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from api.services.extractors import extract_text, is_expensive
+from api.services.files import ALLOWED_MIME_TYPES, MAX_FILE_SIZE, FileService
+from api.services.listing_cache import listing_cache
+from api.services.previews import build_preview_and_fields
+from api.services.search import SearchDocument
+from api.services.usage import usage_service
+from core.settings import settings
+from models.file import File, FilePreview
+
+# Namespace of the ids of imported files: uuid5(namespace, "<owner>:<source uri>") is the same on every run
+IMPORT_NAMESPACE = uuid.UUID("6f1c2a56-3b8e-4f0e-9d3a-52a1c7e0b1d4")
+EXISTING_LOOKUP_SIZE = 1000
+
+
+def import_file_id(owner_id, uri: str) -> str:
+    return str(uuid.uuid5(IMPORT_NAMESPACE, f"{owner_id}:{uri}"))
+
+
+class BulkImporter:
+    """Registers every supported file of a source for one user.
+
+    Files flow through a pipeline: the source listing is checked against the files table in chunks, `concurrency`
+    workers read, copy into storage and extract each file (expensive extractions go to a process pool), and one
+    writer inserts and indexes them in batches of `batch_size` with a single INSERT and a single search backend
+    write (one _bulk request with Elasticsearch). Ids are derived from the source uri, so a re-run skips files that
+    are already registered and overwrites whatever an interrupted run left in storage and the search index.
+    """
+
+    def __init__(
+            self,
+            files: FileService,
+            session_factory,
+            owner_id,
+            concurrency: int = 8,
+            extract_workers: int = 0,
+            batch_size: int = 200
+    ):
+        self.files = files
+        self.session_factory = session_factory
+        self.owner = {"user_id": str(owner_id)}
+        self.concurrency = concurrency
+        self.extract_workers = extract_workers
+        self.batch_size = batch_size
+        self.stats = dict.fromkeys(("imported", "bytes", "skipped", "unsupported", "failed"), 0)
+        self._executor = None
+
+    async def _new_files(self, entries: list) -> list:
+        """Supported entries, with the id they will get, minus those imported by a previous run"""
+        allowed = set(ALLOWED_MIME_TYPES.values())
+        candidates = []
+        for entry in entries:
+            file_ext = PurePosixPath(entry.name).suffix.lower()
+            if file_ext not in allowed or entry.size > MAX_FILE_SIZE:
+                self.stats["unsupported"] += 1
+                continue
+            candidates.append((import_file_id(self.owner["user_id"], entry.uri), file_ext, entry))
+        if not candidates:
+            return []
+
+        async with self.session_factory() as db:
+            result = await db.execute(select(File.id).where(File.id.in_([file_id for file_id, _, _ in candidates])))
+            existing = set(result.scalars().all())
+
+        self.stats["skipped"] += len(existing)
+        return [candidate for candidate in candidates if candidate[0] not in existing]
+
+    async def _list_new_files(self, source, pending: asyncio.Queue) -> None:
+        """Feed the workers from the source listing, EXISTING_LOOKUP_SIZE entries at a time, then stop them"""
+        try:
+            entries = iter(source.iter_files())
+            while chunk := await asyncio.to_thread(list, itertools.islice(entries, EXISTING_LOOKUP_SIZE)):
+                for candidate in await self._new_files(chunk):
+                    await pending.put(candidate)
+        finally:
+            for _ in range(self.concurrency):
+                await pending.put(None)
+
+    async def _extract(self, content: bytes, file_ext: str) -> str:
+        # Like an upload, a file whose text cannot be extracted is still imported, with no text to search
+        try:
+            if self._executor and is_expensive(file_ext):
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(
+                    self._executor, extract_text, content, file_ext, settings.INDEX_MAX_CHARS, None
+                )
+            return await asyncio.to_thread(extract_text, content, file_ext, settings.INDEX_MAX_CHARS, None)
+        except Exception as e:
+            print(f"Text extraction failed: {e}")
+            return ""
+
+    async def _copy_and_extract(self, source, pending: asyncio.Queue, ready: asyncio.Queue) -> None:
+        while (candidate := await pending.get()) is not None:
+            file_id, file_ext, entry = candidate
+            try:
+                content = await asyncio.to_thread(source.read, entry)
+                path = self.files._generate_path(file_id, file_ext, self.owner)
+                await self.files._upload_to_storage(content, path)
+                text = await self._extract(content, file_ext)
+                preview, fields = await asyncio.to_thread(build_preview_and_fields, content, file_ext, text)
+            except Exception as e:
+                self.stats["failed"] += 1
+                print(f"⚠ Warning: Failed to import {entry.uri}: {e}")
+                continue
+            await ready.put({
+                "id": file_id,
+                "name": entry.name,
+                "type": file_ext,
+                "size": len(content),
+                "path": path,
+                "text": text,
+                "preview": preview,
+                "fields": fields
+            })
+
+    async def _flush(self, batch: list) -> None:
+        created_at = datetime.utcnow()
+        try:
+            async with self.session_factory() as db:
+                stmt = pg_insert(File).values([
+                    {
+                        "id": record["id"],
+                        "name": record["name"],
+                        "type": record["type"],
+                        "size": record["size"],
+                        "owner_id": self.owner["user_id"],
+                        "file_path": record["path"],
+                        "created_at": created_at
+                    }
+                    for record in batch
+                ]).on_conflict_do_nothing(index_elements=[File.id]).returning(File.id, File.type, File.size)
+                inserted = (await db.execute(stmt)).all()
+
+                records = {record["id"]: record for record in batch}
+                if inserted:
+                    await db.execute(pg_insert(FilePreview).values([
+                        {"file_id": file_id, **records[file_id]["preview"]} for file_id, _, _ in inserted
+                    ]))
+                await self.files.search.index_many(db, [
+                    SearchDocument(
+                        file_id, records[file_id]["text"], self.owner["user_id"], records[file_id]["fields"], file_type,
+                        created_at
+                    )
+                    for file_id, file_type, _ in inserted
+                ])
+
+                per_type = defaultdict(lambda: [0, 0])
+                for _, file_type, size in inserted:
+                    per_type[file_type][0] += 1
+                    per_type[file_type][1] += size
+                for file_type, (count, total_bytes) in per_type.items():
+                    await usage_service.record_many(db, self.owner["user_id"], file_type, count, total_bytes)
+                if inserted:
+                    await listing_cache.bump(db, self.owner["user_id"])
+                await db.commit()
+        except Exception as e:
+            self.stats["failed"] += len(batch)
+            print(f"⚠ Warning: Failed to register a batch of {len(batch)} files: {e}")
+            return
+
+        self.stats["imported"] += len(inserted)
+        self.stats["skipped"] += len(batch) - len(inserted)
+        self.stats["bytes"] += sum(size for _, _, size in inserted)
+        print(f"imported {self.stats['imported']} files, {self.stats['bytes'] / 1e6:.1f} MB", flush=True)
+
+    async def _write_batches(self, ready: asyncio.Queue) -> None:
+        batch = []
+        while (record := await ready.get()) is not None:
+            batch.append(record)
+            if len(batch) >= self.batch_size:
+                await self._flush(batch)
+                batch = []
+        if batch:
+            await self._flush(batch)
+
+    async def run(self, source) -> dict:
+        start = time.perf_counter()
+        # Both queues are bounded, so neither the listing nor extraction can run far ahead of indexing
+        pending = asyncio.Queue(maxsize=EXISTING_LOOKUP_SIZE)
+        ready = asyncio.Queue(maxsize=self.batch_size)
+
+        self._executor = ProcessPoolExecutor(self.extract_workers) if self.extract_workers else None
+        try:
+            writer = asyncio.create_task(self._write_batches(ready))
+            await asyncio.gather(
+                self._list_new_files(source, pending),
+                *[self._copy_and_extract(source, pending, ready) for _ in range(self.concurrency)]
+            )
+            await ready.put(None)
+            await writer
+        finally:
+            if self._executor:
+                self._executor.shutdown()
+
+        elapsed = time.perf_counter() - start
+        return {
+            **self.stats,
+            "seconds": elapsed,
+            "files_per_s": self.stats["imported"] / elapsed,
+            "bytes_per_s": self.stats["bytes"] / elapsed,
+        }
@@ -0,0 +1,49 @@
+import os
+from pathlib import Path
+from typing import Iterator, NamedTuple
+
+
+class SourceFile(NamedTuple):
+    uri: str  # stable identity of the file in its source, the file id is derived from it
+    name: str
+    size: int
+
+
+class LocalSource:
+    """Every file under a local directory"""
+
+    def __init__(self, root: str):
+        self.root = Path(root).resolve()
+        if not self.root.is_dir():
+            raise ValueError(f"{root} is not a directory")
+
+    def iter_files(self) -> Iterator[SourceFile]:
+        for directory, _, names in os.walk(self.root):
+            for name in sorted(names):
+                path = Path(directory) / name
+                yield SourceFile(str(path), name, path.stat().st_size)
+
+    def read(self, source_file: SourceFile) -> bytes:
+        return Path(source_file.uri).read_bytes()
+
+
+class GCSSource:
+    """Every object under a gs://bucket/prefix"""
+
+    def __init__(self, url: str, project: str = None):
+        from google.cloud import storage
+
+        bucket_name, _, self.prefix = url.removeprefix("gs://").partition("/")
+        self.bucket = storage.Client(project=project).bucket(bucket_name)
+
+    def iter_files(self) -> Iterator[SourceFile]:
+        for blob in self.bucket.list_blobs(prefix=self.prefix):
+            if not blob.name.endswith("/"):
+                yield SourceFile(f"gs://{self.bucket.name}/{blob.name}", blob.name.rsplit("/", 1)[-1], blob.size)
+
+    def read(self, source_file: SourceFile) -> bytes:
+        return self.bucket.blob(source_file.uri.split("/", 3)[3]).download_as_bytes()
+
+
+def open_source(location: str, project: str = None):
+    return GCSSource(location, project) if location.startswith("gs://") else LocalSource(location)
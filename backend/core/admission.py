@@ -0,0 +1,131 @@
+import asyncio
+import re
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException
+from starlette.responses import JSONResponse
+from starlette import status
+
+from core.metrics import (
+    admission_active_uploads, admission_inflight_bytes, admission_extraction_queue, admission_rejections
+)
+from core.settings import settings
+
+UNKNOWN_LENGTH_CHARGE = 100 * 1024 * 1024  # bytes charged when an upload has no Content-Length
+
+
+class AdmissionRejected(HTTPException):
+
+    def __init__(self, status_code: int, reason: str, detail: str, retry_after: int):
+        super().__init__(status_code=status_code, detail=detail, headers={"Retry-After": str(retry_after)})
+        self.reason = reason
+
+
+class AdmissionController:
+    """Fail-fast limits on concurrent uploads, their bytes and queued text extractions for this worker"""
+
+    def __init__(
+            self,
+            max_uploads: int,
+            max_inflight_bytes: int,
+            max_extractions: int,
+            max_queued_extractions: int,
+            retry_after: int
+    ):
+        self.max_uploads = max_uploads
+        self.max_inflight_bytes = max_inflight_bytes
+        self.max_queued_extractions = max_queued_extractions
+        self.retry_after = retry_after
+        self.active_uploads = 0
+        self.inflight_bytes = 0
+        self.queued_extractions = 0
+        self._extractions = asyncio.Semaphore(max_extractions)
+
+    def _reject(self, status_code: int, reason: str, detail: str):
+        admission_rejections.labels(reason).inc()
+        raise AdmissionRejected(status_code, reason, detail, self.retry_after)
+
+    def admit_upload(self, size: int) -> None:
+        if size > self.max_inflight_bytes:
+            self._reject(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, "too_large", "Upload exceeds the byte budget")
+        if self.active_uploads >= self.max_uploads:
+            self._reject(status.HTTP_429_TOO_MANY_REQUESTS, "concurrency", "Too many concurrent uploads")
+        if self.inflight_bytes + size > self.max_inflight_bytes:
+            self._reject(status.HTTP_429_TOO_MANY_REQUESTS, "bytes", "Too many upload bytes in flight")
+
+        self.active_uploads += 1
+        self.inflight_bytes += size
+        admission_active_uploads.set(self.active_uploads)
+        admission_inflight_bytes.set(self.inflight_bytes)
+
+    def release_upload(self, size: int) -> None:
+        self.active_uploads -= 1
+        self.inflight_bytes -= size
+        admission_active_uploads.set(self.active_uploads)
+        admission_inflight_bytes.set(self.inflight_bytes)
+
+    def _set_queued(self, delta: int) -> None:
+        self.queued_extractions += delta
+        admission_extraction_queue.set(self.queued_extractions)
+
+    @asynccontextmanager
+    async def extraction_slot(self):
+        if self.queued_extractions >= self.max_queued_extractions:
+            self._reject(status.HTTP_503_SERVICE_UNAVAILABLE, "extraction", "Text extraction is saturated")
+
+        self._set_queued(1)
+        acquired = False
+        try:
+            async with self._extractions:
+                acquired = True
+                self._set_queued(-1)
+                yield
+        finally:
+            if not acquired:
+                self._set_queued(-1)
+
+
+class UploadAdmissionMiddleware:
+    """Admits upload requests before their body is read, so rejected requests cost no memory.
+
+    `paths` are regular expressions matched against the whole request path. Register it before CORSMiddleware so
+    that its 429 and 413 answers carry the CORS headers the browser needs to read Retry-After.
+    """
+
+    def __init__(self, app, paths: tuple, methods: tuple = ("POST", "PUT")):
+        self.app = app
+        self.paths = re.compile("|".join(f"(?:{path})" for path in paths))
+        self.methods = methods
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in self.methods or not self.paths.fullmatch(scope["path"]):
+            return await self.app(scope, receive, send)
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is None:
+            size = UNKNOWN_LENGTH_CHARGE
+        elif content_length.strip().isdigit():
+            size = int(content_length)
+        else:
+            # A negative length would lower the in-flight byte count instead of charging it
+            response = JSONResponse({"detail": "Invalid Content-Length"}, status_code=status.HTTP_400_BAD_REQUEST)
+            return await response(scope, receive, send)
+        try:
+            admission.admit_upload(size)
+        except AdmissionRejected as e:
+            response = JSONResponse({"detail": e.detail}, status_code=e.status_code, headers=e.headers)
+            return await response(scope, receive, send)
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            admission.release_upload(size)
+
+
+admission = AdmissionController(
+    settings.UPLOAD_MAX_CONCURRENT,
+    settings.UPLOAD_MAX_INFLIGHT_BYTES,
+    settings.EXTRACTION_MAX_CONCURRENT,
+    settings.EXTRACTION_MAX_QUEUED,
+    settings.ADMISSION_RETRY_AFTER
+)
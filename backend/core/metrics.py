@@ -1,4 +1,12 @@
-from prometheus_client import Counter, Histogram
+import asyncio
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from core.settings import settings
+
+STORAGE_BACKEND = "gcs" if settings.USE_GCS == "true" else "local"
 
 files_uploaded = Counter("files_uploaded_total", "Total number of uploaded files")
 files_downloaded = Counter("files_downloaded_total", "Total number of downloaded files")
@@ -16,3 +24,61 @@ download_size_bytes = Histogram(
     "Size of downloaded files in bytes",
     buckets=[1e3, 1e4, 1e5, 1e6, 1e7, 1e8]
 )
+
+stage_duration_seconds = Histogram(
+    "file_operation_stage_duration_seconds",
+    "Duration of each stage of a file operation",
+    ["operation", "stage", "storage", "file_type"],
+    buckets=[0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+)
+
+# Gauges hold per-worker state; multiprocess_mode says how /metrics combines the live workers' values
+# when running under gunicorn with PROMETHEUS_MULTIPROC_DIR (see gunicorn.conf.py). Ignored otherwise.
+bytes_in_flight = Gauge(
+    "file_bytes_in_flight",
+    "File bytes currently held by uploads and downloads being processed",
+    ["direction"],
+    multiprocess_mode="livesum"
+)
+
+admission_active_uploads = Gauge(
+    "admission_active_uploads", "Upload requests currently admitted", multiprocess_mode="livesum"
+)
+admission_inflight_bytes = Gauge(
+    "admission_inflight_bytes", "Declared bytes of admitted upload requests", multiprocess_mode="livesum"
+)
+admission_extraction_queue = Gauge(
+    "admission_extraction_queue", "Text extractions waiting for a slot", multiprocess_mode="livesum"
+)
+admission_rejections = Counter(
+    "admission_rejections_total",
+    "Requests rejected by admission control",
+    ["reason"]
+)
+
+event_loop_lag_seconds = Gauge(
+    "event_loop_lag_seconds",
+    "How late the event loop woke up a periodic timer",
+    multiprocess_mode="livemax"
+)
+
+
+@contextmanager
+def track_stage(operation: str, stage: str, file_type: str = ""):
+    """Time a block into stage_duration_seconds; file_type may be filled in from inside the block"""
+    labels = {"file_type": file_type}
+    start = time.perf_counter()
+    try:
+        yield labels
+    finally:
+        stage_duration_seconds.labels(operation, stage, STORAGE_BACKEND, labels["file_type"]).observe(
+            time.perf_counter() - start
+        )
+
+
+async def monitor_event_loop_lag(interval: float = 0.5) -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        event_loop_lag_seconds.set(max(0.0, loop.time() - start - interval))
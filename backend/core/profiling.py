@@ -0,0 +1,201 @@
+import asyncio
+import fcntl
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+from core.settings import settings
+
+PROFILE_HEADER = b"x-profile-request"
+EXCLUDED_PATHS = ("/metrics", "/api/admin/profiling")
+MAX_STORED_PROFILES = 100
+ARM_FILE = "armed.state"
+LOCK_FILE = "armed.lock"
+STATE_REFRESH_INTERVAL = 1.0  # seconds a worker goes without re-reading the arm file
+
+
+class SamplingProfiler:
+    """Samples the stack of one thread from a helper thread and aggregates it as collapsed stacks.
+
+    The event loop thread is shared by every in-flight request, so samples of a profiled request
+    also contain whatever else the loop ran at that moment.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+
+class ProfilingState:
+    """Admin-armed profiling: either the next N requests or requests carrying the profile header.
+
+    The arm state is a file in output_dir, next to the profiles, so arming through any worker arms every worker that
+    shares the directory. Each worker re-reads it at most once per STATE_REFRESH_INTERVAL, and claims hold a file
+    lock so that the request count is shared.
+    """
+
+    def __init__(self, output_dir: Path, interval: float):
+        self.output_dir = output_dir
+        self.interval = interval
+        self.enabled = False  # this worker's view of the arm file
+        self._refreshed_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def _arm_path(self) -> Path:
+        return self.output_dir / ARM_FILE
+
+    @contextmanager
+    def _locked(self):
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        with self._lock, open(self.output_dir / LOCK_FILE, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def _read(self):
+        try:
+            return json.loads(self._arm_path.read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write(self, state) -> None:
+        if state is None:
+            self._arm_path.unlink(missing_ok=True)
+            self.enabled = False
+            return
+        # Replaced in one step, so a worker refreshing without the lock never reads half a file
+        pending = self._arm_path.with_suffix(".tmp")
+        pending.write_text(json.dumps(state))
+        os.replace(pending, self._arm_path)
+        self.enabled = True
+
+    def arm(self, requests: int = 0, header: bool = False, duration: int = 300) -> dict:
+        """requests=0 is only meaningful in header mode, where it profiles every marked request until expiry"""
+        with self._locked():
+            self._write({
+                "mode": "header" if header else "count",
+                "remaining": requests or None,
+                "expires_at": time.time() + duration
+            })
+        return self.status()
+
+    def disarm(self) -> None:
+        with self._locked():
+            self._write(None)
+
+    def status(self) -> dict:
+        state = self._read()
+        if state is None or time.time() > state["expires_at"]:
+            return {"enabled": False, "mode": None, "remaining": None, "expires_at": None}
+        return {"enabled": True, **state}
+
+    def is_armed(self) -> bool:
+        """This worker's view, refreshed from the arm file at most once per STATE_REFRESH_INTERVAL"""
+        now = time.monotonic()
+        if now - self._refreshed_at >= STATE_REFRESH_INTERVAL:
+            self._refreshed_at = now
+            self.enabled = self._arm_path.exists()
+        return self.enabled
+
+    def claim(self, scope: dict) -> bool:
+        """Decide whether this request is profiled, consuming one slot if so"""
+        if scope["path"].startswith(EXCLUDED_PATHS):
+            return False
+        with self._locked():
+            state = self._read()
+            if state is None:
+                self.enabled = False
+                return False
+            if time.time() > state["expires_at"]:
+                self._write(None)
+                return False
+            if state["mode"] == "header" and PROFILE_HEADER not in dict(scope["headers"]):
+                return False
+            if state["remaining"] is not None:
+                state["remaining"] -= 1
+                self._write(state if state["remaining"] else None)
+            return True
+
+    def save(self, scope: dict, stacks: Counter, duration: float) -> str:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        profile_id = f"{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}"
+        (self.output_dir / f"{profile_id}.collapsed").write_text(
+            "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+        )
+        (self.output_dir / f"{profile_id}.json").write_text(json.dumps({
+            "id": profile_id,
+            "method": scope["method"],
+            "path": scope["path"],
+            "duration": duration,
+            "samples": sum(stacks.values())
+        }))
+        self._prune()
+        return profile_id
+
+    def _prune(self) -> None:
+        stored = sorted(self.output_dir.glob("*.json"))
+        for metadata in stored[:-MAX_STORED_PROFILES]:
+            metadata.unlink(missing_ok=True)
+            metadata.with_suffix(".collapsed").unlink(missing_ok=True)
+
+    def list_profiles(self) -> list:
+        if not self.output_dir.exists():
+            return []
+        return [json.loads(path.read_text()) for path in sorted(self.output_dir.glob("*.json"), reverse=True)]
+
+    def profile_path(self, profile_id: str):
+        path = self.output_dir / f"{Path(profile_id).name}.collapsed"
+        return path if path.is_file() else None
+
+
+class ProfilingMiddleware:
+    """ASGI middleware; costs a clock read per request while profiling is not armed"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not profiling.is_armed() or scope["type"] != "http" or not profiling.claim(scope):
+            return await self.app(scope, receive, send)
+
+        sampler = SamplingProfiler(threading.get_ident(), profiling.interval)
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            duration = time.perf_counter() - start
+            # Joining the sampler and writing the files would stall every other request on the loop
+            stacks = await asyncio.to_thread(sampler.stop)
+            await asyncio.to_thread(profiling.save, scope, stacks, duration)
+
+
+profiling = ProfilingState(Path(settings.PROFILING_DIR), settings.PROFILING_INTERVAL_MS / 1000)
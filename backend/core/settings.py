@@ -21,6 +21,9 @@ class Settings(BaseSettings):
     GOOGLE_APPLICATION_CREDENTIALS: str = ""
     GCP_PROJECT_ID: str = ""
 
+    # Serve before the schema and search index checks finish; /ready reports when they have
+    FAST_START: bool = False
+
     BASE_URL: str = "http://localhost:8000"
 
     GOOGLE_CLIENT_ID: str = ""
@@ -31,7 +34,45 @@ class Settings(BaseSettings):
     JWT_ALGORITHM: str = "HS256"
     JWT_EXPIRATION: int = 24
 
-    ELASTICSEARCH_URL: str = "http://elasticsearch:9200"
+    ELASTICSEARCH_URL: str = "http://elasticsearch:9200"  # comma separated to spread requests over several nodes
+    ELASTICSEARCH_CONNECTIONS: int = 10  # per node
+    ELASTICSEARCH_TIMEOUT: float = 10  # seconds per request
+    ELASTICSEARCH_MAX_RETRIES: int = 3
+    ELASTICSEARCH_HTTP_COMPRESS: bool = False
+    # Only applied when the indices are created; changing them needs new indices, see README
+    ELASTICSEARCH_SHARDS: int = 1
+    ELASTICSEARCH_REPLICAS: int = 0
+    ELASTICSEARCH_ROUTING: bool = False  # route documents and searches by owner
+    ELASTICSEARCH_INDEX_PREFIX: str = ""
+
+    SEARCH_BACKEND: str = "elasticsearch"  # or "postgres"
+    PG_SEARCH_MAX_CHARS: int = 200_000  # extracted text searchable with the postgres backend
+
+    SIGNED_URL_EXPIRATION: int = 900  # seconds
+    TRANSFER_SECRET: str = ""  # key of signed transfer URLs and upload tokens, distinct from JWT_SECRET; required
+
+    PROFILING_DIR: str = "profiles"
+    PROFILING_INTERVAL_MS: int = 5
+
+    USAGE_RECONCILE_INTERVAL: int = 3600  # seconds
+
+    UPLOAD_MAX_CONCURRENT: int = 8
+    UPLOAD_MAX_INFLIGHT_BYTES: int = 1536 * 1024 * 1024  # must fit one full 10 x 100MB request
+    EXTRACTION_MAX_CONCURRENT: int = 2
+    EXTRACTION_MAX_QUEUED: int = 16
+    ADMISSION_RETRY_AFTER: int = 5  # seconds
+
+    UPLOAD_SESSION_TTL: int = 24 * 3600  # seconds since the last chunk before a resumable upload expires
+    UPLOAD_SESSION_CLEANUP_INTERVAL: int = 3600  # seconds
+    UPLOAD_CHUNK_MAX_SIZE: int = 16 * 1024 * 1024
+    UPLOAD_CHUNK_MIN_SIZE: int = 256 * 1024  # except the last chunk; bounds the chunks a session can have
+    UPLOAD_COMPLETE_TIMEOUT: int = 15 * 60  # seconds before a claimed completion is taken to have died
+
+    LISTING_CACHE_OWNERS: int = 10_000  # listing versions kept in memory per process
+    LISTING_CACHE_MAX_BYTES: int = 32 * 1024 * 1024  # serialized first pages kept in memory per process
+
+    EXTRACTION_CACHE_MAX_CHARS: int = 20_000_000
+    INDEX_MAX_CHARS: int = 1_000_000  # extracted text indexed per file, split into passages past the first 10k
 
     @property
     def DATABASE_URL(self) -> str:
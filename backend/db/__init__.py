@@ -1,11 +1,60 @@
+import asyncio
+import re
+
+from sqlalchemy import text
+from sqlalchemy.schema import CreateIndex
+
 from db.database import engine, Base
 
 
 async def init_models():
-
+    # New tables come with their indexes; indexes added to existing tables are built by create_missing_indexes
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
 
 
+def concurrent_index_ddl(index, dialect) -> str:
+    ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=dialect))
+    return re.sub(r"^CREATE (UNIQUE )?INDEX", r"CREATE \1INDEX CONCURRENTLY", ddl, count=1)
+
+
+async def create_missing_indexes() -> list:
+    """Build the declared indexes the database lacks without blocking writes; returns their names.
+
+    CREATE INDEX CONCURRENTLY cannot run in a transaction and leaves an invalid index behind when it fails, so
+    invalid indexes are dropped and built again.
+    """
+    built = []
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        result = await conn.execute(text(
+            "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE NOT i.indisvalid"
+        ))
+        invalid = set(result.scalars().all())
+        existing = set((await conn.execute(text("SELECT indexname FROM pg_indexes"))).scalars().all())
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                if index.name in invalid:
+                    await conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{index.name}"'))
+                elif index.name in existing:
+                    continue
+                await conn.execute(text(concurrent_index_ddl(index, conn.dialect)))
+                built.append(index.name)
+    return built
+
+
+async def _select_one():
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+
+async def ping(timeout: float = 2) -> bool:
+    try:
+        await asyncio.wait_for(_select_one(), timeout)
+        return True
+    except Exception:
+        return False
+
+
 async def dispose():
     await engine.dispose()
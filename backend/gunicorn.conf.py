@@ -0,0 +1,31 @@
+"""Multi-worker deployment: gunicorn -c gunicorn.conf.py main:app
+
+Every worker is a separate process with its own metric values. With PROMETHEUS_MULTIPROC_DIR set, prometheus_client
+writes them to files in that directory and /metrics (served by whichever worker gets the scrape) aggregates all of
+them. The directory is emptied when the master starts, and a dead worker's live gauges are dropped when it exits.
+"""
+import os
+import shutil
+
+from prometheus_client import multiprocess
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", "1"))
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = int(os.environ.get("WORKER_TIMEOUT", "120"))
+graceful_timeout = 30
+
+
+def on_starting(server):
+    metrics_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if not metrics_dir:
+        server.log.warning("PROMETHEUS_MULTIPROC_DIR is not set, /metrics will only show the scraped worker")
+        return
+    # Files left by a previous run would be added to this run's counters
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir)
+
+
+def child_exit(server, worker):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(worker.pid)
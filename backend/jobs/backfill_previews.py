@@ -0,0 +1,40 @@
+"""Compute the previews of files uploaded before previews were stored at upload time.
+
+    python -m jobs.backfill_previews
+    python -m jobs.backfill_previews --concurrency 16 --batch-size 200
+
+Every file without a preview is downloaded once; re-running the job only handles what is still missing.
+"""
+import argparse
+import asyncio
+
+from api.services.files import file_service
+from api.services.previews import PreviewBackfill
+from db import init_models
+from db.database import async_session, engine
+
+
+async def run(args) -> dict:
+    engine.echo = False
+    try:
+        await init_models()
+        backfill = PreviewBackfill(
+            file_service, async_session, concurrency=args.concurrency, batch_size=args.batch_size
+        )
+        return await backfill.run()
+    finally:
+        await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Backfill file previews")
+    parser.add_argument("--concurrency", type=int, default=8, help="files downloaded and extracted at once")
+    parser.add_argument("--batch-size", type=int, default=100, help="files per preview INSERT")
+    args = parser.parse_args()
+
+    stats = asyncio.run(run(args))
+    print(f"previewed {stats['previewed']} files, {stats['failed']} failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+"""Build the indexes that were added to existing tables, without blocking writes to them.
+
+    python -m jobs.create_indexes
+
+Startup only creates missing tables. Run this once after deploying a version that declares a new index on an
+existing table; it can be re-run and only builds what is missing or was left invalid by an interrupted run.
+"""
+import asyncio
+
+from db import create_missing_indexes, init_models
+from db.database import engine
+
+
+async def run() -> list:
+    engine.echo = False
+    try:
+        await init_models()
+        return await create_missing_indexes()
+    finally:
+        await engine.dispose()
+
+
+def main() -> None:
+    built = asyncio.run(run())
+    print(f"built {len(built)} indexes" + (f": {', '.join(built)}" if built else ""))
+
+
+if __name__ == "__main__":
+    main()
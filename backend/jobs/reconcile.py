@@ -0,0 +1,78 @@
+"""Find, and optionally repair, inconsistencies between storage, the files table and the search index.
+
+    python -m jobs.reconcile                                   # report only
+    python -m jobs.reconcile --output discrepancies.jsonl      # every discrepancy, one JSON object per line
+    python -m jobs.reconcile --repair --grace-hours 48
+    python -m jobs.reconcile --repair --delete-missing-rows   # also drop rows whose object is gone
+
+Orphan objects (stored, no files row), missing objects (row without object), orphan index documents, rows missing
+from the index and legacy index documents (no file_id) are counted; --repair deletes the orphans, re-indexes missing
+and legacy documents, and with --delete-missing-rows drops rows whose object is gone. Too many missing objects
+(--max-missing, --max-missing-percent) abort the repair and exit with status 1.
+"""
+import argparse
+import asyncio
+import json
+from datetime import timedelta
+
+from api.services.files import file_service
+from api.services.reconciler import MAX_MISSING_OBJECTS, MAX_MISSING_RATIO, RECONCILE_BATCH_SIZE, Reconciler
+from db.database import async_session, engine
+
+
+async def run(args, output) -> dict:
+    engine.echo = False
+    try:
+        reconciler = Reconciler(
+            file_service,
+            async_session,
+            repair=args.repair,
+            grace=timedelta(hours=args.grace_hours),
+            batch_size=args.batch_size,
+            output=output,
+            delete_missing_rows=args.delete_missing_rows,
+            max_missing=args.max_missing,
+            max_missing_ratio=args.max_missing_percent / 100
+        )
+        return await reconciler.run()
+    finally:
+        await file_service.close()
+        await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Reconcile storage, database and search index")
+    parser.add_argument("--repair", action="store_true", help="fix what is found instead of only reporting it")
+    parser.add_argument(
+        "--delete-missing-rows", action="store_true", help="with --repair, delete rows whose object is gone"
+    )
+    parser.add_argument(
+        "--max-missing", type=int, default=MAX_MISSING_OBJECTS, help="abort the repair above this many missing objects"
+    )
+    parser.add_argument(
+        "--max-missing-percent", type=float, default=100 * MAX_MISSING_RATIO,
+        help="abort the repair above this share of rows missing their object"
+    )
+    parser.add_argument(
+        "--grace-hours", type=float, default=24,
+        help="ignore objects and index documents stored more recently (uploads in progress)"
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=RECONCILE_BATCH_SIZE, help="rows, objects and documents per page"
+    )
+    parser.add_argument("--output", help="write every discrepancy to this path as JSON lines")
+    args = parser.parse_args()
+
+    output = open(args.output, "w") if args.output else None
+    try:
+        report = asyncio.run(run(args, output))
+    finally:
+        if output:
+            output.close()
+    print(json.dumps(report, indent=2))
+    if "repair_aborted" in report:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""Drive upload/list/search/download/delete mixes against the app at a target request rate.
+
+    python -m loadtest --scenario browse --scenario mixed --rate 50 --duration 30
+    python -m loadtest --target http://localhost:8000 --server-pid 1234 --mix upload=1,list=3
+
+Without --target, a server with local storage and the in-process Elasticsearch stand-in is started
+(python -m loadtest.server). PostgreSQL is still required and configured through the usual settings.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+import httpx
+
+from benchmarks.corpora import WORDS, make_json, make_pdf, make_txt
+
+SCENARIOS = {
+    "upload": {"upload": 1},
+    "browse": {"list": 6, "search": 3, "download": 1},
+    "mixed": {"upload": 2, "list": 35, "search": 20, "download": 20, "delete": 5},
+}
+
+UPLOAD_BODIES = [
+    ("notes.txt", "text/plain", make_txt(4 * 1024)),
+    ("report.pdf", "application/pdf", make_pdf(3)),
+    ("events.json", "application/json", make_json(8 * 1024)),
+]
+
+
+def parse_mix(value: str) -> dict:
+    mix = {}
+    for part in value.split(","):
+        operation, weight = part.split("=")
+        mix[operation.strip()] = float(weight)
+    return mix
+
+
+def read_rss(pid: int):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+
+
+def percentile(values: list, q: int) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+
+class VirtualUser:
+
+    def __init__(self, token: str):
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.file_ids = []
+
+
+class LoadRunner:
+
+    def __init__(self, client: httpx.AsyncClient, users: list, max_in_flight: int):
+        self.client = client
+        self.users = users
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+
+    async def upload(self, user: VirtualUser) -> httpx.Response:
+        name, mime, body = random.choice(UPLOAD_BODIES)
+        response = await self.client.post(
+            "/api/files/upload", headers=user.headers, files=[("files", (name, body, mime))]
+        )
+        if response.status_code == 201:
+            user.file_ids.extend(item["id"] for item in response.json()["uploaded"])
+        return response
+
+    async def list(self, user: VirtualUser) -> httpx.Response:
+        return await self.client.get("/api/files", headers=user.headers)
+
+    async def search(self, user: VirtualUser) -> httpx.Response:
+        return await self.client.get("/api/files", headers=user.headers, params={"search": random.choice(WORDS)})
+
+    async def download(self, user: VirtualUser) -> httpx.Response:
+        if not user.file_ids:
+            return await self.upload(user)
+        return await self.client.get(f"/api/files/{random.choice(user.file_ids)}/download", headers=user.headers)
+
+    async def delete(self, user: VirtualUser) -> httpx.Response:
+        if len(user.file_ids) < 2:
+            return await self.upload(user)
+        file_id = user.file_ids.pop(random.randrange(len(user.file_ids)))
+        return await self.client.delete(f"/api/files/{file_id}", headers=user.headers)
+
+    async def _timed(self, operation: str, stats: dict) -> None:
+        self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            response = await getattr(self, operation)(random.choice(self.users))
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        finally:
+            self.in_flight -= 1
+        stats[operation]["latencies"].append(time.perf_counter() - start)
+        if not ok:
+            stats[operation]["errors"] += 1
+
+    async def run_scenario(self, mix: dict, rate: float, duration: float, server_pid: int = None) -> dict:
+        """Open-loop arrivals at `rate` req/s; arrivals beyond max_in_flight are counted as dropped"""
+        operations, weights = zip(*mix.items())
+        stats = defaultdict(lambda: {"latencies": [], "errors": 0})
+        tasks, rss_samples, dropped = [], [], 0
+
+        start = time.perf_counter()
+        next_arrival, next_rss = start, start
+        while (now := time.perf_counter()) - start < duration:
+            if server_pid and now >= next_rss:
+                rss_samples.append(read_rss(server_pid))
+                next_rss += 0.5
+            if now < next_arrival:
+                await asyncio.sleep(min(next_arrival, next_rss if server_pid else next_arrival) - now)
+                continue
+            next_arrival += 1 / rate
+            if self.in_flight >= self.max_in_flight:
+                dropped += 1
+                continue
+            tasks.append(asyncio.create_task(self._timed(random.choices(operations, weights)[0], stats)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+        report = {"duration": elapsed, "dropped": dropped, "operations": {}}
+        all_latencies = []
+        for operation, result in stats.items():
+            latencies = result["latencies"]
+            all_latencies.extend(latencies)
+            report["operations"][operation] = self._summary(latencies, result["errors"], elapsed)
+        report["total"] = self._summary(all_latencies, sum(r["errors"] for r in stats.values()), elapsed)
+        rss = [value for value in rss_samples if value]
+        report["rss_bytes"] = {"peak": max(rss), "mean": statistics.fmean(rss)} if rss else None
+        return report
+
+    @staticmethod
+    def _summary(latencies: list, errors: int, elapsed: float) -> dict:
+        return {
+            "requests": len(latencies),
+            "errors": errors,
+            "throughput": len(latencies) / elapsed,
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+        }
+
+
+async def create_users(count: int) -> list:
+    from api.services.auth import AuthService
+    from db.database import async_session
+
+    tokens = []
+    async with async_session() as db:
+        for i in range(count):
+            user = await AuthService.get_or_create_user(db, f"loadtest-{i}@example.com", f"Load Test {i}")
+            tokens.append(await AuthService.create_app_token(user))
+    return tokens
+
+
+async def wait_until_healthy(client: httpx.AsyncClient, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError("Server did not become healthy")
+
+
+def print_report(name: str, report: dict) -> None:
+    rss = report["rss_bytes"]
+    rss_text = f"peak RSS {rss['peak'] / 2 ** 20:.0f} MiB" if rss else "RSS n/a"
+    print(f"\n== {name}: {report['total']['throughput']:.1f} req/s, dropped {report['dropped']}, {rss_text}")
+    print(f"{'operation':<10} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for operation, s in sorted(report["operations"].items()) + [("total", report["total"])]:
+        print(
+            f"{operation:<10} {s['requests']:>9} {s['errors']:>7} {s['throughput']:>8.1f} "
+            f"{s['p50'] * 1e3:>8.1f} {s['p95'] * 1e3:>8.1f} {s['p99'] * 1e3:>8.1f}"
+        )
+
+
+async def run(args) -> dict:
+    scenarios = {name: SCENARIOS[name] for name in args.scenario or ([] if args.mix else ["mixed"])}
+    if args.mix:
+        scenarios["custom"] = parse_mix(args.mix)
+
+    server, server_pid = None, args.server_pid
+    if not args.target:
+        port = args.port
+        server = subprocess.Popen([sys.executable, "-m", "loadtest.server", "--port", str(port)])
+        server_pid = server.pid
+        target = f"http://127.0.0.1:{port}"
+    else:
+        target = args.target
+
+    limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+    try:
+        async with httpx.AsyncClient(base_url=target, limits=limits, timeout=60) as client:
+            await wait_until_healthy(client)
+            users = [VirtualUser(token) for token in await create_users(args.users)]
+            runner = LoadRunner(client, users, args.max_in_flight)
+            for user in users:
+                for _ in range(args.seed_files):
+                    await runner.upload(user)
+
+            reports = {}
+            for name, mix in scenarios.items():
+                reports[name] = await runner.run_scenario(mix, args.rate, args.duration, server_pid)
+                print_report(name, reports[name])
+            return {"target": target, "rate": args.rate, "scenarios": reports}
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Load test the File Management API")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS))
+    parser.add_argument("--mix", help="custom weights, e.g. upload=1,list=3,search=2")
+    parser.add_argument("--rate", type=float, default=20, help="target requests per second")
+    parser.add_argument("--duration", type=float, default=30, help="seconds per scenario")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--seed-files", type=int, default=5, help="files uploaded per user before measuring")
+    parser.add_argument("--max-in-flight", type=int, default=200)
+    parser.add_argument("--target", help="base URL of an already running server")
+    parser.add_argument("--server-pid", type=int, help="pid of the --target server, for RSS sampling")
+    parser.add_argument("--port", type=int, default=8001, help="port for the spawned server")
+    parser.add_argument("--output", help="write the report as JSON to this path")
+    args = parser.parse_args()
+
+    os.environ.setdefault("USE_GCS", "false")
+    os.environ.setdefault("TRANSFER_SECRET", "loadtest-transfer-secret")
+    result = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,275 @@
+"""In-process stand-in for the AsyncElasticsearch calls FileService makes"""
+import itertools
+import operator
+import re
+from copy import deepcopy
+from functools import cmp_to_key
+
+TOKEN = re.compile(r"\w+")
+RANGE = {"gt": operator.gt, "gte": operator.ge, "lt": operator.lt, "lte": operator.le}
+
+
+class NotFoundError(Exception):
+    pass
+
+
+class _FakeIndices:
+
+    def __init__(self, es: "FakeElasticsearch"):
+        self._es = es
+
+    async def exists(self, index: str, **kwargs) -> bool:
+        return index in self._es.indices_settings
+
+    async def create(self, index: str, body: dict = None, **kwargs) -> dict:
+        self._es.indices_settings[index] = deepcopy(body or {})
+        self._es.documents.setdefault(index, {})
+        return {"acknowledged": True, "index": index}
+
+    async def delete(self, index: str, **kwargs) -> dict:
+        self._es.indices_settings.pop(index, None)
+        self._es.documents.pop(index, None)
+        return {"acknowledged": True}
+
+    async def put_mapping(self, index: str, properties: dict = None, body: dict = None, **kwargs) -> dict:
+        mappings = self._es.indices_settings.setdefault(index, {}).setdefault("mappings", {})
+        mappings.setdefault("properties", {}).update(deepcopy(properties or body["properties"]))
+        return {"acknowledged": True}
+
+    async def refresh(self, index: str = None, **kwargs) -> dict:
+        return {"_shards": {"failed": 0}}
+
+
+class FakeElasticsearch:
+    """Keeps documents in dicts; `match` queries hit documents containing any query term as a substring,
+    which approximates the n-gram analyzer of the real `files` index."""
+
+    def __init__(self, *args, **kwargs):
+        self.indices_settings = {}
+        self.documents = {}
+        self.indices = _FakeIndices(self)
+        self.points_in_time = {}
+        self._pit_ids = itertools.count()
+
+    async def close(self) -> None:
+        pass
+
+    async def ping(self, **kwargs) -> bool:
+        return True
+
+    def _index(self, index: str) -> dict:
+        return self.documents.setdefault(index, {})
+
+    async def index(self, index: str, id: str, body: dict = None, document: dict = None, **kwargs) -> dict:
+        docs = self._index(index)
+        result = "updated" if id in docs else "created"
+        docs[id] = deepcopy(body if body is not None else document)
+        return {"_index": index, "_id": id, "result": result}
+
+    async def get(self, index: str, id: str, **kwargs) -> dict:
+        docs = self._index(index)
+        if id not in docs:
+            raise NotFoundError(id)
+        return {"_index": index, "_id": id, "found": True, "_source": deepcopy(docs[id])}
+
+    async def delete(self, index: str, id: str, ignore=(), **kwargs) -> dict:
+        docs = self._index(index)
+        if id not in docs:
+            if 404 in (ignore or ()):
+                return {"_index": index, "_id": id, "result": "not_found"}
+            raise NotFoundError(id)
+        del docs[id]
+        return {"_index": index, "_id": id, "result": "deleted"}
+
+    async def bulk(self, operations: list = None, body: list = None, index: str = None, **kwargs) -> dict:
+        actions = list(operations if operations is not None else body)
+        items = []
+        while actions:
+            action = actions.pop(0)
+            (op, meta), = action.items()
+            target = meta.get("_index", index)
+            if op in ("index", "create"):
+                items.append({op: await self.index(target, meta["_id"], actions.pop(0))})
+            elif op == "delete":
+                items.append({op: await self.delete(target, meta["_id"], ignore=[404])})
+            else:
+                raise ValueError(f"Unsupported bulk action {op}")
+        return {"errors": False, "items": items}
+
+    async def open_point_in_time(self, index: str, keep_alive: str = None, **kwargs) -> dict:
+        pit_id = f"pit-{next(self._pit_ids)}"
+        self.points_in_time[pit_id] = index
+        return {"id": pit_id}
+
+    async def close_point_in_time(self, id: str = None, body: dict = None, **kwargs) -> dict:
+        self.points_in_time.pop(id or body["id"], None)
+        return {"succeeded": True}
+
+    async def search(
+            self, index: str = None, body: dict = None, query: dict = None, size: int = None, **kwargs
+    ) -> dict:
+        body = body or {}
+        if "pit" in body:
+            return self._search_sorted(self.points_in_time[body["pit"]["id"]], body)
+        query = query or body.get("query", {"match_all": {}})
+        size = size if size is not None else body.get("size", 10)
+        collapse = body.get("collapse", {}).get("field")
+        highlight = body.get("highlight", {}).get("fields", {})
+
+        hits, seen = [], set()
+        for doc_id, source in self._matching(index, query):
+            hit = {"_index": index, "_id": doc_id, "_score": self._score(query, source, doc_id)}
+            hit["_source"] = self._filter_source(source, body.get("_source", True))
+            fragments = {
+                field: [self._fragment(query, source.get(field, ""), options.get("fragment_size", 100))]
+                for field, options in highlight.items()
+                if source.get(field)
+            }
+            if fragments:
+                hit["highlight"] = fragments
+            hits.append(hit)
+        if "sort" in body:
+            hits = self._sorted(index, hits, body["sort"], body.get("search_after"))
+        else:
+            hits.sort(key=lambda hit: -hit["_score"])
+
+        if collapse:
+            collapsed = []
+            for hit in hits:
+                key = self._index(index)[hit["_id"]].get(collapse)
+                if key not in seen:
+                    seen.add(key)
+                    collapsed.append(hit)
+            hits = collapsed
+
+        return {"hits": {"total": {"value": len(hits), "relation": "eq"}, "hits": hits[:size]}}
+
+    def _sorted(self, index: str, hits: list, sort: list, search_after: list = None) -> list:
+        """Hits in the order of field sorts, with their sort values, after `search_after` if given"""
+        specs = []
+        for clause in sort:
+            (field, order), = clause.items()
+            order = order if isinstance(order, dict) else {"order": order}
+            specs.append((field, order.get("order", "asc") == "desc", order.get("missing", "_last") == "_last"))
+
+        def compare(a: list, b: list) -> int:
+            for (_, descending, missing_last), x, y in zip(specs, a, b):
+                if x == y:
+                    continue
+                if x is None or y is None:
+                    return (1 if x is None else -1) * (1 if missing_last else -1)
+                return (-1 if x < y else 1) * (-1 if descending else 1)
+            return 0
+
+        for hit in hits:
+            source = self._index(index)[hit["_id"]]
+            hit["sort"] = [source.get(field) for field, _, _ in specs]
+        if search_after:
+            hits = [hit for hit in hits if compare(hit["sort"], search_after) > 0]
+        return sorted(hits, key=cmp_to_key(lambda a, b: compare(a["sort"], b["sort"])))
+
+    def _search_sorted(self, index: str, body: dict) -> dict:
+        """match_all paged by one ascending sort field and search_after, as point-in-time scans use it"""
+        (field, order), = body["sort"][0].items()
+        missing_first = isinstance(order, dict) and order.get("missing") == "_first"
+
+        def position(value, doc_id):
+            # The doc id stands in for the implicit _shard_doc tiebreaker of point-in-time searches
+            missing = value is None
+            return (not missing if missing_first else missing), "" if missing else value, doc_id
+
+        rows = sorted((position(source.get(field), doc_id), source) for doc_id, source in self._index(index).items())
+        if body.get("search_after"):
+            after = position(*body["search_after"])
+            rows = [row for row in rows if row[0] > after]
+        hits = []
+        for (_, _, doc_id), source in rows[:body.get("size", 10)]:
+            hit = {"_index": index, "_id": doc_id, "_score": None, "sort": [source.get(field), doc_id]}
+            if body.get("_source", True) is not False:
+                hit["_source"] = self._filter_source(source, body.get("_source", True))
+            hits.append(hit)
+        return {"pit_id": body["pit"]["id"], "hits": {"total": {"value": len(rows), "relation": "eq"}, "hits": hits}}
+
+    async def delete_by_query(self, index: str, body: dict = None, query: dict = None, **kwargs) -> dict:
+        query = query or body["query"]
+        doomed = [doc_id for doc_id, _ in self._matching(index, query)]
+        for doc_id in doomed:
+            del self._index(index)[doc_id]
+        return {"deleted": len(doomed)}
+
+    def _matching(self, index: str, query: dict):
+        for doc_id, source in list(self._index(index).items()):
+            if self._score(query, source, doc_id):
+                yield doc_id, source
+
+    @staticmethod
+    def _terms(query: dict) -> list:
+        (field, spec), = query["match"].items()
+        text = spec["query"] if isinstance(spec, dict) else spec
+        return TOKEN.findall(text.lower())
+
+    @staticmethod
+    def _clauses(clauses) -> list:
+        if clauses is None:
+            return []
+        return clauses if isinstance(clauses, list) else [clauses]
+
+    @classmethod
+    def _score(cls, query: dict, source: dict, doc_id: str = None) -> float:
+        if "match_all" in query:
+            return 1.0
+        if "bool" in query:
+            clauses = query["bool"]
+            if not all(cls._score(clause, source, doc_id) for clause in cls._clauses(clauses.get("filter"))):
+                return 0.0
+            should = [cls._score(clause, source, doc_id) for clause in cls._clauses(clauses.get("should"))]
+            if sum(1 for score in should if score) < clauses.get("minimum_should_match", 0):
+                return 0.0
+            must = [cls._score(clause, source, doc_id) for clause in cls._clauses(clauses.get("must"))]
+            if not all(must):
+                return 0.0
+            # A filter-only query matches with a constant score
+            return float(sum(must) + sum(should)) or 1.0
+        if "match" in query:
+            (field, _), = query["match"].items()
+            value = str(source.get(field, "")).lower()
+            return float(sum(1 for term in cls._terms(query) if term in value))
+        if "term" in query:
+            (field, spec), = query["term"].items()
+            expected = spec["value"] if isinstance(spec, dict) else spec
+            return 1.0 if source.get(field) == expected else 0.0
+        if "range" in query:
+            (field, bounds), = query["range"].items()
+            value = source.get(field)
+            if value is None:
+                return 0.0
+            return 1.0 if all(RANGE[op](value, bound) for op, bound in bounds.items()) else 0.0
+        if "ids" in query:
+            return 1.0 if doc_id in query["ids"]["values"] else 0.0
+        if "nested" in query:
+            # Each object of the nested field is matched on its own, under `path.` prefixed names; nested queries
+            # only filter here, so the first matching object decides
+            path = query["nested"]["path"]
+            for item in source.get(path) or []:
+                score = cls._score(query["nested"]["query"], {f"{path}.{key}": value for key, value in item.items()})
+                if score:
+                    return score
+            return 0.0
+        raise ValueError(f"Unsupported query {query}")
+
+    @classmethod
+    def _fragment(cls, query: dict, text: str, size: int) -> str:
+        if "bool" in query:
+            query = (cls._clauses(query["bool"].get("must")) or [{}])[0]
+        lowered = text.lower()
+        positions = [lowered.find(term) for term in cls._terms(query)] if "match" in query else []
+        start = min((p for p in positions if p >= 0), default=0)
+        return text[max(0, start - size // 2):][:size]
+
+    @staticmethod
+    def _filter_source(source: dict, includes):
+        if includes is False:
+            return None
+        if includes is True:
+            return deepcopy(source)
+        return {field: deepcopy(source[field]) for field in includes if field in source}
@@ -0,0 +1,32 @@
+"""Run main.app with local storage and the in-process Elasticsearch stand-in.
+
+    python -m loadtest.server --port 8001
+"""
+import argparse
+import os
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="File Management API with local stand-ins")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    args = parser.parse_args()
+
+    # Must be set before core.settings is imported
+    os.environ["USE_GCS"] = "false"
+    os.environ.setdefault("TRANSFER_SECRET", "loadtest-transfer-secret")
+
+    import uvicorn
+    from api.services.files import file_service
+    from api.services.search import ElasticsearchSearch
+    from loadtest.fake_elasticsearch import FakeElasticsearch
+    from main import app
+
+    # SEARCH_BACKEND=postgres needs no stand-in, it searches the same database
+    if isinstance(file_service.search, ElasticsearchSearch):
+        file_service.search.es = FakeElasticsearch()
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
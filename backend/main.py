@@ -1,36 +1,91 @@
-from contextlib import asynccontextmanager
+import asyncio
+from contextlib import asynccontextmanager, suppress
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.status import HTTP_503_SERVICE_UNAVAILABLE
 
 from prometheus_fastapi_instrumentator import Instrumentator
 from api.routes.auth import router as auth_router
 from api.routes.files import router as files_router
 from api.routes.admin import router as admin_router
+from api.routes.transfers import router as transfers_router
 from api.services.files import file_service
+from api.services.listing_cache import listing_cache
+from api.services.upload_sessions import upload_session_service
+from api.services.usage import usage_service
 from core.settings import settings
+from core.metrics import monitor_event_loop_lag
+from core.profiling import ProfilingMiddleware
+from core.admission import UploadAdmissionMiddleware
+
+from db import init_models, dispose, ping as ping_database
+from db.database import async_session, engine
+
+# Requests whose body is an upload. Completions read the stored object instead and are admitted by its size
+# in the services.
+UPLOAD_PATHS = (
+    r"/api/files/upload",
+    r"/api/files/upload-sessions/[^/]+",  # PUT of a chunk
+    r"/api/transfers/.+",  # PUT to a local signed URL
+)
 
-from db import init_models, dispose
 
+def start_database_tasks() -> list:
+    return [
+        asyncio.create_task(usage_service.run_reconciliation(
+            async_session,
+            settings.USAGE_RECONCILE_INTERVAL,
+            # A cold-started instance should not rebuild the usage tables before serving its first request
+            delay=settings.USAGE_RECONCILE_INTERVAL if settings.FAST_START else 0
+        )),
+        asyncio.create_task(
+            upload_session_service.run_cleanup(async_session, settings.UPLOAD_SESSION_CLEANUP_INTERVAL)
+        ),
+        asyncio.create_task(listing_cache.run_listener(engine)),
+    ]
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
 
+async def prepare_dependencies(app: FastAPI, background_tasks: list):
     try:
         await init_models()
+        app.state.schema_ready = True
         print("✓ Database initialized successfully")
     except Exception as e:
         print(f"⚠ Warning: Database initialization failed: {e}")
         print("App will start anyway, but database operations may fail")
+    else:
+        # The jobs query the tables, so they only start once the schema exists
+        background_tasks.extend(start_database_tasks())
 
     try:
         await file_service.init()
+        app.state.search_index_ready = True
         print("✓ File service initialized successfully")
     except Exception as e:
         print(f"⚠ Warning: File service initialization failed: {e}")
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if not settings.TRANSFER_SECRET:
+        raise RuntimeError("TRANSFER_SECRET must be set: it signs transfer URLs and upload tokens")
+    app.state.schema_ready = False
+    app.state.search_index_ready = False
+
+    background_tasks = [asyncio.create_task(monitor_event_loop_lag())]
+    if settings.FAST_START:
+        background_tasks.append(asyncio.create_task(prepare_dependencies(app, background_tasks)))
+    else:
+        await prepare_dependencies(app, background_tasks)
+
     yield
 
+    for task in background_tasks:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+
     try:
         await file_service.close()
     except Exception as e:
@@ -52,8 +107,10 @@ app = FastAPI(
     lifespan=lifespan
 )
 
-Instrumentator().instrument(app).expose(app)
+Instrumentator(should_instrument_requests_inprogress=True, inprogress_labels=True).instrument(app).expose(app)
 
+# The last middleware added runs first: admission runs inside CORS, profiling around both
+app.add_middleware(UploadAdmissionMiddleware, paths=UPLOAD_PATHS)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -63,12 +120,29 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(ProfilingMiddleware)
 
 app.include_router(auth_router, prefix="/api/auth")
 app.include_router(files_router, prefix="/api/files")
 app.include_router(admin_router, prefix="/api/admin")
+app.include_router(transfers_router, prefix="/api/transfers")
 
 
 @app.get("/health")
 def hello():
     return {"message": "Hello from backend"}
+
+
+@app.get("/ready")
+async def ready(response: Response):
+    """Readiness of the dependencies, unlike /health which only says the process is up"""
+    database, search = await asyncio.gather(ping_database(), file_service.ping())
+    checks = {
+        "database": database,
+        "search": search,
+        "schema": app.state.schema_ready,
+        "search_index": app.state.search_index_ready,
+    }
+    if not all(checks.values()):
+        response.status_code = HTTP_503_SERVICE_UNAVAILABLE
+    return checks
@@ -1,6 +1,6 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, Text, func
 from sqlalchemy.orm import relationship
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import JSONB, UUID
 from db.database import Base
 from datetime import datetime
 
@@ -16,3 +16,28 @@ class File(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
 
     owner = relationship("User", back_populates="files")
+    # Only loaded where asked for (list_files); the row goes away with the file through ON DELETE CASCADE
+    preview = relationship(
+        "FilePreview", uselist=False, lazy="raise", cascade="all, delete-orphan", passive_deletes=True
+    )
+
+
+class FilePreview(Base):
+    """What a file listing shows about the content, computed once when the file is registered"""
+    __tablename__ = "file_previews"
+
+    file_id = Column(String, ForeignKey("files.id", ondelete="CASCADE"), primary_key=True)
+    snippet = Column(Text, nullable=False, default="")  # first PREVIEW_CHARS of the extracted text
+    page_count = Column(Integer)  # PDFs only
+    json_keys = Column(JSONB)  # top-level keys of JSON objects
+
+
+# Filename autocomplete: C collation lets a LIKE 'prefix%' range scan also return rows already in ORDER BY order
+name_prefix_key = func.lower(File.name).collate("C")
+Index("ix_files_owner_name_prefix", File.owner_id, name_prefix_key)
+
+# Reconciler keyset scans: ordered like the byte-wise storage listing and Elasticsearch keyword sort
+path_key = File.file_path.collate("C")
+id_key = File.id.collate("C")
+Index("ix_files_path_c", path_key)
+Index("ix_files_id_c", id_key)
@@ -0,0 +1,44 @@
+from sqlalchemy import Column, Computed, Float, ForeignKey, Index, MetaData, String, Text
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import declarative_base
+
+from models.file import File
+
+# Not part of Base.metadata: the Postgres search backend creates this table, after the pg_trgm extension,
+# so deployments that search with Elasticsearch need neither.
+search_metadata = MetaData()
+SearchBase = declarative_base(metadata=search_metadata)
+
+
+class FileContent(SearchBase):
+    """Extracted text of a file for the Postgres search backend"""
+    __tablename__ = "file_contents"
+
+    file_id = Column(String, ForeignKey(File.id, ondelete="CASCADE"), primary_key=True)
+    content = Column(Text, nullable=False)
+    search_vector = Column(TSVECTOR, Computed("to_tsvector('simple', content)", persisted=True))
+
+    __table_args__ = (
+        Index("ix_file_contents_search_vector", "search_vector", postgresql_using="gin"),
+        Index(
+            "ix_file_contents_content_trgm",
+            "content",
+            postgresql_using="gin",
+            postgresql_ops={"content": "gin_trgm_ops"}
+        ),
+    )
+
+
+class FileField(SearchBase):
+    """A key path/value pair of a JSON file, for field filters with the Postgres search backend"""
+    __tablename__ = "file_fields"
+
+    file_id = Column(String, ForeignKey(File.id, ondelete="CASCADE"), primary_key=True)
+    key = Column(Text, primary_key=True)
+    value = Column(Text, primary_key=True)
+    number = Column(Float)
+
+    __table_args__ = (
+        Index("ix_file_fields_key_value", "key", "value"),
+        Index("ix_file_fields_key_number", "key", "number"),
+    )
@@ -0,0 +1,11 @@
+from sqlalchemy import BigInteger, Column, ForeignKey
+from sqlalchemy.dialects.postgresql import UUID
+from db.database import Base
+
+
+class ListingVersion(Base):
+    """Counter bumped with every change to an owner's files; the ETag of their listing is derived from it"""
+    __tablename__ = "listing_versions"
+
+    owner_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
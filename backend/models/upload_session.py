@@ -0,0 +1,21 @@
+from datetime import datetime
+
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Integer, String
+from sqlalchemy.dialects.postgresql import UUID
+from db.database import Base
+
+
+class UploadSession(Base):
+    """A resumable upload in progress; its bytes are stored as numbered chunk objects until it is completed"""
+    __tablename__ = "upload_sessions"
+
+    id = Column(String, primary_key=True)
+    owner_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    name = Column(String, nullable=False)
+    type = Column(String, nullable=False)
+    size = Column(BigInteger, nullable=False)  # declared total
+    offset = Column(BigInteger, nullable=False, default=0)  # bytes received so far
+    chunk_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    completing_at = Column(DateTime, nullable=True)  # set while a completion assembles the chunks
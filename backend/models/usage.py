@@ -0,0 +1,28 @@
+from datetime import datetime
+
+from sqlalchemy import BigInteger, Column, Date, DateTime, ForeignKey, String
+from sqlalchemy.dialects.postgresql import UUID
+from db.database import Base
+
+
+class UserUsage(Base):
+    """Running file count and bytes per owner and file type, maintained by upload and delete"""
+    __tablename__ = "user_usage"
+
+    owner_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), primary_key=True)
+    type = Column(String, primary_key=True)
+    file_count = Column(BigInteger, nullable=False, default=0)
+    total_bytes = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class DailyUsage(Base):
+    """Files and bytes added and deleted per day and file type"""
+    __tablename__ = "daily_usage"
+
+    day = Column(Date, primary_key=True)
+    type = Column(String, primary_key=True)
+    files_added = Column(BigInteger, nullable=False, default=0)
+    bytes_added = Column(BigInteger, nullable=False, default=0)
+    files_deleted = Column(BigInteger, nullable=False, default=0)
+    bytes_deleted = Column(BigInteger, nullable=False, default=0)
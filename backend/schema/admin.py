@@ -0,0 +1,7 @@
+from pydantic import BaseModel, Field
+
+
+class ProfilingRequest(BaseModel):
+    requests: int = Field(default=0, ge=0, le=1000)
+    header: bool = False
+    duration: int = Field(default=300, gt=0, le=3600)  # seconds
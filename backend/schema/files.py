@@ -1,3 +1,5 @@
+from typing import List
+
 from pydantic import BaseModel
 from datetime import datetime
 
@@ -11,3 +13,23 @@ class FileResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class DirectUploadRequest(BaseModel):
+    filename: str
+    content_type: str
+    size: int
+
+
+class UploadSessionRequest(BaseModel):
+    filename: str
+    content_type: str
+    size: int
+
+
+class DirectUploadComplete(BaseModel):
+    upload_token: str
+
+
+class ArchiveRequest(BaseModel):
+    file_ids: List[str]
@@ -0,0 +1,131 @@
+import asyncio
+
+import pytest
+from core.admission import AdmissionController, AdmissionRejected, UploadAdmissionMiddleware
+
+
+@pytest.fixture
+def controller(mocker):
+    test_controller = AdmissionController(
+        max_uploads=2, max_inflight_bytes=100, max_extractions=1, max_queued_extractions=1, retry_after=7
+    )
+    mocker.patch("core.admission.admission", test_controller)
+    return test_controller
+
+
+def test_rejects_when_concurrency_or_bytes_exhausted(controller):
+    controller.admit_upload(60)
+
+    with pytest.raises(AdmissionRejected) as exc:
+        controller.admit_upload(50)
+    assert exc.value.status_code == 429
+    assert exc.value.headers == {"Retry-After": "7"}
+
+    controller.admit_upload(40)
+    with pytest.raises(AdmissionRejected):
+        controller.admit_upload(0)
+
+    controller.release_upload(60)
+    controller.release_upload(40)
+    assert (controller.active_uploads, controller.inflight_bytes) == (0, 0)
+
+
+def test_rejects_upload_larger_than_budget(controller):
+    with pytest.raises(AdmissionRejected) as exc:
+        controller.admit_upload(101)
+    assert exc.value.status_code == 413
+
+
+@pytest.mark.asyncio
+async def test_extraction_queue_limit(controller):
+    running = asyncio.Event()
+    release = asyncio.Event()
+
+    async def extract():
+        async with controller.extraction_slot():
+            running.set()
+            await release.wait()
+
+    first = asyncio.create_task(extract())
+    await running.wait()
+    waiting = asyncio.create_task(extract())
+    await asyncio.sleep(0)
+
+    with pytest.raises(AdmissionRejected) as exc:
+        async with controller.extraction_slot():
+            pass
+    assert exc.value.status_code == 503
+
+    release.set()
+    await asyncio.gather(first, waiting)
+    assert controller.queued_extractions == 0
+
+
+@pytest.mark.asyncio
+async def test_middleware_answers_429_without_calling_app(controller):
+    controller.admit_upload(100)
+    sent = []
+
+    async def app(scope, receive, send):
+        raise AssertionError("app must not run")
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "POST", "path": "/api/files/upload", "headers": [(b"content-length", b"10")]}
+    await UploadAdmissionMiddleware(app, paths=("/api/files/upload",))(scope, None, send)
+
+    assert sent[0]["status"] == 429
+    assert (b"retry-after", b"7") in sent[0]["headers"]
+
+
+@pytest.mark.asyncio
+async def test_middleware_rejects_malformed_content_length(controller):
+    async def app(scope, receive, send):
+        raise AssertionError("app must not run")
+
+    for value in [b"-100", b"abc", b"1e3", b""]:
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "http", "method": "POST", "path": "/api/files/upload", "headers": [(b"content-length", value)]}
+        await UploadAdmissionMiddleware(app, paths=("/api/files/upload",))(scope, None, send)
+
+        assert sent[0]["status"] == 400, value
+    assert controller.inflight_bytes == 0
+
+
+@pytest.mark.asyncio
+async def test_middleware_only_admits_listed_paths(controller):
+    from main import UPLOAD_PATHS
+
+    middleware = UploadAdmissionMiddleware(None, paths=UPLOAD_PATHS)
+
+    for method, path, admitted in [
+        ("POST", "/api/files/upload", True),
+        ("PUT", "/api/files/upload-sessions/abc", True),
+        ("PUT", "/api/transfers/user/file.txt", True),
+        ("POST", "/api/files/upload-sessions", False),
+        ("POST", "/api/files/upload-sessions/abc/complete", False),
+        ("POST", "/api/files/uploadX", False),
+        ("GET", "/api/transfers/user/file.txt", False),
+    ]:
+        matched = method in middleware.methods and middleware.paths.fullmatch(path) is not None
+        assert matched == admitted, path
+
+
+def test_rejection_carries_cors_headers(controller):
+    from fastapi.testclient import TestClient
+    from main import app
+
+    controller.admit_upload(100)
+
+    response = TestClient(app).post(
+        "/api/files/upload", content=b"x", headers={"Origin": "http://localhost:3000"}
+    )
+
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "7"
+    assert response.headers["access-control-allow-origin"] == "http://localhost:3000"
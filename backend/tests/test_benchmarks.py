@@ -0,0 +1,25 @@
+import io
+
+import PyPDF2
+from benchmarks.corpora import make_pdf
+from benchmarks.harness import compare
+
+
+def results(**medians):
+    return {"benchmarks": {name: {"median": median} for name, median in medians.items()}}
+
+
+def test_compare_flags_only_regressions_over_threshold():
+    baseline = results(fast=1.0, slow=1.0, gone=1.0)
+    current = results(fast=1.1, slow=1.5, new=9.0)
+
+    regressions = compare(current, baseline, max_regression=0.25)
+
+    assert [name for name, *_ in regressions] == ["slow"]
+
+
+def test_synthetic_pdf_is_extractable():
+    reader = PyPDF2.PdfReader(io.BytesIO(make_pdf(3)))
+
+    assert len(reader.pages) == 3
+    assert reader.pages[2].extract_text().strip()
@@ -0,0 +1,117 @@
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from api.services.files import FileService
+from bulk_import.pipeline import BulkImporter, import_file_id
+from bulk_import.sources import LocalSource
+from models.file import File
+from loadtest.fake_elasticsearch import FakeElasticsearch
+
+OWNER = "3f2b1c4d-0000-4000-8000-000000000001"
+
+
+class FakeDatabase:
+    """Answers the importer's lookups from `registered` and adds the ids it inserts"""
+
+    def __init__(self):
+        self.registered = set()
+        self.session = Mock(execute=AsyncMock(side_effect=self.execute), commit=AsyncMock())
+
+    async def execute(self, stmt):
+        result = Mock()
+        params = stmt.compile(dialect=postgresql.dialect()).params
+        if getattr(stmt, "is_insert", False) and stmt.table.name == "files":
+            rows = []
+            for key, file_id in params.items():
+                if key.startswith("id_m") and file_id not in self.registered:
+                    self.registered.add(file_id)
+                    suffix = key.removeprefix("id")
+                    rows.append((file_id, params[f"type{suffix}"], params[f"size{suffix}"]))
+            result.all.return_value = rows
+        elif getattr(stmt, "is_select", False) and stmt.get_final_froms() == [File.__table__]:
+            ids = next(value for value in params.values() if isinstance(value, list))
+            result.scalars.return_value.all.return_value = [i for i in ids if i in self.registered]
+        return result
+
+    @asynccontextmanager
+    async def session_factory(self):
+        yield self.session
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / "share"
+    (root / "nested").mkdir(parents=True)
+    (root / "a.txt").write_bytes(b"alpha notes")
+    (root / "nested" / "b.json").write_bytes(b'{"k": "beta"}')
+    (root / "nested" / "c.png").write_bytes(b"\x89PNG")
+    return root
+
+
+@pytest.fixture
+def files(tmp_path):
+    svc = FileService()
+    svc.use_gcs = False
+    svc.local_dir = tmp_path / "storage"
+    svc.search.es = FakeElasticsearch()
+    return svc
+
+
+@pytest.mark.asyncio
+async def test_import_registers_supported_files_once(tree, files):
+    database = FakeDatabase()
+    await files.init()
+
+    first = await BulkImporter(files, database.session_factory, OWNER, batch_size=1).run(LocalSource(tree))
+    assert (first["imported"], first["unsupported"], first["failed"]) == (2, 1, 0)
+    assert first["bytes"] == len(b"alpha notes") + len(b'{"k": "beta"}')
+
+    file_id = import_file_id(OWNER, str(tree / "a.txt"))
+    document = await files.search.es.get(index=files.search.index_name, id=file_id)
+    assert document["_source"]["content"] == "alpha notes"
+    assert any(path.name == f"{file_id}.txt" for path in files.local_dir.rglob("*"))
+
+    second = await BulkImporter(files, database.session_factory, OWNER).run(LocalSource(tree))
+    assert (second["imported"], second["skipped"]) == (0, 2)
+
+
+@pytest.mark.asyncio
+async def test_undecodable_text_is_imported_without_content(tmp_path, files):
+    root = tmp_path / "share"
+    root.mkdir()
+    (root / "latin1.txt").write_bytes("caf\xe9".encode("latin-1"))
+    await files.init()
+
+    result = await BulkImporter(files, FakeDatabase().session_factory, OWNER).run(LocalSource(root))
+
+    assert (result["imported"], result["failed"]) == (1, 0)
+    file_id = import_file_id(OWNER, str(root / "latin1.txt"))
+    document = await files.search.es.get(index=files.search.index_name, id=file_id)
+    assert document["_source"]["content"] == ""
+
+
+@pytest.mark.asyncio
+async def test_listing_is_streamed_into_the_workers(tree, files, mocker):
+    mocker.patch("bulk_import.pipeline.EXISTING_LOOKUP_SIZE", 1)
+    source = LocalSource(tree)
+    listed, read_after = [], []
+
+    def iter_files():
+        for entry in LocalSource.iter_files(source):
+            listed.append(entry)
+            yield entry
+
+    def read(entry):
+        read_after.append(len(listed))
+        return LocalSource.read(source, entry)
+
+    source.iter_files, source.read = iter_files, read
+    await files.init()
+
+    result = await BulkImporter(files, FakeDatabase().session_factory, OWNER, concurrency=1).run(source)
+
+    assert result["imported"] == 2
+    assert read_after[0] < len(listed)
@@ -0,0 +1,17 @@
+from sqlalchemy.dialects import postgresql
+
+from db import concurrent_index_ddl
+from models.file import File
+from models.user import User
+
+
+def test_index_ddl_builds_concurrently():
+    indexes = {index.name: index for index in [*File.__table__.indexes, *User.__table__.indexes]}
+    dialect = postgresql.dialect()
+
+    assert concurrent_index_ddl(indexes["ix_files_path_c"], dialect) == (
+        'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_files_path_c ON files ((file_path COLLATE "C"))'
+    )
+    assert concurrent_index_ddl(indexes["ix_users_email"], dialect).startswith(
+        "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ix_users_email"
+    )
@@ -0,0 +1,73 @@
+import json
+
+import pytest
+from api.services import extractors
+from api.services.extractors import ExtractionCache, extract_text
+from benchmarks.corpora import make_pdf
+
+
+@pytest.fixture
+def counted_pages(mocker):
+    pages = []
+    original = extractors.EXTRACTORS[".pdf"][0]
+
+    def counting(content):
+        for text in original(content):
+            pages.append(text)
+            yield text
+
+    mocker.patch.dict(extractors.EXTRACTORS, {".pdf": (counting, True)})
+    return pages
+
+
+def test_pdf_extraction_stops_at_budget(counted_pages):
+    text = extract_text(make_pdf(50), ".pdf", budget=1000, cache=None)
+
+    assert len(text) == 1000
+    assert len(counted_pages) < 5
+
+
+def test_expensive_extraction_is_cached_by_content(counted_pages):
+    cache = ExtractionCache(max_chars=10 ** 6)
+    pdf = make_pdf(2)
+
+    first = extract_text(pdf, ".pdf", cache=cache)
+    parsed = len(counted_pages)
+    second = extract_text(pdf, ".pdf", cache=cache)
+
+    assert first == second
+    assert len(counted_pages) == parsed
+
+
+def test_cache_evicts_least_recently_used():
+    cache = ExtractionCache(max_chars=4)
+    cache.put("a", "11")
+    cache.put("b", "22")
+    cache.get("a")
+    cache.put("c", "33")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "11"
+    assert cache.chars == 4
+
+
+def test_json_is_indexed_as_compact_text():
+    content = json.dumps({"status": "failed", "items": [1, 2]}, indent=4).encode()
+
+    assert extract_text(content, ".json") == '{ "status": "failed", "items": [ 1, 2 ] }'
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64])
+def test_json_whitespace_collapses_across_chunks(monkeypatch, chunk_size):
+    content = json.dumps({"note": "a \u00e9\t b", "items": [1, {"deep": True}]}, indent=8).encode()
+    monkeypatch.setattr(extractors, "TEXT_CHUNK_SIZE", chunk_size)
+
+    assert extract_text(content, ".json") == " ".join(content.decode().split())
+
+
+def test_invalid_json_is_indexed_as_text():
+    assert extract_text(b'{"status": "failed",\n   "truncated', ".json") == '{"status": "failed", "truncated'
+
+
+def test_unknown_type_extracts_nothing():
+    assert extract_text(b"MZ\x90", ".exe") == ""
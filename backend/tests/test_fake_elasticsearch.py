@@ -0,0 +1,108 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from api.services.search import ElasticsearchSearch
+from loadtest.fake_elasticsearch import FakeElasticsearch
+from models.user import User  # noqa: F401  (resolves File.owner)
+
+
+@pytest.fixture
+def service():
+    backend = ElasticsearchSearch()
+    backend.es = FakeElasticsearch()
+    return backend
+
+
+@pytest.mark.asyncio
+async def test_index_search_delete_roundtrip(service):
+    await service.init()
+    await service.index(None, "a", "quarterly revenue report")
+    await service.index(None, "b", "invoice for march")
+
+    assert list(await service.find("revenue")) == ["a"]
+
+    await service.delete(None, "a")
+    await service.delete(None, "missing")
+    assert not await service.find("revenue")
+
+
+@pytest.mark.asyncio
+async def test_bulk_index_and_delete():
+    es = FakeElasticsearch()
+
+    await es.bulk(operations=[
+        {"index": {"_index": "files", "_id": "1"}}, {"content": "alpha"},
+        {"index": {"_index": "files", "_id": "2"}}, {"content": "beta"},
+        {"delete": {"_index": "files", "_id": "1"}},
+    ])
+
+    result = await es.search(index="files", body={"query": {"match_all": {}}})
+    assert [hit["_id"] for hit in result["hits"]["hits"]] == ["2"]
+
+
+@pytest.mark.asyncio
+async def test_long_document_is_searchable_past_first_passage(service):
+    await service.init()
+    text = "filler words " * 2000 + "needle in the haystack " + "more filler " * 500
+
+    await service.index(None, "long", text)
+
+    passages = service.es.documents["file_passages"]
+    assert passages and all(len(doc["content"]) <= 2000 for doc in passages.values())
+    assert list(service.es.documents["files"]["long"]) == ["file_id", "content"]
+
+    hits = await service.find("needle")
+    assert list(hits) == ["long"]
+    assert "needle" in hits["long"]
+
+    await service.delete(None, "long")
+    assert not service.es.documents["file_passages"]
+
+
+@pytest.mark.asyncio
+async def test_routed_index_keeps_owners_apart(service, mocker):
+    service.routing = True
+    service.shards = 4
+    await service.init()
+    assert service.es.indices_settings["files"]["settings"]["number_of_shards"] == 4
+
+    await service.index(None, "a", "shared revenue words", owner_id="alice")
+    await service.index(None, "b", "shared revenue words", owner_id="bob")
+    search = mocker.spy(service.es, "search")
+
+    assert list(await service.find("revenue", owner_id="alice")) == ["a"]
+    assert all(call.kwargs["routing"] == "alice" for call in search.call_args_list)
+    assert set(await service.find("revenue")) == {"a", "b"}
+
+    await service.delete(None, "b")
+    assert list(service.es.documents["files"]) == ["a"]
+
+
+@pytest.mark.asyncio
+async def test_owner_and_type_scope_the_query_without_routing(service):
+    await service.init()
+    for n in range(5):
+        await service.index(None, f"bob-{n}", "quarterly revenue report", owner_id="bob", file_type=".txt")
+    await service.index(None, "alice-txt", "revenue notes", owner_id="alice", file_type=".txt")
+    await service.index(None, "alice-pdf", "revenue slides", owner_id="alice", file_type=".pdf")
+
+    # Bob's documents rank higher, they must not take the places of Alice's
+    assert set(await service.find("quarterly revenue", limit=2, owner_id="alice")) == {"alice-txt", "alice-pdf"}
+    assert list(await service.find("revenue", owner_id="alice", file_type=".pdf")) == ["alice-pdf"]
+
+
+@pytest.mark.asyncio
+async def test_search_pages_follow_the_ranking_and_sql_only_hydrates(service, mock_db):
+    await service.init()
+    await service.index(None, "best", "quarterly revenue report", owner_id="alice")
+    await service.index(None, "second", "revenue only", owner_id="alice")
+    mock_db.execute.return_value.scalars.return_value.all.return_value = [SimpleNamespace(id="second")]
+
+    [hit] = await service.search(mock_db, "quarterly revenue", owner_id="alice", skip=1, limit=1)
+
+    assert hit.id == "second"
+    sql = str(mock_db.execute.await_args.args[0].compile(dialect=postgresql.dialect()))
+    assert "ORDER BY" not in sql and "OFFSET" not in sql
+    assert mock_db.execute.await_args.args[0].compile().params["id_1"] == ["second"]
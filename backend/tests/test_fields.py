@@ -0,0 +1,138 @@
+import json
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+from fastapi import HTTPException
+
+from api.services import fields as fields_module
+from api.services.fields import Field, extract_fields, flatten_json, parse_filters
+from api.services.files import FileService
+from api.services.search import ElasticsearchSearch
+from loadtest.fake_elasticsearch import FakeElasticsearch
+
+
+def test_flatten_json_uses_dotted_paths_without_array_positions():
+    content = json.dumps({
+        "status": "failed",
+        "job": {"retries": 3, "tags": ["etl", "etl", "nightly"], "ok": False},
+        "steps": [{"name": "load"}, {"name": "store", "ms": 1.5}],
+        "note": None
+    }).encode()
+
+    assert flatten_json(content) == [
+        Field("status", "failed"),
+        Field("job.retries", "3", 3.0),
+        Field("job.tags", "etl"),
+        Field("job.tags", "nightly"),
+        Field("job.ok", "false"),
+        Field("steps.name", "load"),
+        Field("steps.name", "store"),
+        Field("steps.ms", "1.5", 1.5),
+        Field("note", "null"),
+    ]
+
+
+def test_flatten_json_is_bounded(monkeypatch):
+    monkeypatch.setattr(fields_module, "MAX_FIELDS", 5)
+    content = json.dumps({f"key{n}": "x" * 1000 for n in range(50)}).encode()
+
+    fields = flatten_json(content)
+
+    assert [field.key for field in fields] == ["key0", "key1", "key2", "key3", "key4"]
+    assert all(len(field.value) == fields_module.MAX_FIELD_VALUE_CHARS for field in fields)
+    assert flatten_json(b"{not json") == []
+    assert extract_fields(b'{"a": 1}', ".txt") == []
+
+
+def test_parse_filters():
+    assert parse_filters(["status=failed", "job.retries >= 3", "ratio<0.5"]) == [
+        ("status", "=", "failed", None),
+        ("job.retries", ">=", "3", 3.0),
+        ("ratio", "<", "0.5", 0.5),
+    ]
+
+    for expressions in (["no operator"], ["status>high"], ["a=1"] * (fields_module.MAX_FILTERS + 1)):
+        with pytest.raises(HTTPException) as exc:
+            parse_filters(expressions)
+        assert exc.value.status_code == 400
+
+
+async def indexed_backend():
+    backend = ElasticsearchSearch()
+    backend.es = FakeElasticsearch()
+    await backend.init()
+    for file_id, document in {
+        "a": {"status": "failed", "retries": 5, "log": "disk quota exceeded"},
+        "b": {"status": "failed", "retries": 1, "log": "disk quota exceeded"},
+        "c": {"status": "done", "retries": 7, "log": "all good"},
+    }.items():
+        content = json.dumps(document).encode()
+        await backend.index(None, file_id, content.decode(), owner_id="alice", fields=extract_fields(content, ".json"))
+    return backend
+
+
+@pytest.mark.asyncio
+async def test_field_filters_select_files_without_a_query():
+    backend = await indexed_backend()
+    assert backend.es.indices_settings["files"]["mappings"]["properties"]["fields"]["type"] == "nested"
+
+    assert set(await backend.find(None, filters=parse_filters(["status=failed"]))) == {"a", "b"}
+    assert set(await backend.find(None, filters=parse_filters(["status=failed", "retries>=3"]))) == {"a"}
+    assert set(await backend.find(None, filters=parse_filters(["retries=7"]))) == {"c"}
+    assert not await backend.find(None, filters=parse_filters(["retries>7"]))
+
+
+@pytest.mark.asyncio
+async def test_field_filters_narrow_text_matches_including_passages(monkeypatch):
+    backend = await indexed_backend()
+    monkeypatch.setattr("api.services.search.FILE_DOC_CHARS", 10)
+
+    await backend.index(None, "long", "x" * 20 + " quota", owner_id="alice", fields=[Field("status", "done")])
+
+    assert set(await backend.find("quota")) == {"a", "b", "long"}
+    assert set(await backend.find("quota", filters=parse_filters(["retries<3"]))) == {"b"}
+    assert set(await backend.find("quota", filters=parse_filters(["status=done"]))) == {"long"}
+
+
+@pytest.mark.asyncio
+async def test_filter_only_listing_is_sorted_and_paged_in_elasticsearch(monkeypatch, mock_db):
+    monkeypatch.setattr("api.services.search.FILTER_SCAN_SIZE", 2)
+    backend = ElasticsearchSearch()
+    backend.es = FakeElasticsearch()
+    await backend.init()
+    failed = [Field("status", "failed")]
+    for n in range(7):
+        await backend.index(None, f"f{n}", "", owner_id="alice", fields=failed, created_at=datetime(2024, 1, 1 + n))
+    await backend.index(None, "bob", "", owner_id="bob", fields=failed, created_at=datetime(2025, 1, 1))
+    await backend.index(None, "done", "", owner_id="alice", fields=[Field("status", "done")],
+                        created_at=datetime(2025, 1, 1))
+    requests = backend.es.search = AsyncMock(wraps=backend.es.search)
+    where = parse_filters(["status=failed"])
+
+    assert await backend.find_filtered("alice", where, skip=0, limit=3) == ["f6", "f5", "f4"]
+    assert await backend.find_filtered("alice", where, skip=5, limit=3) == ["f1", "f0"]
+    assert await backend.find_filtered("alice", where, skip=7, limit=3) == []
+    assert max(c.kwargs["body"]["size"] for c in requests.call_args_list) == 3
+
+    # Rows come back in any order and are put in the order Elasticsearch sorted the page
+    mock_db.execute.return_value.scalars.return_value.all.return_value = [
+        SimpleNamespace(id=file_id) for file_id in ("f4", "f6", "f5")
+    ]
+    page = await backend.search(mock_db, None, owner_id="alice", limit=3, filters=where)
+    assert [db_file.id for db_file in page] == ["f6", "f5", "f4"]
+
+
+@pytest.mark.asyncio
+async def test_list_files_sends_field_filters_to_the_search_backend(mock_db):
+    service = FileService()
+    service.search = Mock(search=AsyncMock(return_value=[]))
+
+    await service.list_files(mock_db, {"user_id": "user-123"}, where=["status=failed"], limit=10)
+
+    args = service.search.search.await_args
+    assert args.args[1] is None
+    assert args.kwargs["owner_id"] == "user-123" and args.kwargs["limit"] == 10
+    assert args.kwargs["filters"] == parse_filters(["status=failed"])
+    mock_db.execute.assert_not_awaited()
@@ -1,8 +1,17 @@
+import io
+import zipfile
+import urllib.parse
 import pytest
 from fastapi import HTTPException
 from types import SimpleNamespace
-from unittest.mock import AsyncMock
+from unittest.mock import AsyncMock, Mock
+from prometheus_client import REGISTRY
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import IntegrityError
+from api.dependencies import get_current_user
 from api.services.files import FileService
+from core.admission import admission
+from core.settings import settings
 
 
 @pytest.fixture
@@ -12,13 +21,13 @@ def mock_user():
 
 @pytest.fixture
 def service(mocker):
+    mocker.patch.object(settings, "TRANSFER_SECRET", "transfer-secret")
     svc = FileService()
     mocker.patch.object(svc, "_upload_to_storage", AsyncMock())
     mocker.patch.object(svc, "_download_from_storage", AsyncMock())
     mocker.patch.object(svc, "_delete_from_storage", AsyncMock())
-    mocker.patch.object(svc, "_index_file_content", AsyncMock())
-    mocker.patch.object(svc, "_delete_from_search_index", AsyncMock())
-    mocker.patch.object(svc, "_search_file_content", AsyncMock())
+    mocker.patch.object(svc, "_storage_size", AsyncMock(return_value=11))
+    mocker.patch.object(svc, "search", Mock(index=AsyncMock(), delete=AsyncMock(), search=AsyncMock()))
     mocker.patch.object(svc, "_extract_text", AsyncMock(return_value="extracted text"))
     return svc
 
@@ -42,7 +51,7 @@ async def test_upload_files_success(service, mock_db, mock_user):
     assert result["count"] == 1
     assert result["uploaded"][0]["name"] == "test.txt"
     service._upload_to_storage.assert_awaited_once()
-    service._index_file_content.assert_awaited_once()
+    service.search.index.assert_awaited_once()
     mock_db.add.assert_called_once()
     mock_db.commit.assert_awaited_once()
 
@@ -57,7 +66,7 @@ async def test_upload_files_no_files(service, mock_db, mock_user):
 
 @pytest.mark.asyncio
 async def test_list_files_search_empty(service, mock_db, mock_user):
-    service._search_file_content.return_value = []
+    service.search.search.return_value = []
     result = await service.list_files(mock_db, mock_user, search="abc")
     assert result == []
 
@@ -123,6 +132,8 @@ async def test_delete_file_success(service, mock_db, mock_user):
 
     file = SimpleNamespace(
         id="1",
+        type=".txt",
+        size=6,
         owner_id="user-123",
         owner=mock_owner,
         file_path="path"
@@ -133,7 +144,7 @@ async def test_delete_file_success(service, mock_db, mock_user):
     await service.delete_file("1", mock_db, mock_user)
 
     service._delete_from_storage.assert_awaited_once()
-    service._delete_from_search_index.assert_awaited_once()
+    service.search.delete.assert_awaited_once()
     mock_db.delete.assert_awaited_once_with(file)
     mock_db.commit.assert_awaited_once()
 
@@ -204,3 +215,182 @@ async def test_download_forbidden(service, mock_db, mock_user):
     with pytest.raises(HTTPException) as exc:
         await service.download_file("file-1", mock_db, mock_user)
     assert exc.value.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_create_direct_upload_signed_url(service, mock_user):
+    result = await service.create_direct_upload("notes.txt", "text/plain", 11, mock_user)
+
+    parsed = urllib.parse.urlparse(result["upload_url"])
+    query = urllib.parse.parse_qs(parsed.query)
+    path = urllib.parse.unquote(parsed.path.removeprefix("/api/transfers/"))
+
+    file_path = service.verify_transfer("PUT", path, int(query["expires"][0]), query["signature"][0])
+    assert file_path.name == f"{result['file_id']}.txt"
+
+    with pytest.raises(HTTPException) as exc:
+        service.verify_transfer("GET", path, int(query["expires"][0]), query["signature"][0])
+    assert exc.value.status_code == 403
+
+
+def test_transfer_paths_stay_in_the_storage_directory(service, tmp_path):
+    service.use_gcs = False
+    service.local_dir = tmp_path / "uploads"
+    expires = 2 ** 40
+
+    for path in ("../secret.txt", "u/../../secret.txt", str(tmp_path / "secret.txt"), ""):
+        with pytest.raises(HTTPException) as exc:
+            service.verify_transfer("GET", path, expires, service._sign_transfer("GET", path, expires))
+        assert exc.value.status_code == 403
+
+    path = "u/../u/f.txt"
+    assert service.verify_transfer("GET", path, expires, service._sign_transfer("GET", path, expires)) == (
+        tmp_path / "uploads" / "u" / "f.txt"
+    )
+
+
+@pytest.mark.asyncio
+async def test_transfers_need_a_secret(service, mock_user, mocker):
+    mocker.patch.object(settings, "TRANSFER_SECRET", "")
+    with pytest.raises(RuntimeError):
+        service._sign_transfer("GET", "u/f.txt", 2 ** 40)
+    with pytest.raises(RuntimeError):
+        await service.create_direct_upload("notes.txt", "text/plain", 11, mock_user)
+
+
+@pytest.mark.asyncio
+async def test_upload_token_is_not_a_session_token(service, mock_user, mocker):
+    mocker.patch.object(settings, "JWT_SECRET", "transfer-secret")
+    ticket = await service.create_direct_upload("notes.txt", "text/plain", 11, mock_user)
+    request = Mock(headers={"Authorization": f"Bearer {ticket['upload_token']}"})
+
+    with pytest.raises(HTTPException) as exc:
+        await get_current_user(request)
+    assert exc.value.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_complete_direct_upload(service, mock_db, mock_user):
+    ticket = await service.create_direct_upload("notes.txt", "text/plain", 11, mock_user)
+    service._download_from_storage.return_value = b"hello world"
+
+    result = await service.complete_direct_upload(ticket["upload_token"], mock_db, mock_user)
+
+    assert result == {"id": ticket["file_id"], "name": "notes.txt", "type": ".txt", "size": 11}
+    db_file = mock_db.add.call_args.args[0]
+    service.search.index.assert_awaited_once_with(
+        mock_db, ticket["file_id"], "extracted text", owner_id=mock_user["user_id"], fields=[], file_type=".txt",
+        created_at=db_file.created_at
+    )
+    mock_db.add.assert_called_once()
+    mock_db.commit.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_complete_direct_upload_twice_concurrently(service, mock_db, mock_user):
+    ticket = await service.create_direct_upload("notes.txt", "text/plain", 11, mock_user)
+    service._download_from_storage.return_value = b"hello world"
+    # Both requests passed the existence check, the other one committed first
+    mock_db.execute.return_value.scalar_one_or_none.return_value = None
+    mock_db.commit.side_effect = IntegrityError("INSERT INTO files", {}, Exception("duplicate key"))
+
+    with pytest.raises(HTTPException) as exc:
+        await service.complete_direct_upload(ticket["upload_token"], mock_db, mock_user)
+
+    assert exc.value.status_code == 409
+    mock_db.rollback.assert_awaited_once()
+    assert admission.inflight_bytes == 0
+
+
+@pytest.mark.asyncio
+async def test_complete_direct_upload_checks_size_before_reading(service, mock_db, mock_user):
+    ticket = await service.create_direct_upload("notes.txt", "text/plain", 11, mock_user)
+    service._storage_size.return_value = 200 * 1024 * 1024
+
+    with pytest.raises(HTTPException) as exc:
+        await service.complete_direct_upload(ticket["upload_token"], mock_db, mock_user)
+
+    assert exc.value.status_code == 413
+    service._download_from_storage.assert_not_awaited()
+    service._delete_from_storage.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_complete_direct_upload_other_user(service, mock_db, mock_user):
+    ticket = await service.create_direct_upload("notes.txt", "text/plain", 11, mock_user)
+
+    with pytest.raises(HTTPException) as exc:
+        await service.complete_direct_upload(ticket["upload_token"], mock_db, {"user_id": "intruder"})
+    assert exc.value.status_code == 403
+    mock_db.add.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_download_archive_streams_zip(mocker, mock_db, mock_user, tmp_path):
+    svc = FileService()
+    svc.local_dir = tmp_path
+    (tmp_path / "a.txt").write_bytes(b"hello" * 1000)
+    (tmp_path / "b.pdf").write_bytes(b"%PDF-1.4 data")
+    files = [
+        SimpleNamespace(id="1", name="a.txt", type=".txt", size=5000, file_path="a.txt", created_at=None),
+        SimpleNamespace(id="2", name="a.txt", type=".pdf", size=13, file_path="b.pdf", created_at=None),
+    ]
+    mock_db.execute.return_value.scalars.return_value.all.return_value = files
+
+    response = await svc.download_archive(["1", "2"], mock_db, mock_user)
+    body = b"".join([chunk async for chunk in response.body_iterator])
+
+    archive = zipfile.ZipFile(io.BytesIO(body))
+    assert archive.namelist() == ["a.txt", "a (1).txt"]
+    assert archive.read("a.txt") == b"hello" * 1000
+    assert archive.getinfo("a (1).txt").compress_type == zipfile.ZIP_STORED
+
+
+@pytest.mark.asyncio
+async def test_download_archive_not_owned(service, mock_db, mock_user):
+    mock_db.execute.return_value.scalars.return_value.all.return_value = []
+
+    with pytest.raises(HTTPException) as exc:
+        await service.download_archive(["someone-elses"], mock_db, mock_user)
+    assert exc.value.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_upload_failure_is_counted(service, mock_db, mock_user):
+    service._upload_to_storage.side_effect = RuntimeError("bucket unavailable")
+    before = REGISTRY.get_sample_value("upload_failures_total") or 0
+
+    with pytest.raises(HTTPException):
+        await service.upload_files([FakeUploadFile("a.txt", b"data", "text/plain")], mock_db, mock_user)
+
+    assert REGISTRY.get_sample_value("upload_failures_total") == before + 1
+    assert REGISTRY.get_sample_value("file_bytes_in_flight", {"direction": "upload"}) == 0
+
+
+@pytest.mark.asyncio
+async def test_suggest_files_escapes_prefix(service, mock_db, mock_user):
+    mock_db.execute.return_value = [SimpleNamespace(id="f1", name="100%_Done.txt", type=".txt")]
+
+    suggestions = await service.suggest_files(mock_db, mock_user, "100%_D", limit=500)
+
+    stmt = mock_db.execute.await_args.args[0]
+    compiled = stmt.compile(dialect=postgresql.dialect())
+    assert "100\\%\\_d%" in compiled.params.values()
+    assert 20 in compiled.params.values()
+    assert suggestions == [{"id": "f1", "name": "100%_Done.txt", "type": ".txt"}]
+
+
+@pytest.mark.asyncio
+async def test_suggest_files_empty_prefix(service, mock_db, mock_user):
+    assert await service.suggest_files(mock_db, mock_user, "") == []
+    mock_db.execute.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_search_client_created_lazily():
+    svc = FileService()
+    assert svc.search._es is None
+    await svc.close()
+
+    svc.search.es = SimpleNamespace(ping=AsyncMock(side_effect=ConnectionError("down")))
+    assert await svc.ping() is False
@@ -0,0 +1,29 @@
+import importlib.util
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+spec = importlib.util.spec_from_file_location("gunicorn_conf", Path(__file__).parent.parent / "gunicorn.conf.py")
+gunicorn_conf = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(gunicorn_conf)
+
+
+def test_on_starting_clears_stale_metric_files(monkeypatch, tmp_path):
+    metrics_dir = tmp_path / "metrics"
+    metrics_dir.mkdir()
+    (metrics_dir / "counter_1.db").write_bytes(b"stale")
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(metrics_dir))
+
+    gunicorn_conf.on_starting(MagicMock())
+
+    assert metrics_dir.is_dir()
+    assert list(metrics_dir.iterdir()) == []
+
+
+def test_child_exit_marks_worker_dead(monkeypatch, mocker, tmp_path):
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    mark_dead = mocker.patch.object(gunicorn_conf.multiprocess, "mark_process_dead")
+
+    gunicorn_conf.child_exit(MagicMock(), SimpleNamespace(pid=4242))
+
+    mark_dead.assert_called_once_with(4242)
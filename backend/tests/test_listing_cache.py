@@ -0,0 +1,99 @@
+import json
+from unittest.mock import AsyncMock
+
+import pytest
+
+from api.services import files as files_module
+from api.services.files import FileService
+from api.services.listing_cache import ListingCache
+
+
+def test_if_none_match_uses_weak_comparison():
+    etag = ListingCache.etag("user-123", 3)
+    tag = etag.removeprefix("W/")
+    assert ListingCache.matches(etag, etag)
+    assert ListingCache.matches(f'"other", {tag}', etag)
+    assert ListingCache.matches("*", etag)
+    assert not ListingCache.matches(ListingCache.etag("user-123", 2), etag)
+    assert not ListingCache.matches(None, etag)
+
+
+def test_pages_are_evicted_by_size():
+    cache = ListingCache(max_bytes=10)
+    cache.store_page("a", 1, 50, None, b"123456")
+    cache.store_page("b", 1, 50, None, b"1234")
+    cache.page("a", 1, 50, None)
+    cache.store_page("c", 1, 50, None, b"12")
+
+    assert cache.page("b", 1, 50, None) is None
+    assert cache.page("a", 1, 50, None) == b"123456"
+    assert cache.page("a", 2, 50, None) is None
+
+
+@pytest.mark.asyncio
+async def test_versions_follow_notifications_only_while_listening(mock_db):
+    cache = ListingCache(max_owners=2)
+    mock_db.execute.return_value.scalar_one_or_none.return_value = 4
+
+    assert await cache.version(mock_db, "u1") == 4
+    assert not cache._versions  # no listener: nothing kept
+
+    cache.listening = True
+    await cache.version(mock_db, "u1")
+    cache._notified(None, 0, "listing_versions", "u1:5")
+    mock_db.execute.reset_mock()
+    assert await cache.version(mock_db, "u1") == 5
+    mock_db.execute.assert_not_awaited()
+
+    cache._notified(None, 0, "listing_versions", "u2:1")
+    cache._notified(None, 0, "listing_versions", "u3:1")
+    assert list(cache._versions) == ["u2", "u3"]
+
+
+@pytest.fixture
+def cache(mocker):
+    cache = ListingCache()
+    cache.listening = True
+    cache._versions["user-123"] = 7
+    mocker.patch.object(files_module, "listing_cache", cache)
+    return cache
+
+
+@pytest.mark.asyncio
+async def test_conditional_listing(cache, mocker, mock_db):
+    svc = FileService()
+    mocker.patch.object(svc, "list_files", AsyncMock(return_value=[{"id": "f1"}]))
+    user = {"user_id": "user-123"}
+
+    first = await svc.list_files_conditional(mock_db, user)
+    etag = first.headers["etag"]
+    assert first.status_code == 200
+    assert etag.startswith('W/"') and etag.endswith('-7"')
+    assert first.headers["vary"] == "Authorization"
+    assert json.loads(first.body) == [{"id": "f1"}]
+
+    again = await svc.list_files_conditional(mock_db, user)
+    assert again.body == first.body
+    svc.list_files.assert_awaited_once()
+
+    current = await svc.list_files_conditional(mock_db, user, if_none_match=etag)
+    assert current.status_code == 304
+    mock_db.execute.assert_not_awaited()
+
+    cache._notified(None, 0, "listing_versions", "user-123:8")
+    changed = await svc.list_files_conditional(mock_db, user, if_none_match=etag)
+    assert changed.status_code == 200
+    assert svc.list_files.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_etag_of_one_user_does_not_match_another_at_the_same_version(cache, mocker, mock_db):
+    svc = FileService()
+    mocker.patch.object(svc, "list_files", AsyncMock(return_value=[]))
+    cache._versions["user-456"] = 7
+
+    alice = await svc.list_files_conditional(mock_db, {"user_id": "user-123"})
+    bob = await svc.list_files_conditional(mock_db, {"user_id": "user-456"}, if_none_match=alice.headers["etag"])
+
+    assert bob.status_code == 200
+    assert bob.headers["etag"] != alice.headers["etag"]
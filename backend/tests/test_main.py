@@ -0,0 +1,44 @@
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+import main
+
+
+@pytest.mark.asyncio
+async def test_database_tasks_start_only_after_the_schema_is_ready(mocker):
+    calls = []
+    mocker.patch("main.init_models", AsyncMock(side_effect=lambda: calls.append("schema")))
+    mocker.patch("main.start_database_tasks", Mock(side_effect=lambda: calls.append("tasks") or ["task"]))
+    mocker.patch("main.file_service", Mock(init=AsyncMock()))
+    app = SimpleNamespace(state=SimpleNamespace())
+    background_tasks = []
+
+    await main.prepare_dependencies(app, background_tasks)
+
+    assert calls == ["schema", "tasks"] and background_tasks == ["task"]
+
+
+@pytest.mark.asyncio
+async def test_app_does_not_start_without_a_transfer_secret(mocker):
+    mocker.patch.object(main.settings, "TRANSFER_SECRET", "")
+    prepare = mocker.patch("main.prepare_dependencies")
+
+    with pytest.raises(RuntimeError):
+        async with main.lifespan(SimpleNamespace(state=SimpleNamespace())):
+            pass
+    prepare.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_database_tasks_do_not_start_without_a_schema(mocker):
+    mocker.patch("main.init_models", AsyncMock(side_effect=ConnectionError("db down")))
+    start = mocker.patch("main.start_database_tasks")
+    mocker.patch("main.file_service", Mock(init=AsyncMock()))
+    background_tasks = []
+
+    await main.prepare_dependencies(SimpleNamespace(state=SimpleNamespace()), background_tasks)
+
+    start.assert_not_called()
+    assert background_tasks == []
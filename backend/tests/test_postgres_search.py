@@ -0,0 +1,76 @@
+from unittest.mock import AsyncMock
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from api.services.fields import Field, parse_filters
+from api.services.search import PostgresSearch, create_search_backend
+from models.file import File
+from models.user import User  # noqa: F401  (resolves File.owner when run alone)
+
+
+def compiled(stmt):
+    return stmt.compile(dialect=postgresql.dialect())
+
+
+@pytest.mark.asyncio
+async def test_search_filters_in_the_same_query(mock_db):
+    mock_db.execute.return_value = [(File(id="f1", name="a.txt"), "the <b>revenue</b> report")]
+
+    hits = await PostgresSearch().search(mock_db, "50%_revenue", owner_id="user-123", file_type=".txt", limit=10)
+
+    query = compiled(mock_db.execute.await_args.args[0])
+    sql = str(query)
+    assert "JOIN file_contents ON file_contents.file_id = files.id" in sql
+    assert "@@ websearch_to_tsquery" in sql and "ILIKE" in sql
+    assert "files.owner_id = " in sql and "files.type = " in sql
+    assert "ORDER BY ts_rank(" in sql
+    assert "%50\\%\\_revenue%" in query.params.values()
+    assert [(hit.id, hit.snippet) for hit in hits] == [("f1", "the <b>revenue</b> report")]
+
+
+@pytest.mark.asyncio
+async def test_index_upserts_after_the_files_row(mock_db):
+    mock_db.flush = AsyncMock()
+
+    await PostgresSearch().index(mock_db, "f1", "text\x00with nul")
+
+    mock_db.flush.assert_awaited_once()
+    query = compiled(mock_db.execute.await_args_list[0].args[0])
+    assert "ON CONFLICT (file_id) DO UPDATE" in str(query)
+    assert "textwith nul" in query.params.values()
+
+
+@pytest.mark.asyncio
+async def test_index_replaces_json_fields(mock_db):
+    mock_db.flush = AsyncMock()
+
+    await PostgresSearch().index(mock_db, "f1", "{}", fields=[Field("status", "failed"), Field("retries", "3", 3.0)])
+
+    delete, insert = [call.args for call in mock_db.execute.await_args_list[1:]]
+    assert str(compiled(delete[0])).startswith("DELETE FROM file_fields")
+    assert insert[1] == [
+        {"file_id": "f1", "key": "status", "value": "failed", "number": None},
+        {"file_id": "f1", "key": "retries", "value": "3", "number": 3.0},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_field_filters_without_query_skip_the_text_search(mock_db):
+    mock_db.execute.return_value = []
+
+    await PostgresSearch().search(mock_db, None, owner_id="user-123", filters=parse_filters(["status=failed",
+                                                                                             "retries>=3"]))
+
+    query = compiled(mock_db.execute.await_args.args[0])
+    sql = str(query)
+    assert "file_contents" not in sql
+    assert sql.count("EXISTS (SELECT file_fields.file_id") == 2
+    assert "file_fields.number >= " in sql
+    assert {"status", "failed", "retries", 3.0} <= set(query.params.values())
+    assert "ORDER BY files.created_at DESC" in sql
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        create_search_backend("solr")
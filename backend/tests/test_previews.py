@@ -0,0 +1,86 @@
+import json
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from api.services.previews import PREVIEW_CHARS, PreviewBackfill, build_preview, build_preview_and_fields
+from benchmarks.corpora import make_pdf
+
+
+def test_preview_keeps_start_of_text():
+    preview = build_preview(b"", ".txt", "first   line\nsecond " + "x" * 2000)
+    assert preview["snippet"].startswith("first line second")
+    assert len(preview["snippet"]) == PREVIEW_CHARS
+    assert preview["page_count"] is None and preview["json_keys"] is None
+
+
+def test_preview_pdf_page_count():
+    assert build_preview(make_pdf(3), ".pdf", "")["page_count"] == 3
+
+
+def test_preview_json_keys():
+    assert build_preview(b'{"b": 1, "a": {"c": 2}}', ".json", "")["json_keys"] == ["b", "a"]
+    assert build_preview(b"[1, 2]", ".json", "")["json_keys"] is None
+    assert build_preview(b"{broken", ".json", "")["json_keys"] is None
+
+
+def test_json_upload_is_parsed_once_for_preview_and_fields(mocker):
+    loads = mocker.spy(json, "loads")
+
+    preview, fields = build_preview_and_fields(b'{"status": "ok", "job": {"retries": 2}}', ".json", "")
+
+    assert preview["json_keys"] == ["status", "job"]
+    assert [field.key for field in fields] == ["status", "job.retries"]
+    assert loads.call_count == 1
+    assert build_preview_and_fields(b"plain", ".txt", "plain")[1] == []
+
+
+@pytest.mark.asyncio
+async def test_upload_stores_preview(mocker, mock_db):
+    from api.services.files import FileService
+
+    svc = FileService()
+    mocker.patch.object(svc, "search", Mock(index=AsyncMock()))
+    mocker.patch.object(svc, "_extract_text", AsyncMock(return_value='{"name": "x"}'))
+
+    await svc._register_file(mock_db, "f1", "a.json", ".json", b'{"name": "x"}', "p", {"user_id": "u"})
+
+    db_file = mock_db.add.call_args.args[0]
+    assert db_file.preview.file_id == "f1"
+    assert db_file.preview.json_keys == ["name"]
+    assert db_file.preview.snippet == '{"name": "x"}'
+
+
+@pytest.mark.asyncio
+async def test_backfill_previews_missing_files_in_batches(mocker):
+    rows = [SimpleNamespace(id=f"f{n}", type=".txt", file_path=f"p{n}", owner_id=f"u{n}") for n in range(3)]
+    inserted = []
+    bump = mocker.patch("api.services.previews.listing_cache.bump", AsyncMock())
+
+    async def execute(stmt):
+        result = Mock()
+        if getattr(stmt, "is_insert", False):
+            batch = [v for k, v in stmt.compile().params.items() if k.startswith("file_id")]
+            inserted.extend(batch)
+            result.scalars.return_value.all.return_value = batch
+        elif "file_previews" in str(stmt):
+            after = next(v for v in stmt.compile().params.values() if isinstance(v, str))
+            result.all.return_value = [row for row in rows if row.id > after][:2]
+        else:
+            result.scalars.return_value.all.return_value = [row.id for row in rows]
+        return result
+
+    session = Mock(execute=AsyncMock(side_effect=execute), commit=AsyncMock())
+
+    @asynccontextmanager
+    async def session_factory():
+        yield session
+
+    files = Mock(_download_from_storage=AsyncMock(side_effect=[b"one", Exception("gone"), b"three"]))
+    stats = await PreviewBackfill(files, session_factory, batch_size=2).run()
+
+    assert stats == {"previewed": 2, "failed": 1}
+    assert inserted == ["f0", "f2"]
+    assert [c.args[1] for c in bump.await_args_list] == ["u0", "u2"]
@@ -0,0 +1,100 @@
+import asyncio
+import threading
+from collections import Counter
+
+import pytest
+from core.profiling import ProfilingMiddleware, ProfilingState, profiling
+
+
+def http_scope(path="/api/files", headers=()):
+    return {"type": "http", "method": "GET", "path": path, "headers": list(headers)}
+
+
+@pytest.fixture
+def state(tmp_path, mocker):
+    test_state = ProfilingState(tmp_path, 0.001)
+    mocker.patch("core.profiling.profiling", test_state)
+    return test_state
+
+
+async def slow_app(scope, receive, send):
+    await asyncio.sleep(0.02)
+
+
+def test_count_mode_disarms_after_n_requests(state):
+    state.arm(requests=2)
+
+    assert state.claim(http_scope())
+    assert not state.claim(http_scope("/metrics"))
+    assert state.claim(http_scope())
+    assert not state.claim(http_scope())
+    assert not state.enabled
+
+
+def test_header_mode_only_claims_marked_requests(state):
+    state.arm(header=True)
+
+    assert not state.claim(http_scope())
+    assert state.claim(http_scope(headers=[(b"x-profile-request", b"1")]))
+    assert state.enabled
+
+
+def test_workers_share_the_arm_state_and_profiles(tmp_path, mocker):
+    mocker.patch("core.profiling.STATE_REFRESH_INTERVAL", 0)
+    first, second = ProfilingState(tmp_path, 0.001), ProfilingState(tmp_path, 0.001)
+    assert not second.is_armed()
+
+    first.arm(requests=2)
+
+    assert second.is_armed() and second.status()["remaining"] == 2
+    assert second.claim(http_scope())
+    assert first.claim(http_scope())
+    assert not second.claim(http_scope()) and not first.is_armed()
+
+    second.save(http_scope(), Counter({"main": 1}), 0.1)
+    assert [profile["path"] for profile in first.list_profiles()] == ["/api/files"]
+
+
+def test_disarm_reaches_other_workers(tmp_path, mocker):
+    mocker.patch("core.profiling.STATE_REFRESH_INTERVAL", 0)
+    first, second = ProfilingState(tmp_path, 0.001), ProfilingState(tmp_path, 0.001)
+    first.arm(header=True)
+    assert second.is_armed()
+
+    second.disarm()
+
+    assert not first.is_armed()
+    assert first.status() == {"enabled": False, "mode": None, "remaining": None, "expires_at": None}
+
+
+@pytest.mark.asyncio
+async def test_middleware_saves_collapsed_profile(state):
+    state.arm(requests=1)
+
+    await ProfilingMiddleware(slow_app)(http_scope(), None, None)
+
+    [saved] = state.list_profiles()
+    assert saved["path"] == "/api/files"
+    collapsed = state.profile_path(saved["id"]).read_text()
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in collapsed.splitlines())
+
+
+@pytest.mark.asyncio
+async def test_middleware_writes_profiles_off_the_event_loop(state, mocker):
+    state.arm(requests=1)
+    save = mocker.spy(state, "save")
+    threads = []
+    save.side_effect = lambda *args: threads.append(threading.get_ident())
+
+    await ProfilingMiddleware(slow_app)(http_scope(), None, None)
+
+    assert threads and threads[0] != threading.get_ident()
+
+
+@pytest.mark.asyncio
+async def test_middleware_passthrough_when_disabled(mocker):
+    claim = mocker.patch.object(profiling, "claim")
+
+    await ProfilingMiddleware(slow_app)(http_scope(), None, None)
+
+    claim.assert_not_called()
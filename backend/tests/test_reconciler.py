@@ -0,0 +1,158 @@
+import os
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from api.services.files import FileService
+from api.services.reconciler import Reconciler, merge_join
+from loadtest.fake_elasticsearch import FakeElasticsearch
+
+
+async def items(*values):
+    for value in values:
+        yield value
+
+
+@pytest.mark.asyncio
+async def test_merge_join_pairs_sorted_inputs():
+    pairs = [pair async for pair in merge_join(items(1, 3, 4), items(2, 3, 5), lambda a: a, lambda b: b)]
+    assert pairs == [(1, None), (None, 2), (3, 3), (4, None), (None, 5)]
+
+
+def test_local_listing_is_in_path_order(tmp_path):
+    svc = FileService()
+    svc.use_gcs = False
+    svc.local_dir = tmp_path
+    for name in ("a/x.txt", "a-c.txt", "b.txt", "upload-sessions/s1/000000"):
+        (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / name).write_bytes(b"data")
+
+    paths = [path for path, _, _ in svc._list_storage(exclude="upload-sessions")]
+    assert paths == sorted(paths)
+    assert paths == [str(tmp_path / name) for name in ("a-c.txt", "a/x.txt", "b.txt")]
+
+
+@pytest.fixture
+def files(tmp_path):
+    svc = FileService()
+    svc.use_gcs = False
+    svc.local_dir = tmp_path
+    svc.search.es = FakeElasticsearch()
+    return svc
+
+
+def row(files, file_id):
+    return SimpleNamespace(id=file_id, file_path=str(files.local_dir / f"{file_id}.txt"), owner_id="u", type=".txt",
+                           size=4, created_at=datetime(2024, 1, 1))
+
+
+def scan_rows(rows):
+    async def scan(key, column):
+        for r in sorted(rows, key=lambda r: getattr(r, column)):
+            yield r
+    return scan
+
+
+def session_factory_returning(rows=(), ids=()):
+    result = Mock()
+    result.all.return_value = list(rows)
+    result.scalars.return_value.all.return_value = list(ids)
+    session = Mock(execute=AsyncMock(return_value=result), commit=AsyncMock())
+
+    @asynccontextmanager
+    async def session_factory():
+        yield session
+
+    return session_factory
+
+
+@pytest.mark.asyncio
+async def test_reconciler_reports_and_repairs(files):
+    await files.init()
+    rows = [row(files, "f1"), row(files, "f2"), row(files, "f3")]
+    for file_id in ("f1", "f2", "orphan"):
+        (files.local_dir / f"{file_id}.txt").write_bytes(b"text")
+    old = time.time() - 2 * 86400
+    os.utime(files.local_dir / "orphan.txt", (old, old))
+    (files.local_dir / "recent.txt").write_bytes(b"new")
+    await files.search.index(None, "f1", "text", owner_id="u", file_type=".txt", created_at=datetime(2024, 1, 1))
+    await files.search.index(None, "gone", "text")
+
+    reconciler = Reconciler(
+        files, session_factory_returning(), repair=True, grace=timedelta(hours=24), batch_size=2,
+        delete_missing_rows=True, max_missing_ratio=0.5
+    )
+    reconciler._rows = scan_rows(rows)
+    reconciler._delete_rows = AsyncMock()
+    report = await reconciler.run()
+
+    assert (report["objects"], report["rows"], report["documents"]) == (4, 3, 2)
+    assert report["recent_objects"] == 1
+    assert report["samples"]["orphan_objects"] == [str(files.local_dir / "orphan.txt")]
+    assert report["samples"]["missing_objects"] == [rows[2].file_path]
+    assert report["samples"]["orphan_documents"] == ["gone"]
+    assert report["samples"]["missing_documents"] == ["f2", "f3"]
+    assert report["stale_documents"] == 0
+
+    assert not (files.local_dir / "orphan.txt").exists()
+    assert (files.local_dir / "recent.txt").exists()
+    assert "gone" not in files.search.es.documents["files"]
+    assert files.search.es.documents["files"]["f2"]["content"] == "text"
+    assert reconciler._delete_rows.await_args.args[0] == [rows[2]]
+    assert not files.search.es.points_in_time
+
+
+@pytest.mark.asyncio
+async def test_missing_objects_abort_the_repair_or_need_the_flag(files):
+    await files.init()
+    rows = [row(files, f"f{n}") for n in range(3)]
+    (files.local_dir / "f0.txt").write_bytes(b"text")
+
+    for options in ({"max_missing": 1}, {"max_missing_ratio": 0.5}):
+        reconciler = Reconciler(files, session_factory_returning(), repair=True, delete_missing_rows=True, **options)
+        reconciler._rows = scan_rows(rows)
+        reconciler._delete_rows = AsyncMock()
+        report = await reconciler.run()
+
+        assert report["missing_objects"] == 2 and "repair_aborted" in report
+        reconciler._delete_rows.assert_not_awaited()
+
+    reconciler = Reconciler(files, session_factory_returning(), repair=True, max_missing_ratio=1)
+    reconciler._rows = scan_rows(rows)
+    reconciler._delete_rows = AsyncMock()
+    report = await reconciler.run()
+
+    assert report["missing_objects"] == 2 and "repair_aborted" not in report
+    reconciler._delete_rows.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_legacy_stale_and_recent_documents(files):
+    await files.init()
+    rows = [row(files, "f1"), row(files, "f2"), row(files, "f3")]
+    for r in rows:
+        (files.local_dir / f"{r.id}.txt").write_bytes(b"text")
+    es = files.search.es
+    # As indexed before documents carried their file id
+    await es.index(index="files", id="f1", body={"content": "text"})
+    await es.index(index="files", id="deleted", body={"content": "text"})
+    await files.search.index(None, "f2", "text", owner_id="u", file_type=".txt", created_at=datetime(2024, 1, 1))
+    await files.search.index(None, "f3", "text")
+    await files.search.index(None, "uploading", "text", owner_id="u", created_at=datetime.utcnow())
+
+    reconciler = Reconciler(files, session_factory_returning(), repair=True)
+    reconciler._rows = scan_rows(rows)
+    report = await reconciler.run()
+
+    assert report["documents"] == 5 and report["recent_documents"] == 1
+    assert report["samples"]["legacy_documents"] == ["deleted", "f1"]
+    assert report["samples"]["orphan_documents"] == []
+    assert report["samples"]["missing_documents"] == ["f1"]
+    assert report["samples"]["stale_documents"] == ["f3"]
+    assert set(es.documents["files"]) == {"f1", "f2", "f3", "uploading"}
+    for file_id in ("f1", "f3"):
+        assert es.documents["files"][file_id]["owner_id"] == "u" and es.documents["files"][file_id]["type"] == ".txt"
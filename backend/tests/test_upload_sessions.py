@@ -0,0 +1,215 @@
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+from fastapi import HTTPException
+
+from api.services.files import FileService
+from api.services.upload_sessions import UploadSessionService
+from core.settings import settings
+from models.upload_session import UploadSession
+
+
+@pytest.fixture
+def mock_user():
+    return {"user_id": "user-123"}
+
+
+@pytest.fixture
+def sessions(mocker, tmp_path):
+    files = FileService()
+    files.use_gcs = False
+    files.local_dir = tmp_path
+    mocker.patch.object(files.search, "index", AsyncMock())
+    mocker.patch.object(files, "_extract_text", AsyncMock(return_value="extracted text"))
+    mocker.patch.object(settings, "UPLOAD_CHUNK_MIN_SIZE", 4)
+    return UploadSessionService(files)
+
+
+async def body(*parts):
+    for part in parts:
+        yield part
+
+
+async def start_session(sessions, mock_db, mock_user, size):
+    created = await sessions.create_session("notes.txt", "text/plain", size, mock_db, mock_user)
+    session = mock_db.add.call_args.args[0]
+    mock_db.execute.return_value.scalar_one_or_none.return_value = session
+    return created, session
+
+
+@pytest.mark.asyncio
+async def test_chunks_are_assembled_on_complete(sessions, mock_db, mock_user, tmp_path):
+    created, session = await start_session(sessions, mock_db, mock_user, 10)
+    assert created["offset"] == 0
+
+    await sessions.write_chunk(session.id, 0, body(b"hello", b" "), mock_db, mock_user)
+    state = await sessions.write_chunk(session.id, 6, body(b"done"), mock_db, mock_user)
+    assert state["offset"] == 10
+    assert len(list((tmp_path / "upload-sessions" / session.id).iterdir())) == 2
+
+    uploaded = await sessions.complete_session(session.id, mock_db, mock_user)
+
+    assert uploaded["size"] == 10
+    stored = next(tmp_path.rglob(f"{uploaded['id']}.txt"))
+    assert stored.read_bytes() == b"hello done"
+    assert not (tmp_path / "upload-sessions" / session.id).exists()
+    mock_db.delete.assert_awaited_once_with(session)
+
+
+@pytest.mark.asyncio
+async def test_complete_composes_in_storage_admitted_by_declared_size(sessions, mock_db, mock_user, mocker):
+    _, session = await start_session(sessions, mock_db, mock_user, 10)
+    await sessions.write_chunk(session.id, 0, body(b"hello "), mock_db, mock_user)
+    await sessions.write_chunk(session.id, 6, body(b"done"), mock_db, mock_user)
+    admission = mocker.patch("api.services.upload_sessions.admission")
+    upload = mocker.spy(sessions.files, "_upload_to_storage")
+
+    uploaded = await sessions.complete_session(session.id, mock_db, mock_user)
+
+    assert uploaded["id"] == session.id
+    admission.admit_upload.assert_called_once_with(10)
+    admission.release_upload.assert_called_once_with(10)
+    upload.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_claimed_session_is_not_composed_twice(sessions, mock_db, mock_user, mocker):
+    _, session = await start_session(sessions, mock_db, mock_user, 5)
+    await sessions.write_chunk(session.id, 0, body(b"hello"), mock_db, mock_user)
+    session.completing_at = datetime.utcnow()
+    compose = mocker.spy(sessions.files, "_compose_in_storage")
+
+    with pytest.raises(HTTPException) as exc:
+        await sessions.complete_session(session.id, mock_db, mock_user)
+
+    assert exc.value.status_code == 409
+    compose.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_expired_claim_is_taken_over(sessions, mock_db, mock_user, tmp_path):
+    _, session = await start_session(sessions, mock_db, mock_user, 5)
+    await sessions.write_chunk(session.id, 0, body(b"hello"), mock_db, mock_user)
+    session.completing_at = datetime.utcnow() - timedelta(hours=1)
+
+    uploaded = await sessions.complete_session(session.id, mock_db, mock_user)
+
+    assert next(tmp_path.rglob(f"{uploaded['id']}.txt")).read_bytes() == b"hello"
+
+
+@pytest.mark.asyncio
+async def test_completion_that_lost_its_claim_leaves_nothing_behind(sessions, mock_db, mock_user, tmp_path):
+    _, session = await start_session(sessions, mock_db, mock_user, 5)
+    await sessions.write_chunk(session.id, 0, body(b"hello"), mock_db, mock_user)
+    found = Mock(scalar_one_or_none=Mock(return_value=session))
+    gone = Mock(scalar_one_or_none=Mock(return_value=None))
+    mock_db.execute.side_effect = [found, gone, Mock()]
+
+    with pytest.raises(HTTPException) as exc:
+        await sessions.complete_session(session.id, mock_db, mock_user)
+
+    assert exc.value.status_code == 409
+    assert not list(tmp_path.rglob(f"{session.id}.txt"))
+    assert [p.name for p in (tmp_path / "upload-sessions" / session.id).iterdir()] == ["000000"]
+    mock_db.delete.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_assembled_size_is_checked_before_registering(sessions, mock_db, mock_user, tmp_path):
+    _, session = await start_session(sessions, mock_db, mock_user, 5)
+    await sessions.write_chunk(session.id, 0, body(b"hello"), mock_db, mock_user)
+    (tmp_path / "upload-sessions" / session.id / "000000").write_bytes(b"hell")
+
+    with pytest.raises(HTTPException) as exc:
+        await sessions.complete_session(session.id, mock_db, mock_user)
+
+    assert exc.value.status_code == 500
+    assert not list(tmp_path.rglob(f"{session.id}.txt"))
+    mock_db.delete.assert_not_awaited()
+    release = mock_db.execute.await_args_list[-1].args[0]
+    assert release.is_update and release.compile().params["completing_at"] is None
+
+
+@pytest.mark.asyncio
+async def test_empty_declared_size_is_rejected(sessions, mock_db, mock_user):
+    with pytest.raises(HTTPException) as exc:
+        await sessions.create_session("notes.txt", "text/plain", 0, mock_db, mock_user)
+    assert exc.value.status_code == 400
+    mock_db.add.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_gcs_compose_folds_sources_past_the_request_limit():
+    files = FileService()
+    files.use_gcs = True
+    destination = Mock()
+    bucket = Mock(blob=Mock(side_effect=lambda name: destination if name == "file.txt" else name))
+    files._get_gcs_bucket = Mock(return_value=bucket)
+    sources = [f"chunk-{n}" for n in range(70)]
+
+    await files._compose_in_storage(sources, "file.txt")
+
+    calls = [c.args[0] for c in destination.compose.call_args_list]
+    assert calls[0] == sources[:32]
+    assert calls[1] == [destination, *sources[32:63]] and calls[2] == [destination, *sources[63:]]
+
+
+@pytest.mark.asyncio
+async def test_chunk_at_wrong_offset_reports_current_offset(sessions, mock_db, mock_user):
+    _, session = await start_session(sessions, mock_db, mock_user, 10)
+    await sessions.write_chunk(session.id, 0, body(b"hello"), mock_db, mock_user)
+
+    with pytest.raises(HTTPException) as exc:
+        await sessions.write_chunk(session.id, 0, body(b"hello"), mock_db, mock_user)
+    assert exc.value.status_code == 409
+    assert exc.value.headers["Upload-Offset"] == "5"
+
+
+@pytest.mark.asyncio
+async def test_only_the_last_chunk_may_be_small(sessions, mock_db, mock_user):
+    _, session = await start_session(sessions, mock_db, mock_user, 7)
+
+    with pytest.raises(HTTPException) as exc:
+        await sessions.write_chunk(session.id, 0, body(b"he"), mock_db, mock_user)
+    assert exc.value.status_code == 400
+
+    await sessions.write_chunk(session.id, 0, body(b"hello"), mock_db, mock_user)
+    state = await sessions.write_chunk(session.id, 5, body(b"!!"), mock_db, mock_user)
+    assert state["offset"] == 7
+
+
+@pytest.mark.asyncio
+async def test_complete_before_all_bytes_arrive(sessions, mock_db, mock_user):
+    _, session = await start_session(sessions, mock_db, mock_user, 10)
+    await sessions.write_chunk(session.id, 0, body(b"hello"), mock_db, mock_user)
+
+    with pytest.raises(HTTPException) as exc:
+        await sessions.complete_session(session.id, mock_db, mock_user)
+    assert exc.value.status_code == 409
+    mock_db.delete.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_expired_session_not_found(sessions, mock_db, mock_user):
+    mock_db.execute.return_value.scalar_one_or_none.return_value = UploadSession(
+        id="s1", owner_id="user-123", expires_at=datetime.utcnow() - timedelta(seconds=1)
+    )
+    with pytest.raises(HTTPException) as exc:
+        await sessions.get_session("s1", mock_db, mock_user)
+    assert exc.value.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_cleanup_removes_expired_chunks(sessions, mock_db, tmp_path):
+    chunk = tmp_path / "upload-sessions" / "s1" / "000000"
+    chunk.parent.mkdir(parents=True)
+    chunk.write_bytes(b"abandoned")
+    expired = UploadSession(id="s1", chunk_count=1, expires_at=datetime.utcnow() - timedelta(hours=1))
+    mock_db.execute.return_value.scalars.return_value.all.return_value = [expired]
+
+    assert await sessions.cleanup_expired(mock_db) == 1
+
+    mock_db.delete.assert_awaited_once_with(expired)
+    mock_db.commit.assert_awaited_once()
+    assert not chunk.parent.exists()
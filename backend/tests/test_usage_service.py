@@ -0,0 +1,56 @@
+from unittest.mock import Mock
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from api.services.usage import UsageService
+
+
+def compiled(call):
+    return str(call.args[0].compile(dialect=postgresql.dialect()))
+
+
+@pytest.mark.asyncio
+async def test_record_upload_upserts_both_tables(mock_db):
+    await UsageService().record(mock_db, "user-123", ".pdf", 2048, 1)
+
+    user_stmt, daily_stmt = [compiled(call) for call in mock_db.execute.await_args_list]
+    assert "INSERT INTO user_usage" in user_stmt
+    assert "ON CONFLICT (owner_id, type) DO UPDATE" in user_stmt
+    assert "INSERT INTO daily_usage" in daily_stmt
+    assert "ON CONFLICT (day, type) DO UPDATE" in daily_stmt
+
+
+@pytest.mark.asyncio
+async def test_record_delete_counts_as_deletion(mock_db):
+    await UsageService().record(mock_db, "user-123", ".txt", 100, -1)
+
+    daily = mock_db.execute.await_args_list[1].args[0].compile().params
+    assert daily["files_added"] == 0
+    assert daily["files_deleted"] == 1
+    assert daily["bytes_deleted"] == 100
+
+
+@pytest.mark.asyncio
+async def test_reconcile_rewrites_only_drifted_owners_under_the_lock(mock_db):
+    locked = Mock(scalar=Mock(return_value=True))
+    files = [("a", ".txt", 2, 20), ("b", ".pdf", 1, 5)]
+    usage = [("a", ".txt", 2, 20), ("b", ".pdf", 3, 9)]
+    mock_db.execute.side_effect = [locked, files, usage, None, None, None]
+
+    assert await UsageService().reconcile(mock_db) == 1
+
+    statements = [compiled(call) for call in mock_db.execute.await_args_list]
+    assert "pg_try_advisory_xact_lock" in statements[0]
+    assert "GROUP BY files.owner_id, files.type" in statements[1] and "LOCK" not in statements[1]
+    assert statements[3] == "LOCK TABLE user_usage IN SHARE ROW EXCLUSIVE MODE"
+    assert statements[4].startswith("DELETE FROM user_usage WHERE user_usage.owner_id IN")
+    assert "WHERE files.owner_id IN" in statements[5]
+    assert mock_db.execute.await_args_list[5].args[0].compile().params["owner_id_1"] == ["b"]
+
+
+@pytest.mark.asyncio
+async def test_reconcile_skips_while_another_process_holds_the_lock(mock_db):
+    mock_db.execute.return_value.scalar.return_value = False
+
+    assert await UsageService().reconcile(mock_db) == 0
+    assert mock_db.execute.await_count == 1